@@ -0,0 +1,142 @@
+from constructs import Construct
+import os
+
+from aws_cdk import (
+    Stack,
+    aws_iam as iam,
+    CfnResource,
+    CfnOutput,
+    Token
+)
+from ai_agent_pipeline.instructions import compile_instruction, load_instruction
+
+
+class AgentsStack(Stack):
+    """
+    Bedrock agents and aliases: the QA test agent, the functional agent and
+    its optional fast tier. Other stacks reference the agent and alias IDs
+    through the attributes set at the end of __init__.
+    """
+
+    def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        __dirname = os.path.dirname(os.path.realpath(__file__))
+
+        # Optional fast-tier agent for routing short lookups, see "agentPool" in cdk.json
+        agent_pool = self.node.try_get_context("agentPool") or {}
+        # Token budget for compiled agent instructions, see "agentInstructions" in cdk.json
+        agent_instructions = self.node.try_get_context("agentInstructions") or {}
+        instruction_budget = agent_instructions.get("maxTokens")
+
+        #Create bedrock agents for testing
+        # Create IAM role for the agents
+        agent_role = iam.Role(
+            self, "BedrockAgentRole",
+            assumed_by=iam.ServicePrincipal("bedrock.amazonaws.com"),
+            description="IAM role for Bedrock agents"
+        )
+
+        # Add required policies to the role
+        agent_role.add_managed_policy(
+            iam.ManagedPolicy.from_aws_managed_policy_name("AmazonBedrockFullAccess")
+        )
+
+        # Create the first agent using CfnAgent
+        bedrock_agent_test = CfnResource(
+            self, "TestAgent",
+            type="AWS::Bedrock::Agent",
+            properties={
+                "AgentName": "ContentCreatorAgent",
+                "AgentResourceRoleArn": agent_role.role_arn,
+                "FoundationModel": "anthropic.claude-3-sonnet-20240229-v1:0",
+                "Instruction": compile_instruction(
+                    "You are an agent that tests other Bedrock agents for Quality Assurance.",
+                    instruction_budget,
+                    name="TestAgent instruction"
+                ).text,
+                "Description": "Agent specialized in content creation",
+                "IdleSessionTTLInSeconds": 1800
+            }
+        )
+
+        # Dedented and minified at synth time; synth fails if it is over the token budget
+        functional_instruction = load_instruction(
+            os.path.join(__dirname, "assets", "functional_agent_instructions.txt"),
+            instruction_budget
+        ).text
+        bedrock_agent_functional = CfnResource(
+            self, "FunctionalAgent",
+            type="AWS::Bedrock::Agent",
+            properties={
+                "AgentName": "ElectronicsManufacturingExpert",
+                "AgentResourceRoleArn": agent_role.role_arn,
+                "FoundationModel": "anthropic.claude-3-sonnet-20240229-v1:0",
+                "Instruction": functional_instruction,
+                "Description": "General Question Agent",
+                "IdleSessionTTLInSeconds": 1800
+            }
+        )
+        bedrock_agent_test_alias = CfnResource(
+            self, "TestAgentAlias",
+            type="AWS::Bedrock::AgentAlias",
+            properties={
+                "AgentId": bedrock_agent_test.ref,
+                "AgentAliasName": "latest"
+            }
+        )
+        bedrock_agent_functional_alias = CfnResource(
+            self, "FunctionalAgentAlias",
+            type="AWS::Bedrock::AgentAlias",
+            properties={
+                "AgentId": bedrock_agent_functional.ref,
+                "AgentAliasName": "latest"
+            }
+        )
+
+        # Same agent on a faster, cheaper model; the API routes short factual lookups to it
+        routing_pool = [{
+            "name": "deep",
+            "agentId": bedrock_agent_functional.ref,
+            "aliasId": Token.as_string(bedrock_agent_functional_alias.get_att("AgentAliasId")),
+            "tier": "deep"
+        }]
+        if agent_pool.get("fastModel"):
+            bedrock_agent_fast = CfnResource(
+                self, "FunctionalFastAgent",
+                type="AWS::Bedrock::Agent",
+                properties={
+                    "AgentName": "ElectronicsManufacturingExpertFast",
+                    "AgentResourceRoleArn": agent_role.role_arn,
+                    "FoundationModel": agent_pool["fastModel"],
+                    "Instruction": functional_instruction,
+                    "Description": "General Question Agent (fast tier)",
+                    "IdleSessionTTLInSeconds": 1800
+                }
+            )
+            bedrock_agent_fast_alias = CfnResource(
+                self, "FunctionalFastAgentAlias",
+                type="AWS::Bedrock::AgentAlias",
+                properties={
+                    "AgentId": bedrock_agent_fast.ref,
+                    "AgentAliasName": "latest"
+                }
+            )
+            routing_pool.append({
+                "name": "fast",
+                "agentId": bedrock_agent_fast.ref,
+                "aliasId": Token.as_string(bedrock_agent_fast_alias.get_att("AgentAliasId")),
+                "tier": "fast"
+            })
+            CfnOutput(self, "FunctionalFastAgentId", value=bedrock_agent_fast.ref)
+
+        # Output the agent IDs
+        CfnOutput(self, "FirstAgentId", value=bedrock_agent_test.ref)
+        CfnOutput(self, "FunctionalAgentId", value=bedrock_agent_functional.ref)
+
+        self.test_agent_id = bedrock_agent_test.ref
+        self.test_agent_alias_id = Token.as_string(bedrock_agent_test_alias.get_att("AgentAliasId"))
+        self.functional_agent_id = bedrock_agent_functional.ref
+        self.functional_agent_alias_id = Token.as_string(bedrock_agent_functional_alias.get_att("AgentAliasId"))
+        # Aliases the API routes prompts across, see lambda/tools/routing.py
+        self.routing_pool = routing_pool
@@ -0,0 +1,531 @@
+from constructs import Construct
+
+from aws_cdk import (
+    Stack,
+    aws_lambda as lambda_,
+    aws_cloudwatch as cloudwatch,
+    aws_dynamodb as dynamodb,
+    aws_sqs as sqs,
+    aws_lambda_event_sources as lambda_event_sources,
+    aws_iam as iam,
+    aws_s3 as s3,
+    aws_apigateway as aws_apigateway,
+    aws_applicationautoscaling as appscaling,
+    Duration,
+    RemovalPolicy,
+    Size,
+    CfnOutput
+)
+from ai_agent_pipeline.agents_stack import AgentsStack
+from ai_agent_pipeline.bundling import dependency_layer, precompiled_code
+from ai_agent_pipeline.compute_stack import KNOWLEDGE_BASE_INDEX
+
+
+
+def live_alias(function: lambda_.Function, settings: dict) -> lambda_.Alias:
+    """
+    Publish a "live" alias for function. When settings["min"] is above zero the
+    alias gets provisioned concurrency, scaled between min and max either on
+    utilization (settings["utilizationTarget"]) or on settings["schedules"]:
+    [{"name": ..., "expression": "cron(0 7 ? * MON-FRI *)", "min": ..., "max": ...}].
+    """
+    minimum = int(settings.get("min", 0))
+    alias = lambda_.Alias(
+        function, "LiveAlias",
+        alias_name="live",
+        version=function.current_version,
+        provisioned_concurrent_executions=minimum or None
+    )
+    if minimum:
+        scaling = alias.add_auto_scaling(
+            min_capacity=minimum,
+            max_capacity=int(settings.get("max", minimum))
+        )
+        if settings.get("utilizationTarget"):
+            scaling.scale_on_utilization(utilization_target=float(settings["utilizationTarget"]))
+        for schedule in settings.get("schedules", []):
+            scaling.scale_on_schedule(
+                schedule["name"],
+                schedule=appscaling.Schedule.expression(schedule["expression"]),
+                min_capacity=schedule.get("min"),
+                max_capacity=schedule.get("max")
+            )
+    return alias
+
+
+class ApiStack(Stack):
+    """
+    The agent API (API Gateway, the Bedrock API function and its async jobs
+    worker with their tables and queues), the tools function used by the
+    agents' action groups, and the dashboard and alarms for both. Lambda code
+    changes only touch this stack, so `cdk deploy AiAgentApiStack --hotswap`
+    can update it on its own.
+    """
+
+    def __init__(self, scope: Construct, construct_id: str, *, agents: AgentsStack,
+                 knowledge_base_bucket: s3.IBucket, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        # Optional provisioned concurrency per function, see "provisionedConcurrency" in cdk.json
+        provisioned_concurrency = self.node.try_get_context("provisionedConcurrency") or {}
+        # Alarm thresholds for the agent API metrics, see "agentAlarms" in cdk.json
+        agent_alarms = self.node.try_get_context("agentAlarms") or {}
+        # Token bucket per agent alias for the API function, see "admissionControl" in cdk.json
+        admission_control = self.node.try_get_context("admissionControl") or {}
+        # Thresholds for compacting long agent sessions, see "sessionCompaction" in cdk.json
+        session_compaction = self.node.try_get_context("sessionCompaction") or {}
+        # Size past which answers are uploaded to S3 instead of returned, see "largeResponses" in cdk.json
+        large_responses = self.node.try_get_context("largeResponses") or {}
+        # Model that writes fast-path answers from tool results, see "fastPath" in cdk.json
+        fast_path = self.node.try_get_context("fastPath") or {}
+        # Hosts the external_api tool may call, see "externalApi" in cdk.json
+        external_api = self.node.try_get_context("externalApi") or {}
+        allowed_hosts = ",".join(external_api.get("allowedHosts", []))
+        # /tmp space for the downloaded knowledge-base index, see "knowledgeBase" in cdk.json
+        knowledge_base = self.node.try_get_context("knowledgeBase") or {}
+        index_storage = Size.mebibytes(int(knowledge_base.get("ephemeralStorageMb", 512)))
+        # Function URL that streams answers as they are decoded, see "responseStreaming" in cdk.json
+        response_streaming = self.node.try_get_context("responseStreaming") or {}
+        # Name of the metrics dashboard, see "dashboard" in cdk.json
+        dashboard_config = self.node.try_get_context("dashboard") or {}
+
+        #Create Lambda Function to Integrate with API Gateway
+        # Create IAM role for Lambda with Bedrock permissions
+        bedrock_lambda_role = iam.Role(
+            self, 'BedrockLambdaRole',
+            assumed_by=iam.ServicePrincipal('lambda.amazonaws.com')
+        )
+
+        # Add Bedrock permissions
+        bedrock_lambda_role.add_to_policy(iam.PolicyStatement(
+            effect=iam.Effect.ALLOW,
+            actions=[
+                'bedrock:InvokeModel',
+                'bedrock:InvokeAgent'  # Add this permission
+            ],
+            resources=['*']
+        ))
+
+        # Basic Lambda CloudWatch permissions
+        bedrock_lambda_role.add_managed_policy(
+            iam.ManagedPolicy.from_aws_managed_policy_name('service-role/AWSLambdaBasicExecutionRole')
+        )
+        # The fast path's knowledge-base lookups fetch the published index
+        knowledge_base_bucket.grant_read(bedrock_lambda_role, f"{KNOWLEDGE_BASE_INDEX}/*")
+
+        # Settings shared by the API function and the async jobs worker
+        api_code = precompiled_code('lambda/tools', lambda_.Runtime.PYTHON_3_9)
+        # NumPy and a pinned boto3, shared with the tools function
+        dependencies = dependency_layer(self, 'DependencyLayer', 'lambda/layer', lambda_.Runtime.PYTHON_3_9)
+        api_environment = {
+            'POWERTOOLS_SERVICE_NAME': 'bedrock-api',
+            'LOG_LEVEL': 'INFO',
+            'METRICS_NAMESPACE': 'AiAgent',
+            'AGENT_TRACE_SAMPLE_RATE': '0.01',
+            # One quick botocore retry; longer throttling backoff is done by admission control
+            'AWS_CLIENT_MAX_ATTEMPTS': '2',
+            'ADMISSION_RATE': str(admission_control.get('rate', 0)),
+            'ADMISSION_BURST': str(admission_control.get('burst', 0)),
+            'AGENT_POOL': self.to_json_string(agents.routing_pool),
+            # Short lookups are cheap to duplicate; hedge them past the observed p95 first chunk
+            'HEDGE_TIERS': 'fast',
+            'HEDGE_BUDGET_PERCENT': '10',
+            'SESSION_MAX_TURNS': str(session_compaction.get('maxTurns', 0)),
+            'SESSION_MAX_TOKENS': str(session_compaction.get('maxTokens', 0)),
+            'SESSION_KEEP_TURNS': str(session_compaction.get('keepTurns', 2)),
+            'SESSION_SUMMARY_TOKENS': str(session_compaction.get('summaryTokens', 1000)),
+            'SESSION_SUMMARY_MODE': session_compaction.get('summaryMode', 'compact'),
+            # Matches the agents' IdleSessionTTLInSeconds, after which Bedrock forgets the session anyway
+            'SESSION_TTL_SECONDS': '1800',
+            # POST /tools/{tool} runs the tools in this function, so it reads the same index
+            'FAST_PATH_MODEL_ID': fast_path.get('answerModel', 'anthropic.claude-3-haiku-20240307-v1:0'),
+            'FAST_PATH_MAX_RESULT_CHARS': str(fast_path.get('maxResultChars', 20000)),
+            'KNOWLEDGE_BASE_INDEX_URI': f"s3://{knowledge_base_bucket.bucket_name}/{KNOWLEDGE_BASE_INDEX}",
+            'EXTERNAL_API_ALLOWED_HOSTS': allowed_hosts,
+            'BEDROCK_AGENT_ID': agents.functional_agent_id,
+            'BEDROCK_AGENT_ALIAS_ID': agents.functional_agent_alias_id
+        }
+
+        # Create Lambda function for Bedrock integration
+        bedrock_lambda = lambda_.Function(
+            self, 'BedrockLambdaFunction',
+            runtime=lambda_.Runtime.PYTHON_3_9,
+            handler='index.handler',
+            code=api_code,
+            timeout=Duration.minutes(5),
+            memory_size=256,
+            # The fast path downloads the knowledge-base index to /tmp
+            ephemeral_storage_size=index_storage,
+            role=bedrock_lambda_role,
+            layers=[dependencies],
+            environment=api_environment
+        )
+
+        # Async mode: /invoke queues long prompts for this worker and clients poll /jobs/{jobId}
+        jobs_table = dynamodb.Table(
+            self, 'AgentJobsTable',
+            partition_key=dynamodb.Attribute(name='jobId', type=dynamodb.AttributeType.STRING),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute='expiresAt',
+            removal_policy=RemovalPolicy.DESTROY
+        )
+        jobs_dead_letter_queue = sqs.Queue(
+            self, 'AgentJobsDeadLetterQueue',
+            retention_period=Duration.days(14),
+            # The worker reads this queue too, so it must outlast the worker timeout as well
+            visibility_timeout=Duration.minutes(15)
+        )
+        jobs_max_receive_count = 5
+        jobs_worker_timeout = Duration.minutes(10)
+        jobs_queue = sqs.Queue(
+            self, 'AgentJobsQueue',
+            # Must exceed the worker timeout so a running job is not delivered twice
+            visibility_timeout=Duration.minutes(15),
+            dead_letter_queue=sqs.DeadLetterQueue(max_receive_count=jobs_max_receive_count,
+                                                  queue=jobs_dead_letter_queue)
+        )
+        jobs_worker = lambda_.Function(
+            self, 'AgentJobsWorkerFunction',
+            runtime=lambda_.Runtime.PYTHON_3_9,
+            handler='worker.handler',
+            code=api_code,
+            timeout=jobs_worker_timeout,
+            memory_size=256,
+            role=bedrock_lambda_role,
+            layers=[dependencies],
+            # Same Service dimension as the API, so the dashboard and alarms cover async mode;
+            # its records are told apart by their `mode` property
+            environment=api_environment
+        )
+        # Streaming mode: index.stream_handler behind a RESPONSE_STREAM function URL. The managed Python
+        # runtime cannot stream, so stream_bootstrap swaps in the runtime loop from stream_runtime.py.
+        stream_function = None
+        if response_streaming.get('enabled'):
+            stream_function = lambda_.Function(
+                self, 'BedrockStreamFunction',
+                runtime=lambda_.Runtime.PYTHON_3_9,
+                handler='index.stream_handler',
+                code=api_code,
+                timeout=Duration.minutes(5),
+                memory_size=256,
+                role=bedrock_lambda_role,
+                layers=[dependencies],
+                environment=dict(api_environment, AWS_LAMBDA_EXEC_WRAPPER='/var/task/stream_bootstrap')
+            )
+            stream_url = stream_function.add_function_url(
+                auth_type=lambda_.FunctionUrlAuthType[response_streaming.get('authType', 'AWS_IAM')],
+                invoke_mode=lambda_.InvokeMode.RESPONSE_STREAM,
+                cors=lambda_.FunctionUrlCorsOptions(
+                    allowed_origins=['*'],
+                    allowed_methods=[lambda_.HttpMethod.POST],
+                    allowed_headers=['Content-Type', 'Authorization']
+                )
+            )
+            CfnOutput(
+                self, 'StreamEndpoint',
+                value=stream_url.url,
+                description='Function URL that streams agent answers as NDJSON'
+            )
+        # Functions answering prompts in this stack; the tables below are shared by all of them
+        prompt_functions = [f for f in (bedrock_lambda, jobs_worker, stream_function) if f is not None]
+
+        jobs_worker.add_event_source(lambda_event_sources.SqsEventSource(
+            jobs_queue,
+            batch_size=1,
+            report_batch_item_failures=True
+        ))
+        # Jobs whose messages were given up on are marked failed rather than left queued or running
+        jobs_worker.add_event_source(lambda_event_sources.SqsEventSource(jobs_dead_letter_queue, batch_size=1))
+        jobs_worker.add_environment('JOBS_DEAD_LETTER_QUEUE_ARN', jobs_dead_letter_queue.queue_arn)
+        jobs_worker.add_environment('JOBS_MAX_RECEIVE_COUNT', str(jobs_max_receive_count))
+        jobs_worker.add_environment('JOBS_STALE_SECONDS', str(int(jobs_worker_timeout.to_seconds())))
+        # Large-response mode: answers past the threshold are uploaded here and returned as presigned URLs
+        if large_responses.get("thresholdBytes"):
+            responses_bucket = s3.Bucket(
+                self, "AgentResponsesBucket",
+                encryption=s3.BucketEncryption.S3_MANAGED,
+                removal_policy=RemovalPolicy.DESTROY,
+                enforce_ssl=True,
+                lifecycle_rules=[
+                    # A container killed mid-answer cannot abort its own upload
+                    s3.LifecycleRule(
+                        prefix="responses/",
+                        expiration=Duration.days(int(large_responses.get("retentionDays", 1))),
+                        abort_incomplete_multipart_upload_after=Duration.days(1)
+                    )
+                ]
+            )
+            # Writing the parts, and reading them back for the presigned URLs signed with this role
+            responses_bucket.grant_put(bedrock_lambda_role, "responses/*")
+            responses_bucket.grant_read(bedrock_lambda_role, "responses/*")
+            for function in (bedrock_lambda, jobs_worker):
+                function.add_environment("RESPONSE_SPILL_BUCKET", responses_bucket.bucket_name)
+                function.add_environment("RESPONSE_SPILL_THRESHOLD_BYTES", str(large_responses["thresholdBytes"]))
+                function.add_environment("RESPONSE_SPILL_PREVIEW_CHARS", str(large_responses.get("previewChars", 2000)))
+                function.add_environment("RESPONSE_SPILL_URL_TTL_SECONDS", str(large_responses.get("urlTtlSeconds", 3600)))
+        jobs_table.grant_read_write_data(bedrock_lambda_role)
+        jobs_queue.grant_send_messages(bedrock_lambda_role)
+        for function in (bedrock_lambda, jobs_worker):
+            function.add_environment('JOBS_TABLE', jobs_table.table_name)
+            function.add_environment('JOBS_QUEUE_URL', jobs_queue.queue_url)
+
+        # Session turn counts and summaries, shared by every container
+        if session_compaction.get('maxTurns') or session_compaction.get('maxTokens'):
+            sessions_table = dynamodb.Table(
+                self, 'AgentSessionsTable',
+                partition_key=dynamodb.Attribute(name='sessionId', type=dynamodb.AttributeType.STRING),
+                billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+                time_to_live_attribute='expiresAt',
+                removal_policy=RemovalPolicy.DESTROY
+            )
+            sessions_table.grant_read_write_data(bedrock_lambda_role)
+            for function in prompt_functions:
+                function.add_environment('SESSIONS_TABLE', sessions_table.table_name)
+
+        # Share the token buckets across containers when requested
+        if admission_control.get('shared'):
+            admission_table = dynamodb.Table(
+                self, 'AdmissionBucketTable',
+                partition_key=dynamodb.Attribute(name='bucketKey', type=dynamodb.AttributeType.STRING),
+                billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+                removal_policy=RemovalPolicy.DESTROY
+            )
+            admission_table.grant_read_write_data(bedrock_lambda_role)
+            for function in prompt_functions:
+                function.add_environment('ADMISSION_TABLE', admission_table.table_name)
+        # Route traffic through an alias so provisioned concurrency can keep it warm
+        bedrock_lambda_alias = live_alias(
+            bedrock_lambda,
+            provisioned_concurrency.get('bedrockApi', {})
+        )
+
+        # Create API Gateway REST API
+        api = aws_apigateway.RestApi(
+            self, 'BedrockApi',
+            rest_api_name='Bedrock Integration API',
+            description='API Gateway integration with Amazon Bedrock'
+        )
+
+        # Create API Gateway integration with Lambda
+        integration = aws_apigateway.LambdaIntegration(
+            bedrock_lambda_alias,
+            proxy=True,
+            integration_responses=[{
+                'statusCode': '200',
+                'responseParameters': {
+                    'method.response.header.Access-Control-Allow-Origin': "'*'"
+                }
+            }]
+        )
+
+        # Add POST method to API Gateway
+        api_resource = api.root.add_resource('invoke')
+        api_resource.add_method(
+            'POST',
+            integration,
+            method_responses=[{
+                'statusCode': '200',
+                'responseParameters': {
+                    'method.response.header.Access-Control-Allow-Origin': True
+                }
+            }]
+        )
+
+        # Enable CORS
+        api_resource.add_cors_preflight(
+            allow_origins=['*'],
+            allow_methods=['POST'],
+            allow_headers=['Content-Type', 'Authorization']
+        )
+
+        # Add GET /jobs/{jobId} for polling async requests
+        job_resource = api.root.add_resource('jobs').add_resource('{jobId}')
+        job_resource.add_method(
+            'GET',
+            integration,
+            method_responses=[{
+                'statusCode': '200',
+                'responseParameters': {
+                    'method.response.header.Access-Control-Allow-Origin': True
+                }
+            }]
+        )
+        job_resource.add_cors_preflight(
+            allow_origins=['*'],
+            allow_methods=['GET'],
+            allow_headers=['Content-Type', 'Authorization']
+        )
+
+        # Add POST /tools/{tool}, the direct-tool fast path used by the Q Business plugin
+        tool_resource = api.root.add_resource('tools').add_resource('{tool}')
+        tool_resource.add_method(
+            'POST',
+            integration,
+            method_responses=[{
+                'statusCode': '200',
+                'responseParameters': {
+                    'method.response.header.Access-Control-Allow-Origin': True
+                }
+            }]
+        )
+        tool_resource.add_cors_preflight(
+            allow_origins=['*'],
+            allow_methods=['POST'],
+            allow_headers=['Content-Type', 'Authorization']
+        )
+
+        # Output the API endpoint URL
+        CfnOutput(
+            self, 'ApiEndpoint',
+            value=f'{api.url}invoke',
+            description='API Gateway endpoint URL'
+        )
+
+        # Your existing Lambda function
+        tools_function = lambda_.Function(
+            self, "ToolsFunction",
+            runtime=lambda_.Runtime.PYTHON_3_9,
+            handler="tools.handler",
+            code=api_code,
+            layers=[dependencies],
+            timeout=Duration.minutes(5),
+            ephemeral_storage_size=index_storage,
+            environment={
+                # Index published by the KnowledgeBaseIngestJob, fetched to /tmp on cold start
+                "KNOWLEDGE_BASE_INDEX_URI": f"s3://{knowledge_base_bucket.bucket_name}/{KNOWLEDGE_BASE_INDEX}",
+                "EXTERNAL_API_ALLOWED_HOSTS": allowed_hosts
+            }
+        )
+        knowledge_base_bucket.grant_read(tools_function, f"{KNOWLEDGE_BASE_INDEX}/*")
+        live_alias(
+            tools_function,
+            provisioned_concurrency.get("tools", {})
+        )
+        # Knowledge-base lookups embed queries with a Bedrock embedding model
+        tools_function.add_to_role_policy(iam.PolicyStatement(
+            actions=["bedrock:InvokeModel"],
+            resources=["*"]
+        ))
+
+        # Your existing CloudWatch dashboard
+        dashboard = cloudwatch.Dashboard(
+            self, "AiAgentDashboard",
+            dashboard_name=dashboard_config.get("name", "ai-agent-metrics")
+        )
+
+        dashboard.add_widgets(
+            cloudwatch.GraphWidget(
+                title="Agent Invocations",
+                left=[
+                    tools_function.metric_invocations(),
+                    tools_function.metric_errors()
+                ]
+            ),
+            cloudwatch.GraphWidget(
+                title="Agent Latency",
+                left=[tools_function.metric_duration()]
+            )
+        )
+
+        # Per-request EMF metrics written by lambda/tools/metrics.py
+        def agent_metric(name, statistic, label=None):
+            return cloudwatch.Metric(
+                namespace="AiAgent",
+                metric_name=name,
+                dimensions_map={"Service": "bedrock-api"},
+                statistic=statistic,
+                label=label or f"{name} {statistic}",
+                period=Duration.minutes(1)
+            )
+
+        dashboard.add_widgets(
+            cloudwatch.GraphWidget(
+                title="Bedrock Agent Latency (ms)",
+                left=[agent_metric("AgentLatency", p) for p in ("p50", "p95", "p99")]
+            ),
+            cloudwatch.GraphWidget(
+                title="Time To First Chunk (ms)",
+                left=[agent_metric("TimeToFirstChunk", p) for p in ("p50", "p95", "p99")]
+            )
+        )
+        dashboard.add_widgets(
+            cloudwatch.GraphWidget(
+                title="Agent Responses",
+                left=[agent_metric("ResponseBytes", p) for p in ("p50", "p95")],
+                right=[agent_metric("ChunkCount", p) for p in ("p50", "p95")]
+            ),
+            cloudwatch.GraphWidget(
+                title="Cache Hits, Throttles, Load Shedding, Errors, Cold Starts and Hedges",
+                left=[
+                    agent_metric("CacheHit", "Sum", "Cache hits"),
+                    agent_metric("Throttles", "Sum", "Throttles"),
+                    agent_metric("LoadShed", "Sum", "Load shed"),
+                    agent_metric("Errors", "Sum", "Errors"),
+                    agent_metric("ColdStart", "Sum", "Cold starts")
+                ],
+                right=[
+                    agent_metric("Hedged", "Sum", "Hedged"),
+                    agent_metric("HedgeWin", "Sum", "Hedge wins")
+                ]
+            )
+        )
+        dashboard.add_widgets(
+            cloudwatch.GraphWidget(
+                title="Bedrock API Lambda",
+                left=[
+                    bedrock_lambda.metric_invocations(),
+                    bedrock_lambda.metric_errors(),
+                    bedrock_lambda.metric_throttles()
+                ],
+                right=[bedrock_lambda.metric_duration(statistic="p95")]
+            ),
+            cloudwatch.GraphWidget(
+                title="Session Compaction",
+                left=[agent_metric("CompactionSaving", p, f"Saving per turn {p} (ms)") for p in ("p50", "p90")],
+                right=[agent_metric("SessionCompaction", "Sum", "Compactions")]
+            )
+        )
+
+        # Sustained breaches only: 3 of the last 5 minutes
+        alarms = [
+            agent_metric("AgentLatency", "p95").create_alarm(
+                self, "AgentLatencyP95Alarm",
+                alarm_description="Bedrock agent p95 latency is above target",
+                threshold=agent_alarms.get("latencyP95Ms", 30000),
+                evaluation_periods=5,
+                datapoints_to_alarm=3,
+                treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+            ),
+            agent_metric("TimeToFirstChunk", "p95").create_alarm(
+                self, "TimeToFirstChunkP95Alarm",
+                alarm_description="Bedrock agent p95 time to first chunk is above target",
+                threshold=agent_alarms.get("timeToFirstChunkP95Ms", 10000),
+                evaluation_periods=5,
+                datapoints_to_alarm=3,
+                treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+            ),
+            agent_metric("Throttles", "Sum").create_alarm(
+                self, "AgentThrottlesAlarm",
+                alarm_description="Bedrock agent calls are being throttled",
+                threshold=agent_alarms.get("throttles", 5),
+                evaluation_periods=5,
+                datapoints_to_alarm=3,
+                treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+            ),
+            agent_metric("Errors", "Sum").create_alarm(
+                self, "AgentErrorsAlarm",
+                alarm_description="Bedrock agent calls are failing",
+                threshold=agent_alarms.get("errors", 5),
+                evaluation_periods=5,
+                datapoints_to_alarm=3,
+                treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+            )
+        ]
+        dashboard.add_widgets(
+            cloudwatch.AlarmStatusWidget(
+                title="Agent Alarms",
+                alarms=alarms,
+                width=24
+            )
+        )
+
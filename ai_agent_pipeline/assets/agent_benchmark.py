@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Latency and throughput benchmark for the functional Bedrock agent.
+
+Runs a fixed prompt corpus against the agent at a configurable concurrency and
+reports p50/p95/p99 latency, time-to-first-chunk, throughput and error rate.
+Optionally the QA agent judges every answer and the pass rate is reported too.
+Results are written as JSON and compared against a stored baseline; the
+process exits non-zero when a metric regresses past the allowed tolerance.
+
+Baselines can be local paths or s3://bucket/key URIs. Refresh one with
+--update-baseline. With --init-baseline (as in CI), a run that finds no
+baseline stores its own results as the baseline, provided its error rate
+is within --error-rate-tolerance, so the first pipeline run arms the
+regression gate; without it a missing baseline is reported and skipped.
+
+Run locally against FakeAgentRuntime with --fake:
+
+    python agent_benchmark.py --fake --concurrency 4 --output /tmp/results.json
+
+Large corpora can be split across parallel builds: each shard runs every
+Nth prompt with --shard I/N and writes its results, then --merge combines
+shard-I-of-N.json from a directory or s3:// prefix into one report, with
+percentiles over all results, and runs the baseline check once. A run is
+only compared with a baseline of the same shape (total concurrency and
+shard count), so keep merged and serial baselines apart:
+
+    python agent_benchmark.py --fake --shard 0/2 --output /tmp/run/shard-0-of-2.json
+    python agent_benchmark.py --fake --shard 1/2 --output /tmp/run/shard-1-of-2.json
+    python agent_benchmark.py --merge /tmp/run --shards 2 --output /tmp/results.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+JUDGE_PROMPT = (
+    "You are grading an answer from an electronics manufacturing assistant.\n"
+    "Question: {question}\n"
+    "Answer: {answer}\n"
+    "Reply with exactly PASS if the answer is correct, relevant and complete, otherwise reply FAIL."
+)
+
+# Latency metrics compared against the baseline with a relative tolerance
+LATENCY_METRICS = ['latencyP50Ms', 'latencyP95Ms', 'latencyP99Ms', 'firstChunkP95Ms']
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def load_corpus(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def parse_shard(value):
+    """'I/N' to (I, N), for argparse."""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected INDEX/COUNT, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must be in 0..{count - 1}")
+    return index, count
+
+
+def shard_cases(cases, index, count):
+    """Every count-th case starting at index, so shards stay within one prompt of each other in size."""
+    return cases[index::count]
+
+
+def shard_location(prefix, index, count):
+    return f"{prefix.rstrip('/')}/shard-{index}-of-{count}.json"
+
+
+def read_document(location):
+    if location.startswith('s3://'):
+        import boto3
+        bucket, key = location[5:].split('/', 1)
+        client = boto3.client('s3')
+        try:
+            return json.loads(client.get_object(Bucket=bucket, Key=key)['Body'].read())
+        except client.exceptions.NoSuchKey:
+            return None
+    if not os.path.exists(location):
+        return None
+    with open(location, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_document(location, document):
+    data = json.dumps(document, indent=2).encode('utf-8')
+    if location.startswith('s3://'):
+        import boto3
+        bucket, key = location[5:].split('/', 1)
+        boto3.client('s3').put_object(Bucket=bucket, Key=key, Body=data)
+    else:
+        os.makedirs(os.path.dirname(location) or '.', exist_ok=True)
+        with open(location, 'wb') as f:
+            f.write(data)
+
+
+def agent_runtime(fake, responder=None):
+    if fake:
+        from fake_agent_runtime import FakeAgentRuntime
+        return FakeAgentRuntime(responder=responder)
+    import boto3
+    from botocore.config import Config
+    return boto3.client('bedrock-agent-runtime', config=Config(
+        max_pool_connections=64,
+        read_timeout=300,
+        retries={'max_attempts': 1}
+    ))
+
+
+def invoke(runtime, agent_id, agent_alias_id, prompt):
+    """Invoke the agent once and time it. Retries are disabled so throttles count as errors."""
+    start = time.perf_counter()
+    first_chunk = None
+    parts = []
+    response = runtime.invoke_agent(
+        agentId=agent_id,
+        agentAliasId=agent_alias_id,
+        sessionId=str(uuid.uuid4()),
+        inputText=prompt
+    )
+    for event in response['completion']:
+        chunk = event.get('chunk')
+        if chunk and 'bytes' in chunk:
+            if first_chunk is None:
+                first_chunk = time.perf_counter()
+            parts.append(chunk['bytes'])
+    end = time.perf_counter()
+    return {
+        'answer': b''.join(parts).decode('utf-8'),
+        'latencyMs': round((end - start) * 1000, 1),
+        'firstChunkMs': round(((first_chunk or end) - start) * 1000, 1)
+    }
+
+
+def run_case(case, runtime, judge, args):
+    result = {'id': case['id']}
+    try:
+        result.update(invoke(runtime, args.agent_id, args.agent_alias_id, case['prompt']))
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        return result
+    if judge:
+        try:
+            verdict = invoke(judge, args.judge_agent_id, args.judge_agent_alias_id, JUDGE_PROMPT.format(
+                question=case['prompt'],
+                answer=result['answer']
+            ))['answer']
+            result['judgePassed'] = verdict.strip().upper().startswith('PASS')
+        except Exception as e:
+            result['judgeError'] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def summarize(results, elapsed, concurrency, shards=1):
+    ok = [r for r in results if 'error' not in r]
+    latencies = [r['latencyMs'] for r in ok]
+    first_chunks = [r['firstChunkMs'] for r in ok]
+    judged = [r['judgePassed'] for r in ok if 'judgePassed' in r]
+
+    def rounded(value):
+        return None if value is None else round(value, 1)
+
+    return {
+        'requests': len(results),
+        'concurrency': concurrency,
+        'shards': shards,
+        'errorRate': round((len(results) - len(ok)) / len(results), 4) if results else 0.0,
+        'throughputRps': round(len(ok) / elapsed, 3) if elapsed else None,
+        'latencyP50Ms': rounded(percentile(latencies, 50)),
+        'latencyP95Ms': rounded(percentile(latencies, 95)),
+        'latencyP99Ms': rounded(percentile(latencies, 99)),
+        'firstChunkP50Ms': rounded(percentile(first_chunks, 50)),
+        'firstChunkP95Ms': rounded(percentile(first_chunks, 95)),
+        'judgePassRate': round(sum(judged) / len(judged), 4) if judged else None
+    }
+
+
+def merge_shards(documents):
+    """
+    Combine shard result documents into one summary and result list. Shards
+    run side by side, so throughput and concurrency add up; percentiles and
+    rates are recomputed over every result rather than averaged per shard.
+    """
+    results = [result for document in documents for result in document['results']]
+    concurrency = sum(document['summary']['concurrency'] for document in documents)
+    summary = summarize(results, None, concurrency, shards=len(documents))
+    throughputs = [document['summary']['throughputRps'] for document in documents]
+    summary['throughputRps'] = round(sum(throughputs), 3) if None not in throughputs else None
+    shards = [{
+        'shard': document.get('shard'),
+        'requests': document['summary']['requests'],
+        'elapsedSeconds': document.get('elapsedSeconds'),
+        'throughputRps': document['summary']['throughputRps']
+    } for document in documents]
+    return summary, results, shards
+
+
+def run_shape(summary):
+    """The load a summary was measured under; baselines from before sharding ran as one shard."""
+    return summary.get('concurrency'), summary.get('shards', 1)
+
+
+def find_regressions(summary, baseline, tolerance, error_rate_tolerance):
+    """Return human-readable descriptions of every metric worse than the baseline allows."""
+    # Latency and throughput both move with the load, so a run only compares with a baseline of its own shape
+    if run_shape(summary) != run_shape(baseline):
+        return [
+            'run shape (concurrency {}, shards {}) does not match the baseline (concurrency {}, shards {}); '
+            'record a baseline for this shape with --update-baseline'.format(*run_shape(summary), *run_shape(baseline))
+        ]
+    regressions = []
+    for name in LATENCY_METRICS:
+        if summary.get(name) is not None and baseline.get(name):
+            limit = baseline[name] * (1 + tolerance)
+            if summary[name] > limit:
+                regressions.append(f"{name} {summary[name]} > {limit:.1f} (baseline {baseline[name]})")
+    if summary.get('throughputRps') and baseline.get('throughputRps'):
+        limit = baseline['throughputRps'] * (1 - tolerance)
+        if summary['throughputRps'] < limit:
+            regressions.append(f"throughputRps {summary['throughputRps']} < {limit:.3f} (baseline {baseline['throughputRps']})")
+    limit = baseline.get('errorRate', 0.0) + error_rate_tolerance
+    if summary['errorRate'] > limit:
+        regressions.append(f"errorRate {summary['errorRate']} > {limit:.4f}")
+    if summary.get('judgePassRate') is not None and baseline.get('judgePassRate') is not None:
+        limit = baseline['judgePassRate'] - error_rate_tolerance
+        if summary['judgePassRate'] < limit:
+            regressions.append(f"judgePassRate {summary['judgePassRate']} < {limit:.4f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the functional Bedrock agent')
+    parser.add_argument('--corpus', default=os.path.join(os.path.dirname(__file__), 'benchmark_prompts.jsonl'))
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=1, help='Times to run the corpus')
+    parser.add_argument('--agent-id', default=os.environ.get('BEDROCK_AGENT_ID', 'local-agent'))
+    parser.add_argument('--agent-alias-id', default=os.environ.get('BEDROCK_AGENT_ALIAS_ID', 'local-alias'))
+    parser.add_argument('--judge', action='store_true', help='Grade answers with the QA agent')
+    parser.add_argument('--judge-agent-id', default=os.environ.get('JUDGE_AGENT_ID'))
+    parser.add_argument('--judge-agent-alias-id', default=os.environ.get('JUDGE_AGENT_ALIAS_ID'))
+    parser.add_argument('--baseline', help='Baseline JSON path or s3:// URI')
+    parser.add_argument('--update-baseline', action='store_true', help='Store this run as the new baseline')
+    parser.add_argument('--init-baseline', action='store_true',
+                        help='Store this run as the baseline if there is none yet')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative latency/throughput regression')
+    parser.add_argument('--error-rate-tolerance', type=float, default=0.02, help='Allowed absolute error/pass rate change')
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--fake', action='store_true', help='Use FakeAgentRuntime instead of Bedrock')
+    parser.add_argument('--shard', type=parse_shard, help='Run only shard INDEX/COUNT of the corpus')
+    parser.add_argument('--merge', metavar='PREFIX', help='Merge shard results from a directory or s3:// prefix')
+    parser.add_argument('--shards', type=int, help='Number of shards to merge')
+    args = parser.parse_args()
+    if args.merge and not args.shards:
+        parser.error('--merge needs --shards')
+
+    document = {}
+    if args.merge:
+        locations = [shard_location(args.merge, index, args.shards) for index in range(args.shards)]
+        documents = [read_document(location) for location in locations]
+        missing = [location for location, shard in zip(locations, documents) if shard is None]
+        if missing:
+            print(f"Missing shard results: {', '.join(missing)}")
+            return 2
+        summary, results, document['shards'] = merge_shards(documents)
+    else:
+        cases = load_corpus(args.corpus)
+        if args.shard:
+            cases = shard_cases(cases, *args.shard)
+            document['shard'] = '/'.join(map(str, args.shard))
+        cases = cases * args.repeat
+        runtime = agent_runtime(args.fake)
+        judge = agent_runtime(args.fake, responder=lambda text: 'PASS') if args.judge else None
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(lambda case: run_case(case, runtime, judge, args), cases))
+        elapsed = time.perf_counter() - started
+        summary = summarize(results, elapsed, args.concurrency)
+        document['elapsedSeconds'] = round(elapsed, 3)
+
+    baseline = read_document(args.baseline) if args.baseline else None
+    regressions = find_regressions(summary, baseline, args.tolerance, args.error_rate_tolerance) if baseline else []
+
+    write_document(args.output, dict(document, **{
+        'summary': summary,
+        'baseline': baseline,
+        'regressions': regressions,
+        'results': [{k: v for k, v in r.items() if k != 'answer'} for r in results]
+    }))
+    print(json.dumps(summary, indent=2))
+
+    if args.update_baseline and args.baseline:
+        write_document(args.baseline, summary)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+    if baseline is None and args.init_baseline and args.baseline:
+        # Seeding from a failing run would set the bar at the failure
+        if summary['errorRate'] > args.error_rate_tolerance:
+            print(f"No baseline found, and this run's error rate {summary['errorRate']} is too high to record one")
+            return 1
+        write_document(args.baseline, summary)
+        print(f"No baseline found; recorded this run as the baseline: {args.baseline}")
+        return 0
+    if baseline is None:
+        print('No baseline found; skipping regression check')
+        return 0
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
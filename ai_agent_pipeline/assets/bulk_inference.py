@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Offline bulk inference on the AWS Batch job queue.
+
+`submit` splits a prompt file stored in the buildspec bucket into shards,
+writes a manifest next to the results and submits one array job with a child
+per shard. Each child runs `worker`, which answers its shard's prompts
+concurrently against the functional agent, checkpoints progress to S3 after
+every window so a Spot interruption resumes where it stopped, and finally
+writes its results as one compact JSONL object.
+
+Prompt files hold one prompt per line, either as plain text or as JSON
+objects with a `prompt` and an optional `id`.
+
+Layout under the output prefix:
+    manifest.json
+    checkpoints/shard-00000.json
+    parts/shard-00000/part-00000.jsonl   (removed once the shard completes)
+    results/shard-00000.jsonl
+
+Everything runs locally with --local-dir (a directory instead of the bucket)
+and --fake (FakeAgentRuntime instead of Bedrock):
+
+    python bulk_inference.py submit --local-dir /tmp/bulk --input-key prompts.txt \\
+        --output-prefix run-1 --shard-size 100 --fake
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class S3Store:
+    def __init__(self, bucket, client=None):
+        import boto3
+        self.bucket = bucket
+        self.client = client or boto3.client('s3')
+
+    def read_lines(self, key):
+        body = self.client.get_object(Bucket=self.bucket, Key=key)['Body']
+        for line in body.iter_lines():
+            yield line.decode('utf-8')
+
+    def read_json(self, key):
+        try:
+            body = self.client.get_object(Bucket=self.bucket, Key=key)['Body']
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return json.loads(body.read())
+
+    def write(self, key, data):
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data)
+
+    def read(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def list(self, prefix):
+        """Yield (key, etag) for every object under prefix, a page at a time."""
+        for page in self.client.get_paginator('list_objects_v2').paginate(Bucket=self.bucket, Prefix=prefix):
+            for entry in page.get('Contents', []):
+                yield entry['Key'], entry['ETag'].strip('"')
+
+    def download(self, key, path):
+        self.client.download_file(self.bucket, key, path)
+
+    def upload(self, path, key):
+        # Multipart above the transfer threshold, so large index files stream from disk
+        self.client.upload_file(path, self.bucket, key)
+
+
+class LocalStore:
+    """Directory-backed stand-in for S3Store, keyed by relative path."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def read_lines(self, key):
+        with open(self._path(key), encoding='utf-8') as f:
+            for line in f:
+                yield line.rstrip('\n')
+
+    def read_json(self, key):
+        if not os.path.exists(self._path(key)):
+            return None
+        with open(self._path(key), encoding='utf-8') as f:
+            return json.load(f)
+
+    def write(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def read(self, key):
+        with open(self._path(key), 'rb') as f:
+            return f.read()
+
+    def delete(self, key):
+        os.remove(self._path(key))
+
+    def list(self, prefix):
+        """Yield (key, etag) under prefix. The ETag stands in for S3's: it changes when the file does."""
+        for root, dirs, files in os.walk(self.root):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                key = os.path.relpath(path, self.root).replace(os.sep, '/')
+                if key.startswith(prefix):
+                    stat = os.stat(path)
+                    yield key, f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+    def download(self, key, path):
+        shutil.copyfile(self._path(key), path)
+
+    def upload(self, path, key):
+        os.makedirs(os.path.dirname(self._path(key)), exist_ok=True)
+        shutil.copyfile(path, self._path(key))
+
+
+def dump_json(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+def read_prompts(store, key):
+    """Yield (id, prompt) for every non-blank line of the prompt file."""
+    for line_number, line in enumerate(store.read_lines(key)):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('{'):
+            entry = json.loads(line)
+            yield entry.get('id', line_number), entry['prompt']
+        else:
+            yield line_number, line
+
+
+def shard_key(prefix, folder, shard, suffix):
+    return f"{prefix}/{folder}/shard-{shard:05d}{suffix}"
+
+
+def agent_runtime(fake):
+    if fake:
+        from fake_agent_runtime import FakeAgentRuntime
+        return FakeAgentRuntime()
+    import boto3
+    from botocore.config import Config
+    return boto3.client('bedrock-agent-runtime', config=Config(
+        max_pool_connections=64,
+        read_timeout=300,
+        retries={'max_attempts': 8, 'mode': 'adaptive'}
+    ))
+
+
+def answer(runtime, agent_id, agent_alias_id, prompt_id, prompt):
+    start = time.perf_counter()
+    try:
+        response = runtime.invoke_agent(
+            agentId=agent_id,
+            agentAliasId=agent_alias_id,
+            sessionId=str(uuid.uuid4()),
+            inputText=prompt
+        )
+        completion = b''.join(
+            event['chunk']['bytes'] for event in response['completion']
+            if 'chunk' in event and 'bytes' in event['chunk']
+        ).decode('utf-8')
+        result = {'id': prompt_id, 'response': completion}
+    except Exception as e:
+        result = {'id': prompt_id, 'error': str(e)}
+    result['latencyMs'] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+def run_shard(store, manifest, shard, runtime, concurrency, checkpoint_every):
+    """
+    Answer one shard of the prompt file, resuming from its checkpoint.
+    Returns a summary dict with the prompts answered in this run.
+    """
+    prefix = manifest['outputPrefix']
+    checkpoint_key = shard_key(prefix, 'checkpoints', shard, '.json')
+    checkpoint = store.read_json(checkpoint_key) or {'done': 0, 'parts': 0, 'errors': 0}
+    if checkpoint.get('complete'):
+        return {'shard': shard, 'answered': 0, 'resumed': True, 'complete': True}
+
+    start = shard * manifest['shardSize'] + checkpoint['done']
+    stop = min((shard + 1) * manifest['shardSize'], manifest['total'])
+    prompts = itertools.islice(read_prompts(store, manifest['inputKey']), start, stop)
+
+    agent_id = manifest.get('agentId') or os.environ.get('BEDROCK_AGENT_ID', 'local-agent')
+    agent_alias_id = manifest.get('agentAliasId') or os.environ.get('BEDROCK_AGENT_ALIAS_ID', 'local-alias')
+
+    answered = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            window = list(itertools.islice(prompts, checkpoint_every))
+            if not window:
+                break
+            results = list(executor.map(
+                lambda entry: answer(runtime, agent_id, agent_alias_id, *entry),
+                window
+            ))
+            part_key = shard_key(prefix, 'parts', shard, f"/part-{checkpoint['parts']:05d}.jsonl")
+            store.write(part_key, ''.join(dump_json(r) + '\n' for r in results).encode('utf-8'))
+
+            # Only advance the checkpoint once the part is durable
+            checkpoint['done'] += len(window)
+            checkpoint['parts'] += 1
+            checkpoint['errors'] += sum(1 for r in results if 'error' in r)
+            store.write(checkpoint_key, dump_json(checkpoint).encode('utf-8'))
+            answered += len(window)
+
+    # Merge the parts into the final shard object and drop them
+    part_keys = [
+        shard_key(prefix, 'parts', shard, f"/part-{part:05d}.jsonl")
+        for part in range(checkpoint['parts'])
+    ]
+    store.write(shard_key(prefix, 'results', shard, '.jsonl'), b''.join(store.read(k) for k in part_keys))
+    for key in part_keys:
+        store.delete(key)
+    checkpoint['complete'] = True
+    store.write(checkpoint_key, dump_json(checkpoint).encode('utf-8'))
+
+    elapsed = time.perf_counter() - started
+    return {
+        'shard': shard,
+        'answered': answered,
+        'resumed': start > shard * manifest['shardSize'],
+        'errors': checkpoint['errors'],
+        'seconds': round(elapsed, 2),
+        'promptsPerSecond': round(answered / elapsed, 2) if elapsed else None
+    }
+
+
+def open_store(args):
+    if args.local_dir:
+        return LocalStore(args.local_dir)
+    return S3Store(args.bucket or os.environ['ASSET_BUCKET'])
+
+
+def submit(args):
+    store = open_store(args)
+    total = sum(1 for _ in read_prompts(store, args.input_key))
+    shards = max(1, math.ceil(total / args.shard_size))
+    manifest = {
+        'inputKey': args.input_key,
+        'outputPrefix': args.output_prefix,
+        'shardSize': args.shard_size,
+        'shards': shards,
+        'total': total,
+        # Unset IDs fall back to the worker's BEDROCK_AGENT_ID/BEDROCK_AGENT_ALIAS_ID
+        'agentId': args.agent_id,
+        'agentAliasId': args.agent_alias_id
+    }
+    manifest_key = f"{args.output_prefix}/manifest.json"
+    store.write(manifest_key, json.dumps(manifest, indent=2).encode('utf-8'))
+
+    if args.local_dir:
+        # No Batch locally: run the shards one after another in-process
+        runtime = agent_runtime(args.fake)
+        for shard in range(shards):
+            print(json.dumps(run_shard(store, manifest, shard, runtime, args.concurrency, args.checkpoint_every)))
+        return
+
+    import boto3
+    job = {
+        'jobName': f"bulk-inference-{args.output_prefix.replace('/', '-')}"[:128],
+        'jobQueue': args.job_queue or os.environ['BULK_INFERENCE_JOB_QUEUE'],
+        'jobDefinition': args.job_definition or os.environ['BULK_INFERENCE_JOB_DEFINITION'],
+        'parameters': {
+            'manifest': manifest_key,
+            'concurrency': str(args.concurrency)
+        }
+    }
+    # Array jobs need at least two children
+    if shards > 1:
+        job['arrayProperties'] = {'size': shards}
+    response = boto3.client('batch').submit_job(**job)
+    print(json.dumps({'jobId': response['jobId'], 'shards': shards, 'total': total, 'manifest': manifest_key}))
+
+
+def worker(args):
+    store = open_store(args)
+    manifest = store.read_json(args.manifest)
+    shard = args.shard if args.shard is not None else int(os.environ.get('AWS_BATCH_JOB_ARRAY_INDEX', '0'))
+    summary = run_shard(store, manifest, shard, agent_runtime(args.fake), args.concurrency, args.checkpoint_every)
+    print(json.dumps(summary))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline bulk inference on AWS Batch')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--bucket', help='Bucket holding prompts and results (default: $ASSET_BUCKET)')
+    common.add_argument('--local-dir', help='Use a local directory instead of S3')
+    common.add_argument('--fake', action='store_true', help='Answer with FakeAgentRuntime instead of Bedrock')
+    common.add_argument('--concurrency', type=int, default=8)
+    common.add_argument('--checkpoint-every', type=int, default=25, help='Prompts per checkpointed window')
+
+    submit_parser = subparsers.add_parser('submit', parents=[common], help='Shard a prompt file and submit it')
+    submit_parser.add_argument('--input-key', required=True)
+    submit_parser.add_argument('--output-prefix', required=True)
+    submit_parser.add_argument('--shard-size', type=int, default=500)
+    submit_parser.add_argument('--agent-id')
+    submit_parser.add_argument('--agent-alias-id')
+    submit_parser.add_argument('--job-queue')
+    submit_parser.add_argument('--job-definition')
+    submit_parser.set_defaults(func=submit)
+
+    worker_parser = subparsers.add_parser('worker', parents=[common], help='Answer one shard')
+    worker_parser.add_argument('--manifest', required=True)
+    worker_parser.add_argument('--shard', type=int, help='Shard index (default: $AWS_BATCH_JOB_ARRAY_INDEX)')
+    worker_parser.set_defaults(func=worker)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
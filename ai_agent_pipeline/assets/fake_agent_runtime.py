@@ -0,0 +1,153 @@
+"""
+Offline stand-in for the bedrock-agent-runtime client.
+
+FakeAgentRuntime.invoke_agent returns the same response shape as boto3: a dict
+with a sessionId and a `completion` event stream that yields
+{'chunk': {'bytes': ...}} events. The first chunk is delayed to simulate
+time-to-first-chunk and later chunks arrive at a steady pace, so code that
+consumes the stream can be exercised and timed without Bedrock. With
+context_latency set, each session's first chunk also waits in proportion to
+the history the session has built up, like a model re-reading it every turn.
+
+The rest of the knobs make the stream less regular, for load tests:
+
+    jitter          each delay is scaled by a random factor in [1 - jitter, 1 + jitter]
+    chunk_size      an int, or a (min, max) byte range drawn per chunk; chunk
+                    boundaries may split multi-byte UTF-8 characters, as Bedrock's can
+    throttle_rate   share of calls that raise a ThrottlingException ClientError
+    trace_steps     with enableTrace, orchestration steps streamed as {'trace': ...}
+                    events ahead of the answer, in the shape Bedrock uses; the
+                    time to first chunk is spread across them
+"""
+import random
+import threading
+import time
+import uuid
+
+
+class FakeAgentRuntime:
+    def __init__(self, first_chunk_latency=0.2, chunk_latency=0.01, chunks=8, chunk_size=64, responder=None,
+                 context_latency=0, jitter=0, throttle_rate=0, trace_steps=2, seed=None):
+        self.first_chunk_latency = first_chunk_latency
+        self.chunk_latency = chunk_latency
+        self.chunks = chunks
+        self.chunk_size = chunk_size
+        # Optional callable mapping the prompt to the full answer text
+        self.responder = responder
+        # Extra first-chunk seconds per 1000 characters of session history
+        self.context_latency = context_latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.trace_steps = trace_steps
+        self.random = random.Random(seed)
+        self.history = {}
+        self.calls = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def invoke_agent(self, agentId, agentAliasId, inputText, sessionId=None, enableTrace=False, **kwargs):
+        sessionId = sessionId or str(uuid.uuid4())
+        with self._lock:
+            self.calls += 1
+            throttled = self.throttle_rate and self.random.random() < self.throttle_rate
+            if throttled:
+                self.throttled += 1
+        if throttled:
+            raise throttling_error('invoke_agent')
+        return {
+            'sessionId': sessionId,
+            'contentType': 'application/json',
+            'completion': self._stream(inputText, sessionId, agentId, agentAliasId, enableTrace)
+        }
+
+    def _jittered(self, delay):
+        if not self.jitter or not delay:
+            return delay
+        with self._lock:
+            factor = self.random.uniform(1 - self.jitter, 1 + self.jitter)
+        return max(delay * factor, 0)
+
+    def _chunk_size(self):
+        if isinstance(self.chunk_size, int):
+            return self.chunk_size
+        with self._lock:
+            return self.random.randint(*self.chunk_size)
+
+    def _stream(self, input_text, session_id, agent_id='', agent_alias_id='', enable_trace=False):
+        average = self.chunk_size if isinstance(self.chunk_size, int) else sum(self.chunk_size) // 2
+        if self.responder:
+            body = self.responder(input_text).encode('utf-8')
+        else:
+            text = f"Answer to: {input_text} "
+            body = (text * (self.chunks * average // len(text) + 1)).encode('utf-8')
+            body = body[:self.chunks * average]
+        # A callable draws a fresh delay per call, e.g. to simulate a latency tail
+        delay = self.first_chunk_latency
+        delay = delay() if callable(delay) else delay
+        if self.context_latency:
+            with self._lock:
+                history = self.history.get(session_id, 0)
+                self.history[session_id] = history + len(input_text) + len(body)
+            delay += self.context_latency * history / 1000
+        delay = self._jittered(delay)
+        if enable_trace and self.trace_steps:
+            yield from self._trace(session_id, agent_id, agent_alias_id, input_text, delay)
+        else:
+            pause(delay)
+        offset = 0
+        while offset < len(body):
+            if offset:
+                pause(self._jittered(self.chunk_latency))
+            size = self._chunk_size()
+            yield {'chunk': {'bytes': body[offset:offset + size]}}
+            offset += size
+
+    def _trace(self, session_id, agent_id, agent_alias_id, input_text, delay):
+        """Model and action-group steps as orchestration trace events, spending delay between them."""
+        step_delay = delay / (self.trace_steps * 2)
+        for step in range(self.trace_steps):
+            trace_id = f"{session_id}-{step}"
+            model_trace = f"{trace_id}-model"
+            yield trace_event(session_id, agent_id, agent_alias_id, {'modelInvocationInput': {
+                'traceId': model_trace, 'type': 'ORCHESTRATION', 'text': input_text
+            }})
+            pause(step_delay)
+            yield trace_event(session_id, agent_id, agent_alias_id, {'modelInvocationOutput': {
+                'traceId': model_trace,
+                'metadata': {'usage': {'inputTokens': 400 + len(input_text) // 4, 'outputTokens': 60}}
+            }})
+            if step + 1 < self.trace_steps:
+                yield trace_event(session_id, agent_id, agent_alias_id, {'invocationInput': {
+                    'traceId': trace_id, 'invocationType': 'ACTION_GROUP',
+                    'actionGroupInvocationInput': {'actionGroupName': 'tools', 'apiPath': '/knowledge_base'}
+                }})
+                pause(step_delay)
+                yield trace_event(session_id, agent_id, agent_alias_id, {'observation': {
+                    'traceId': trace_id, 'type': 'ACTION_GROUP'
+                }})
+            else:
+                pause(step_delay)
+
+
+def pause(seconds):
+    # sleep(0) still yields the GIL, which would show up in zero-latency profiles
+    if seconds > 0:
+        time.sleep(seconds)
+
+
+def trace_event(session_id, agent_id, agent_alias_id, step):
+    return {'trace': {
+        'agentId': agent_id,
+        'agentAliasId': agent_alias_id,
+        'sessionId': session_id,
+        'trace': {'orchestrationTrace': step}
+    }}
+
+
+def throttling_error(operation):
+    """The ClientError boto3 raises when Bedrock throttles a call."""
+    from botocore.exceptions import ClientError
+    return ClientError({
+        'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'},
+        'ResponseMetadata': {'HTTPStatusCode': 429}
+    }, operation)
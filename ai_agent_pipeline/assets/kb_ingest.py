@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+"""
+Incremental knowledge-base ingestion on the AWS Batch job queue.
+
+Streams the text documents under a prefix of the buildspec bucket, splits
+them into chunks, embeds what is new in batches and publishes an index in
+the layout lambda/tools/knowledge_base.py memory-maps. Every run publishes a
+new generation and then moves current.json to it, so a function that is
+downloading the previous generation never sees a half-written index.
+
+Layout under the index prefix:
+    current.json                   {"generation": G, "path": ".../g0000G", "bytes": B, ...}
+    g0000G/index.json, embeddings.f32, chunks.jsonl, offsets.u64
+    g0000G/documents.json          per document: ETag, content hash, rows, chunk hashes
+    staging/checkpoint.json        progress of an unfinished run
+    staging/part-00000.f32/.json   embedded rows not yet published
+
+Work is skipped at three levels. An object whose ETag is unchanged is not
+downloaded. An object with a new ETag but the same content hash keeps its
+rows. A changed document only embeds the chunks whose text is new; the
+others reuse their vectors. When only new documents arrive their rows are
+appended to the previous generation's files. Changed or deleted documents
+compact the index instead, which copies live rows but never re-embeds them.
+
+Embedded rows are checkpointed as parts every --checkpoint-every documents,
+so a run interrupted by a Spot reclaim resumes after its last part.
+
+Everything runs locally with --local-dir (a directory instead of the bucket)
+and --fake (a deterministic hashing embedder instead of Bedrock):
+
+    python kb_ingest.py --local-dir /tmp/kb --fake
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from bulk_inference import LocalStore, S3Store, dump_json
+
+# Plain-text formats; other objects under the prefix are counted and skipped
+TEXT_SUFFIXES = ('.txt', '.md', '.markdown', '.csv', '.log')
+
+INDEX_FILES = ('embeddings.f32', 'chunks.jsonl', 'offsets.u64', 'documents.json', 'index.json')
+
+
+class BedrockEmbedder:
+    """
+    Titan text embeddings, the model the knowledge_base tool embeds queries
+    with. Titan takes one text per request, so a batch is a bounded
+    concurrent fan-out over a pooled client.
+    """
+
+    def __init__(self, model_id, dimension, concurrency=8, client=None):
+        self.model = model_id
+        self.dimension = dimension
+        self.concurrency = concurrency
+        if client is None:
+            import boto3
+            from botocore.config import Config
+            client = boto3.client('bedrock-runtime', config=Config(
+                max_pool_connections=max(10, concurrency),
+                retries={'max_attempts': 8, 'mode': 'adaptive'}
+            ))
+        self.client = client
+        self.texts = 0
+
+    def embed_one(self, text):
+        response = self.client.invoke_model(
+            modelId=self.model,
+            contentType='application/json',
+            accept='application/json',
+            body=json.dumps({'inputText': text, 'dimensions': self.dimension, 'normalize': True})
+        )
+        return json.loads(response['body'].read())['embedding']
+
+    def embed(self, texts):
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            rows = list(executor.map(self.embed_one, texts))
+        self.texts += len(texts)
+        return np.asarray(rows, dtype=np.float32).reshape(len(texts), self.dimension)
+
+
+class FakeEmbedder:
+    """Hashed bag-of-words vectors, so local searches rank chunks by the words they share with the query."""
+
+    def __init__(self, dimension=256, model='fake-hashing-embedder'):
+        self.model = model
+        self.dimension = dimension
+        self.texts = 0
+
+    def embed(self, texts):
+        rows = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r'\w+', text.lower()):
+                rows[row, zlib.crc32(word.encode('utf-8')) % self.dimension] += 1
+        self.texts += len(texts)
+        return rows
+
+
+def normalize(rows):
+    rows = np.asarray(rows, dtype=np.float32)
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return rows / norms
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+
+def paragraphs(lines):
+    """Group a stream of lines into blank-line separated paragraphs."""
+    current = []
+    for line in lines:
+        if line.strip():
+            current.append(line.strip())
+        elif current:
+            yield ' '.join(current)
+            current = []
+    if current:
+        yield ' '.join(current)
+
+
+def chunk_text(lines, max_chars=1500):
+    """
+    Yield chunks of whole paragraphs up to max_chars from a stream of lines.
+    A paragraph longer than max_chars is split at word boundaries. Only the
+    chunk being built is held in memory, whatever the document size.
+    """
+    chunk = ''
+    for paragraph in paragraphs(lines):
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(' ', 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if chunk:
+                yield chunk
+                chunk = ''
+            yield paragraph[:cut]
+            paragraph = paragraph[cut:].lstrip()
+        if chunk and len(chunk) + 2 + len(paragraph) > max_chars:
+            yield chunk
+            chunk = ''
+        chunk = f"{chunk}\n\n{paragraph}" if chunk else paragraph
+    if chunk:
+        yield chunk
+
+
+def hashed(lines, digest):
+    """Pass lines through, feeding them to digest, so the content hash costs no second read."""
+    for line in lines:
+        digest.update(line.encode('utf-8') + b'\n')
+        yield line
+
+
+class IndexWriter:
+    """Writes rows in the knowledge_base index layout, to new files or appended to existing ones."""
+
+    def __init__(self, directory, dimension, model, append=False):
+        self.directory = directory
+        self.dimension = dimension
+        self.model = model
+        os.makedirs(directory, exist_ok=True)
+        mode = 'ab' if append else 'wb'
+        self.count = read_manifest(directory)['count'] if append else 0
+        self.embeddings = open(os.path.join(directory, 'embeddings.f32'), mode)
+        self.chunks = open(os.path.join(directory, 'chunks.jsonl'), mode)
+        self.offsets = open(os.path.join(directory, 'offsets.u64'), mode)
+
+    def add(self, rows, chunk_bytes, offsets):
+        """Append rows with their chunk lines; offsets are relative to the start of chunk_bytes."""
+        position = self.chunks.tell()
+        np.asarray(rows, dtype=np.float32).reshape(-1, self.dimension).tofile(self.embeddings)
+        (np.asarray(offsets, dtype=np.uint64) + np.uint64(position)).tofile(self.offsets)
+        self.chunks.write(chunk_bytes)
+        start = self.count
+        self.count += len(offsets)
+        return start
+
+    def add_chunks(self, rows, chunks):
+        lines = [json.dumps(chunk, separators=(',', ':')).encode('utf-8') + b'\n' for chunk in chunks]
+        offsets = np.cumsum([0] + [len(line) for line in lines[:-1]]) if lines else []
+        return self.add(rows, b''.join(lines), offsets)
+
+    def close(self, documents):
+        for f in (self.embeddings, self.chunks, self.offsets):
+            f.close()
+        with open(os.path.join(self.directory, 'documents.json'), 'w', encoding='utf-8') as f:
+            json.dump(documents, f, separators=(',', ':'))
+        # Written last: the index is only complete once its manifest is
+        with open(os.path.join(self.directory, 'index.json'), 'w', encoding='utf-8') as f:
+            json.dump({'dimension': self.dimension, 'count': self.count, 'model': self.model}, f)
+
+
+class BaseIndex:
+    """The published generation a run builds on, downloaded to a work directory."""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.documents = {}
+        self.count = 0
+        self.embeddings = None
+        self.rows = {}
+        if directory is None:
+            return
+        manifest = read_manifest(directory)
+        with open(os.path.join(directory, 'documents.json'), encoding='utf-8') as f:
+            self.documents = json.load(f)
+        self.count = manifest['count']
+        self.dimension = manifest['dimension']
+        self.model = manifest.get('model')
+        if self.count:
+            self.embeddings = np.memmap(os.path.join(directory, 'embeddings.f32'), dtype=np.float32,
+                                        mode='r', shape=(self.count, self.dimension))
+            self.offsets = np.memmap(os.path.join(directory, 'offsets.u64'), dtype=np.uint64,
+                                     mode='r', shape=(self.count,))
+            with open(os.path.join(directory, 'chunks.jsonl'), 'rb') as f:
+                self.chunks = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Vectors by chunk text hash, so edited documents only embed the chunks that changed
+        for document in self.documents.values():
+            for row, chunk in enumerate(document['chunks']):
+                self.rows[chunk] = document['start'] + row
+
+    def chunk_bytes(self, start, count):
+        """Raw chunks.jsonl lines and their relative offsets for rows [start, start + count)."""
+        begin = int(self.offsets[start])
+        end = int(self.offsets[start + count]) if start + count < self.count else len(self.chunks)
+        return self.chunks[begin:end], np.asarray(self.offsets[start:start + count]) - np.uint64(begin)
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, 'index.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def generation_path(index_prefix, generation):
+    return f"{index_prefix}/g{generation:05d}"
+
+
+def part_key(index_prefix, part, suffix):
+    return f"{index_prefix}/staging/part-{part:05d}{suffix}"
+
+
+def list_documents(store, prefix):
+    """(key, etag) for the text documents under prefix, and the number of other objects skipped."""
+    documents, skipped = [], 0
+    for key, etag in store.list(prefix):
+        if key.endswith('/'):
+            continue
+        if key.lower().endswith(TEXT_SUFFIXES):
+            documents.append((key, etag))
+        else:
+            skipped += 1
+    return documents, skipped
+
+
+def read_document(store, key, max_chars):
+    """Stream one object into chunks, hashing it on the way. Returns (sha256, [chunk text])."""
+    digest = hashlib.sha256()
+    chunks = list(chunk_text(hashed(store.read_lines(key), digest), max_chars))
+    return digest.hexdigest(), chunks
+
+
+def embed_window(window, base, embedder, batch_size):
+    """
+    Rows for the chunks of a window of documents, in order. Chunks seen in
+    the base index or earlier in the window are copied; the rest are
+    embedded batch_size texts at a time.
+    """
+    vectors = {}
+    pending = []
+    for document in window:
+        for text, chunk in zip(document['texts'], document['chunks']):
+            if chunk not in vectors and chunk not in base.rows:
+                vectors[chunk] = None
+                pending.append((chunk, text))
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        for (chunk, _), row in zip(batch, normalize(embedder.embed([text for _, text in batch]))):
+            vectors[chunk] = row
+    rows = [
+        vectors[chunk] if vectors.get(chunk) is not None else base.embeddings[base.rows[chunk]]
+        for document in window for chunk in document['chunks']
+    ]
+    return np.asarray(rows, dtype=np.float32).reshape(-1, embedder.dimension), len(pending)
+
+
+def load_parts(store, index_prefix, parts, work_dir):
+    """Yield (part document, rows) for the checkpointed parts of this run."""
+    for part in range(parts):
+        path = os.path.join(work_dir, f"part-{part:05d}.f32")
+        store.download(part_key(index_prefix, part, '.f32'), path)
+        yield store.read_json(part_key(index_prefix, part, '.json')), np.fromfile(path, dtype=np.float32)
+
+
+def publish(store, index_prefix, base, generation, parts, listed, dimension, model, work_dir):
+    """
+    Write the next generation from the base index and this run's parts and
+    make it current. Returns 'create', 'append' or 'compact'.
+    """
+    # Later parts win: a document edited again while a run was resumed is embedded twice
+    updates = {}
+    new_rows = {}
+    for part, rows in load_parts(store, index_prefix, parts, work_dir):
+        rows = rows.reshape(-1, dimension)
+        position = 0
+        for document in part['documents']:
+            count = 0 if document.get('reuse') else len(document['chunks'])
+            updates[document['key']] = document
+            new_rows[document['key']] = (rows[position:position + count], part['chunks'][position:position + count])
+            position += count
+
+    replaced = [key for key, document in updates.items() if key in base.documents and not document.get('reuse')]
+    removed = [key for key in base.documents if key not in listed]
+    compact = bool(replaced or removed) or base.directory is None
+    directory = os.path.join(work_dir, 'next') if compact else base.directory
+    writer = IndexWriter(directory, dimension, model, append=not compact)
+
+    documents = {}
+    for key, document in base.documents.items():
+        if key in removed or key in replaced:
+            continue
+        entry = dict(document)
+        if key in updates:
+            entry['etag'] = updates[key]['etag']
+        if compact and entry['count']:
+            chunk_bytes, offsets = base.chunk_bytes(document['start'], document['count'])
+            entry['start'] = writer.add(base.embeddings[document['start']:document['start'] + document['count']],
+                                        chunk_bytes, offsets)
+        documents[key] = entry
+    for key, document in updates.items():
+        if document.get('reuse') or key not in listed:
+            continue
+        rows, chunks = new_rows[key]
+        documents[key] = {
+            'etag': document['etag'],
+            'sha256': document['sha256'],
+            'start': writer.add_chunks(rows, chunks),
+            'count': len(chunks),
+            'chunks': document['chunks']
+        }
+    writer.close(documents)
+
+    path = generation_path(index_prefix, generation)
+    for name in INDEX_FILES:
+        store.upload(os.path.join(directory, name), f"{path}/{name}")
+    store.write(f"{index_prefix}/current.json", json.dumps({
+        'generation': generation,
+        'path': path,
+        # Readers check this against their free /tmp space before downloading
+        'bytes': sum(os.path.getsize(os.path.join(directory, name)) for name in INDEX_FILES),
+        'count': writer.count,
+        'documents': len(documents),
+        'dimension': dimension,
+        'model': model
+    }, indent=2).encode('utf-8'))
+    if base.directory is None:
+        return 'create'
+    return 'compact' if compact else 'append'
+
+
+def clean_up(store, index_prefix, generation):
+    """Drop staging and every generation older than the previous one, which readers may still be fetching."""
+    for key, _ in list(store.list(f"{index_prefix}/")):
+        relative = key[len(index_prefix) + 1:]
+        if relative.startswith('staging/'):
+            store.delete(key)
+        elif re.match(r'g\d{5}/', relative) and int(relative[1:6]) < generation - 1:
+            store.delete(key)
+
+
+def ingest(store, documents_prefix, index_prefix, embedder, work_dir,
+           batch_size=32, checkpoint_every=50, max_chars=1500):
+    """Bring the index under index_prefix up to date with documents_prefix. Returns a summary dict."""
+    started = time.perf_counter()
+    current = store.read_json(f"{index_prefix}/current.json")
+    base_generation = current['generation'] if current else 0
+    base = BaseIndex()
+    if current:
+        base_dir = os.path.join(work_dir, 'base')
+        os.makedirs(base_dir, exist_ok=True)
+        for name in INDEX_FILES:
+            store.download(f"{current['path']}/{name}", os.path.join(base_dir, name))
+        base = BaseIndex(base_dir)
+        if (base.model, base.dimension) != (embedder.model, embedder.dimension):
+            # Vectors from another model are not comparable with new ones: re-embed everything
+            print(f"Index was built with {base.model} ({base.dimension}d); rebuilding with {embedder.model}")
+            base = BaseIndex()
+
+    # A checkpoint only resumes on top of the generation it started from
+    checkpoint = store.read_json(f"{index_prefix}/staging/checkpoint.json")
+    if not checkpoint or checkpoint['base'] != base_generation:
+        checkpoint = {'base': base_generation, 'parts': 0, 'done': {}}
+    resumed = checkpoint['parts']
+
+    listed, skipped = list_documents(store, documents_prefix)
+    keys = {key for key, _ in listed}
+    changed = [
+        (key, etag) for key, etag in sorted(listed)
+        if base.documents.get(key, {}).get('etag') != etag and checkpoint['done'].get(key) != etag
+    ]
+    summary = {
+        'documents': len(listed),
+        'skippedObjects': skipped,
+        'unchanged': len(listed) - len(changed),
+        'resumedParts': resumed,
+        'sameContent': 0,
+        'embedded': 0,
+        'reusedChunks': 0,
+        'failed': 0,
+        'removed': sum(1 for key in base.documents if key not in keys)
+    }
+
+    for start in range(0, len(changed), checkpoint_every):
+        window = []
+        for key, etag in changed[start:start + checkpoint_every]:
+            try:
+                sha256, texts = read_document(store, key, max_chars)
+            except (UnicodeDecodeError, store_errors(store)) as e:
+                print(f"Skipping {key}: {e}")
+                summary['failed'] += 1
+                continue
+            if base.documents.get(key, {}).get('sha256') == sha256:
+                window.append({'key': key, 'etag': etag, 'sha256': sha256, 'reuse': True})
+                summary['sameContent'] += 1
+                continue
+            window.append({'key': key, 'etag': etag, 'sha256': sha256, 'texts': texts,
+                           'chunks': [text_hash(text) for text in texts]})
+        embedding = [document for document in window if not document.get('reuse')]
+        rows, embedded = embed_window(embedding, base, embedder, batch_size)
+        summary['embedded'] += embedded
+        summary['reusedChunks'] += sum(len(document['chunks']) for document in embedding) - embedded
+
+        part = checkpoint['parts']
+        path = os.path.join(work_dir, f"part-{part:05d}.f32")
+        rows.tofile(path)
+        store.upload(path, part_key(index_prefix, part, '.f32'))
+        store.write(part_key(index_prefix, part, '.json'), dump_json({
+            'documents': [{k: v for k, v in document.items() if k != 'texts'} for document in window],
+            'chunks': [
+                {'id': f"{document['key']}#{number}", 'source': document['key'], 'text': text}
+                for document in embedding for number, text in enumerate(document['texts'])
+            ]
+        }).encode('utf-8'))
+        # Only advance the checkpoint once the part is durable
+        checkpoint['parts'] += 1
+        checkpoint['done'].update({document['key']: document['etag'] for document in window})
+        store.write(f"{index_prefix}/staging/checkpoint.json", dump_json(checkpoint).encode('utf-8'))
+
+    if not checkpoint['parts'] and not summary['removed']:
+        summary.update(mode='unchanged', generation=base_generation, seconds=round(time.perf_counter() - started, 2))
+        return summary
+
+    generation = base_generation + 1
+    summary['mode'] = publish(store, index_prefix, base, generation, checkpoint['parts'], keys,
+                              embedder.dimension, embedder.model, work_dir)
+    clean_up(store, index_prefix, generation)
+    summary.update(generation=generation, seconds=round(time.perf_counter() - started, 2))
+    return summary
+
+
+def store_errors(store):
+    """Per-object read errors that should skip a document rather than fail the run."""
+    if isinstance(store, S3Store):
+        return store.client.exceptions.NoSuchKey
+    return FileNotFoundError
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental knowledge-base ingestion')
+    parser.add_argument('--bucket', help='Bucket holding documents and the index (default: $ASSET_BUCKET)')
+    parser.add_argument('--local-dir', help='Use a local directory instead of S3')
+    parser.add_argument('--documents-prefix', default='knowledge-base/documents/')
+    parser.add_argument('--index-prefix', default='knowledge-base/index')
+    parser.add_argument('--model', default=os.environ.get('KNOWLEDGE_BASE_EMBEDDING_MODEL', 'amazon.titan-embed-text-v2:0'))
+    parser.add_argument('--dimension', type=int, default=int(os.environ.get('KNOWLEDGE_BASE_EMBEDDING_DIMENSION', '1024')))
+    parser.add_argument('--batch-size', type=int, default=32, help='Chunks embedded per batch')
+    parser.add_argument('--concurrency', type=int, default=8, help='Embedding requests in flight per batch')
+    parser.add_argument('--checkpoint-every', type=int, default=50, help='Documents per checkpointed part')
+    parser.add_argument('--max-chars', type=int, default=1500, help='Maximum characters per chunk')
+    parser.add_argument('--fake', action='store_true', help='Embed with FakeEmbedder instead of Bedrock')
+    args = parser.parse_args()
+
+    store = LocalStore(args.local_dir) if args.local_dir else S3Store(args.bucket or os.environ['ASSET_BUCKET'])
+    embedder = FakeEmbedder(args.dimension) if args.fake else BedrockEmbedder(args.model, args.dimension, args.concurrency)
+    work_dir = tempfile.mkdtemp(prefix='kb-ingest-')
+    try:
+        summary = ingest(store, args.documents_prefix, args.index_prefix.rstrip('/'), embedder, work_dir,
+                         args.batch_size, args.checkpoint_every, args.max_chars)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(json.dumps(summary))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+import fnmatch
+import hashlib
+import os
+import shutil
+import subprocess
+
+import jsii
+from aws_cdk import (
+    AssetHashType,
+    BundlingOptions,
+    ILocalBundling,
+    aws_lambda as lambda_,
+)
+from constructs import Construct
+
+# Bump to rebundle every asset after changing how bundles are built
+BUNDLING_VERSION = "2"
+
+# Never shipped: caches, bytecode from other interpreters, tests and editor litter
+EXCLUDE = [
+    "__pycache__", ".pytest_cache", "*.pyc", "*.pyo", ".DS_Store",
+    "tests", "test", "conftest.py", "test_*.py", "*_test.py"
+]
+
+# Wheels for the Lambda execution environment, whatever machine synthesizes the app
+LAYER_PLATFORM = "manylinux2014_x86_64"
+
+
+@jsii.implements(ILocalBundling)
+class PrecompiledPythonBundling:
+    """
+    Copies a Lambda source directory and precompiles it to bytecode with the
+    runtime's own Python version. Bytecode uses unchecked-hash invalidation so
+    the read-only /var/task copy is loaded as-is instead of being recompiled on
+    every cold start.
+
+    Bundles locally when a matching interpreter (e.g. python3.9) is on PATH,
+    otherwise defers to the runtime's bundling image through Docker. Without
+    either, the sources are copied unchanged and Python compiles at import.
+    """
+
+    def __init__(self, source_dir: str, runtime: lambda_.Runtime) -> None:
+        self.source_dir = source_dir
+        self.runtime = runtime
+
+    def try_bundle(self, output_dir: str, *, image=None, **kwargs) -> bool:
+        interpreter = find_interpreter(self.runtime.name)
+        if interpreter is None and shutil.which("docker"):
+            return False
+        shutil.copytree(self.source_dir, output_dir, dirs_exist_ok=True, ignore=ignore_build_files)
+        if interpreter is None:
+            print(f"{self.runtime.name} and docker not found; bundling {self.source_dir} without bytecode")
+            return True
+        compile_bytecode(interpreter, output_dir)
+        return True
+
+
+@jsii.implements(ILocalBundling)
+class DependencyLayerBundling:
+    """
+    Installs a pinned requirements.txt into python/ for a Lambda layer, using
+    wheels for the Lambda platform and runtime so it works from any machine,
+    then strips tests and caches and precompiles like PrecompiledPythonBundling.
+    Defers to the runtime's bundling image through Docker when pip fails locally.
+
+    pip evaluates environment markers against the interpreter running it, not
+    the target runtime, so dependencies are not resolved here (--no-deps):
+    requirements.txt must pin the complete set for the runtime.
+    """
+
+    def __init__(self, source_dir: str, runtime: lambda_.Runtime) -> None:
+        self.source_dir = source_dir
+        self.runtime = runtime
+
+    def try_bundle(self, output_dir: str, *, image=None, **kwargs) -> bool:
+        target = os.path.join(output_dir, "python")
+        install = subprocess.run(
+            [
+                "pip", "install", "--quiet", "--no-deps", "--no-compile",
+                "--requirement", os.path.join(self.source_dir, "requirements.txt"),
+                "--target", target,
+                "--platform", LAYER_PLATFORM,
+                "--implementation", "cp",
+                "--python-version", self.runtime.name.replace("python", ""),
+                "--only-binary=:all:"
+            ]
+        )
+        if install.returncode != 0:
+            if shutil.which("docker"):
+                shutil.rmtree(target, ignore_errors=True)
+                return False
+            raise RuntimeError(f"Could not install {self.source_dir}/requirements.txt for the dependency layer")
+        prune(target)
+        interpreter = find_interpreter(self.runtime.name)
+        if interpreter is not None:
+            compile_bytecode(interpreter, target)
+        return True
+
+
+def find_interpreter(name):
+    """Path of a working interpreter called name, or None. Skips dangling version-manager shims."""
+    path = shutil.which(name)
+    if path is None:
+        return None
+    probe = subprocess.run([path, "-c", "pass"], capture_output=True)
+    return path if probe.returncode == 0 else None
+
+
+def compile_bytecode(interpreter, directory):
+    subprocess.run(
+        [interpreter, "-m", "compileall", "-q", "--invalidation-mode", "unchecked-hash", directory],
+        check=True
+    )
+
+
+def excluded(name):
+    return any(fnmatch.fnmatch(name, pattern) for pattern in EXCLUDE)
+
+
+def ignore_build_files(directory, names):
+    return [name for name in names if excluded(name)]
+
+
+def prune(directory):
+    """Delete excluded files and directories, and console scripts, from an installed package tree."""
+    shutil.rmtree(os.path.join(directory, "bin"), ignore_errors=True)
+    for root, dirs, files in os.walk(directory):
+        for name in [name for name in dirs if excluded(name)]:
+            shutil.rmtree(os.path.join(root, name))
+            dirs.remove(name)
+        for name in files:
+            if excluded(name):
+                os.remove(os.path.join(root, name))
+
+
+def source_hash(source_dir, *salt):
+    """
+    Hash of the files that end up in the bundle, plus salt. Unlike the default
+    output hash it is known before bundling, so CDK can skip rebundling and
+    re-uploading unchanged code, and it does not depend on which machine or
+    bundling path produced the bytecode.
+    """
+    digest = hashlib.sha256("\0".join((BUNDLING_VERSION,) + salt).encode("utf-8"))
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(name for name in dirs if not excluded(name))
+        for name in sorted(files):
+            if excluded(name):
+                continue
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, source_dir).replace(os.sep, "/").encode("utf-8") + b"\0")
+            with open(path, "rb") as f:
+                digest.update(f.read())
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def precompiled_code(source_dir: str, runtime: lambda_.Runtime) -> lambda_.Code:
+    """Asset code for source_dir with bytecode compiled for runtime."""
+    return lambda_.Code.from_asset(
+        source_dir,
+        asset_hash_type=AssetHashType.CUSTOM,
+        asset_hash=source_hash(source_dir, runtime.name),
+        bundling=BundlingOptions(
+            image=runtime.bundling_image,
+            local=PrecompiledPythonBundling(source_dir, runtime),
+            command=[
+                "bash", "-c",
+                "cp -r /asset-input/. /asset-output/"
+                " && find /asset-output \\( -name __pycache__ -o -name .pytest_cache -o -name tests -o -name test \\)"
+                " -prune -exec rm -rf {} +"
+                " && find /asset-output \\( -name '*.py[co]' -o -name 'test_*.py' -o -name '*_test.py'"
+                " -o -name conftest.py -o -name .DS_Store \\) -delete"
+                " && python -m compileall -q --invalidation-mode unchecked-hash /asset-output"
+            ]
+        )
+    )
+
+
+def dependency_layer(scope: Construct, construct_id: str, source_dir: str,
+                     runtime: lambda_.Runtime) -> lambda_.LayerVersion:
+    """
+    Layer with the third-party packages pinned in source_dir/requirements.txt,
+    shared by the functions that need them. Keyed on the requirements file, so
+    the packages are only downloaded, bundled and uploaded when it changes.
+    """
+    return lambda_.LayerVersion(
+        scope, construct_id,
+        code=lambda_.Code.from_asset(
+            source_dir,
+            asset_hash_type=AssetHashType.CUSTOM,
+            asset_hash=source_hash(source_dir, runtime.name, LAYER_PLATFORM),
+            bundling=BundlingOptions(
+                image=runtime.bundling_image,
+                local=DependencyLayerBundling(source_dir, runtime),
+                command=[
+                    "bash", "-c",
+                    "pip install --quiet --no-deps --no-compile -r requirements.txt -t /asset-output/python"
+                    " && rm -rf /asset-output/python/bin"
+                    " && find /asset-output \\( -name __pycache__ -o -name tests -o -name test \\)"
+                    " -prune -exec rm -rf {} +"
+                    " && python -m compileall -q --invalidation-mode unchecked-hash /asset-output/python"
+                ]
+            )
+        ),
+        compatible_runtimes=[runtime],
+        description=f"Third-party packages from {source_dir}/requirements.txt"
+    )
@@ -0,0 +1,240 @@
+from constructs import Construct
+import os
+
+from aws_cdk import (
+    Stack,
+    aws_s3 as s3,
+    aws_batch as batch,
+    aws_iam as iam,
+    aws_ec2 as ec2,
+    aws_s3_deployment as s3deploy,
+    RemovalPolicy,
+    Duration,
+    CfnOutput
+)
+from ai_agent_pipeline.agents_stack import AgentsStack
+from ai_agent_pipeline.bundling import EXCLUDE
+
+# Where kb_ingest.py reads documents from and publishes the knowledge-base index to
+KNOWLEDGE_BASE_DOCUMENTS = "knowledge-base/documents/"
+KNOWLEDGE_BASE_INDEX = "knowledge-base/index"
+
+
+class ComputeStack(Stack):
+    """
+    Batch compute environment with the bulk inference and knowledge-base
+    ingestion jobs that run on it, plus the assets bucket holding the pipeline
+    assets, test data, bulk inference inputs and results, and the knowledge
+    base documents and index.
+    """
+
+    def __init__(self, scope: Construct, construct_id: str, *, vpc: ec2.IVpc, security_group: ec2.ISecurityGroup,
+                 agents: AgentsStack, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        __dirname = os.path.dirname(os.path.realpath(__file__))
+
+        # Create IAM roles
+        batch_service_role = iam.Role(
+            self, "BatchServiceRole",
+            assumed_by=iam.ServicePrincipal("batch.amazonaws.com"),
+            managed_policies=[
+                iam.ManagedPolicy.from_aws_managed_policy_name("service-role/AWSBatchServiceRole")
+            ]
+        )
+
+        # Create instance profile for EC2 instances
+        batch_instance_role = iam.Role(
+            self, "BatchInstanceRole",
+            assumed_by=iam.ServicePrincipal("ec2.amazonaws.com"),
+            managed_policies=[
+                iam.ManagedPolicy.from_aws_managed_policy_name("service-role/AmazonEC2ContainerServiceforEC2Role")
+            ]
+        )
+        # Add this after creating the other IAM roles
+        spot_fleet_role = iam.Role(
+            self, "SpotFleetRole",
+            assumed_by=iam.ServicePrincipal("spotfleet.amazonaws.com"),
+            managed_policies=[
+                iam.ManagedPolicy.from_aws_managed_policy_name("service-role/AmazonEC2SpotFleetTaggingRole")
+            ]
+        )
+
+
+        batch_instance_profile = iam.CfnInstanceProfile(
+            self, "BatchInstanceProfile",
+            roles=[batch_instance_role.role_name]
+        )
+
+        # Your existing S3 bucket creation
+        buildspec_bucket = s3.Bucket(
+            self, "BuildspecBucket",
+            versioned=True,
+            encryption=s3.BucketEncryption.S3_MANAGED,
+            removal_policy=RemovalPolicy.DESTROY,
+            enforce_ssl=True,
+            lifecycle_rules=[
+                # Per-commit shard results are only read by the merge build of the same batch
+                s3.LifecycleRule(
+                    prefix="benchmarks/runs/",
+                    expiration=Duration.days(14),
+                    noncurrent_version_expiration=Duration.days(1)
+                )
+            ]
+        )
+
+        # Copy the asset to the buildspec bucket
+        deployment = s3deploy.BucketDeployment(self, "DeployFiles",
+            # Local caches would change the asset hash and trigger a re-upload on every deploy
+            sources=[s3deploy.Source.asset(f"{__dirname}/../ai_agent_pipeline/assets/", exclude=EXCLUDE)],
+            destination_bucket=buildspec_bucket,
+            # The bucket also holds the benchmark baseline and bulk inference results
+            prune=False
+        )
+
+        # Create Batch compute environment with the new resources
+        compute_environment = batch.CfnComputeEnvironment(
+            self, "BatchCompute",
+            type="MANAGED",
+            compute_resources={
+                "type": "SPOT",
+                "maxvCpus": 16,
+                "minvCpus": 0,
+                "subnets": [subnet.subnet_id for subnet in vpc.private_subnets],
+                "securityGroupIds": [security_group.security_group_id],
+                "instanceTypes": ["optimal"],
+                "instanceRole": batch_instance_profile.attr_arn,
+                "spotIamFleetRole": spot_fleet_role.role_arn,  # Add this line
+                "bidPercentage": 60  # Optional: maximum percentage of On-Demand price to bid
+            },
+            service_role=batch_service_role.role_arn,
+            state="ENABLED"
+        )
+
+        # Create Batch job queue
+        job_queue = batch.CfnJobQueue(
+            self, "BatchQueue",
+            compute_environment_order=[{
+                "computeEnvironment": compute_environment.attr_compute_environment_arn,
+                "order": 1
+            }],
+            priority=1,
+            state="ENABLED"
+        )
+
+        # Job role for bulk inference workers: read prompts, write results and invoke the agent
+        bulk_inference_role = iam.Role(
+            self, "BulkInferenceJobRole",
+            assumed_by=iam.ServicePrincipal("ecs-tasks.amazonaws.com"),
+            description="IAM role for offline bulk inference Batch jobs"
+        )
+        buildspec_bucket.grant_read_write(bulk_inference_role)
+        bulk_inference_role.add_to_policy(iam.PolicyStatement(
+            actions=["bedrock:InvokeAgent"],
+            resources=["*"]
+        ))
+
+        # Bulk inference job definition - submitted as an array job with one child per shard
+        # by ai_agent_pipeline/assets/bulk_inference.py, which BucketDeployment copies to the bucket
+        bulk_inference_job = batch.CfnJobDefinition(
+            self, "BulkInferenceJob",
+            type="container",
+            parameters={
+                "manifest": "",
+                "concurrency": "8"
+            },
+            container_properties={
+                "image": "public.ecr.aws/docker/library/python:3.11-slim",
+                "jobRoleArn": bulk_inference_role.role_arn,
+                "resourceRequirements": [
+                    {"type": "VCPU", "value": "1"},
+                    {"type": "MEMORY", "value": "2048"}
+                ],
+                "command": [
+                    "sh", "-c",
+                    "pip install --quiet boto3"
+                    " && python -c \"import boto3, os; boto3.client('s3').download_file("
+                    "os.environ['ASSET_BUCKET'], 'bulk_inference.py', '/tmp/bulk_inference.py')\""
+                    " && python /tmp/bulk_inference.py worker --manifest \"$1\" --concurrency \"$2\"",
+                    "bulk-inference", "Ref::manifest", "Ref::concurrency"
+                ],
+                "environment": [
+                    {"name": "ASSET_BUCKET", "value": buildspec_bucket.bucket_name},
+                    {"name": "AWS_DEFAULT_REGION", "value": self.region},
+                    {"name": "BEDROCK_AGENT_ID", "value": agents.functional_agent_id},
+                    {"name": "BEDROCK_AGENT_ALIAS_ID", "value": agents.functional_agent_alias_id}
+                ]
+            },
+            # Spot reclaims are retried; the worker resumes from its S3 checkpoint
+            retry_strategy={
+                "attempts": 3,
+                "evaluateOnExit": [
+                    {"onStatusReason": "Host EC2*", "action": "RETRY"},
+                    {"onReason": "*", "action": "EXIT"}
+                ]
+            },
+            timeout={"attemptDurationSeconds": 6 * 60 * 60}
+        )
+
+        knowledge_base = self.node.try_get_context("knowledgeBase") or {}
+
+        # Job role for knowledge-base ingestion: read documents, publish the index and embed chunks
+        ingest_role = iam.Role(
+            self, "KnowledgeBaseIngestJobRole",
+            assumed_by=iam.ServicePrincipal("ecs-tasks.amazonaws.com"),
+            description="IAM role for incremental knowledge-base ingestion Batch jobs"
+        )
+        buildspec_bucket.grant_read(ingest_role, f"{KNOWLEDGE_BASE_DOCUMENTS}*")
+        buildspec_bucket.grant_read(ingest_role, "bulk_inference.py")
+        buildspec_bucket.grant_read(ingest_role, "kb_ingest.py")
+        buildspec_bucket.grant_read_write(ingest_role, f"{KNOWLEDGE_BASE_INDEX}/*")
+        ingest_role.add_to_policy(iam.PolicyStatement(
+            actions=["bedrock:InvokeModel"],
+            resources=["*"]
+        ))
+
+        # Runs ai_agent_pipeline/assets/kb_ingest.py on the same queue; only new and changed
+        # documents are embedded, and a retried attempt resumes from the run's S3 checkpoint
+        ingest_job = batch.CfnJobDefinition(
+            self, "KnowledgeBaseIngestJob",
+            type="container",
+            container_properties={
+                "image": "public.ecr.aws/docker/library/python:3.11-slim",
+                "jobRoleArn": ingest_role.role_arn,
+                "resourceRequirements": [
+                    {"type": "VCPU", "value": "2"},
+                    {"type": "MEMORY", "value": "4096"}
+                ],
+                "command": [
+                    "sh", "-c",
+                    "pip install --quiet boto3 numpy"
+                    " && python -c \"import boto3, os; s3 = boto3.client('s3'); ["
+                    "s3.download_file(os.environ['ASSET_BUCKET'], name, '/tmp/' + name)"
+                    " for name in ('bulk_inference.py', 'kb_ingest.py')]\""
+                    " && python /tmp/kb_ingest.py --documents-prefix \"$1\" --index-prefix \"$2\"",
+                    "kb-ingest", KNOWLEDGE_BASE_DOCUMENTS, KNOWLEDGE_BASE_INDEX
+                ],
+                "environment": [
+                    {"name": "ASSET_BUCKET", "value": buildspec_bucket.bucket_name},
+                    {"name": "AWS_DEFAULT_REGION", "value": self.region},
+                    {"name": "KNOWLEDGE_BASE_EMBEDDING_MODEL",
+                     "value": knowledge_base.get("embeddingModel", "amazon.titan-embed-text-v2:0")},
+                    {"name": "KNOWLEDGE_BASE_EMBEDDING_DIMENSION",
+                     "value": str(knowledge_base.get("dimension", 1024))}
+                ]
+            },
+            retry_strategy={
+                "attempts": 3,
+                "evaluateOnExit": [
+                    {"onStatusReason": "Host EC2*", "action": "RETRY"},
+                    {"onReason": "*", "action": "EXIT"}
+                ]
+            },
+            timeout={"attemptDurationSeconds": 6 * 60 * 60}
+        )
+
+        CfnOutput(self, "BulkInferenceJobQueue", value=job_queue.ref)
+        CfnOutput(self, "BulkInferenceJobDefinition", value=bulk_inference_job.ref)
+        CfnOutput(self, "KnowledgeBaseIngestJobDefinition", value=ingest_job.ref)
+
+        self.buildspec_bucket = buildspec_bucket
@@ -0,0 +1,88 @@
+"""
+Build-time compiler for agent instruction assets.
+
+Instructions are sent to the model on every agent turn, so indentation and
+blank lines left over from editing cost tokens on each call. compile_text
+dedents and minifies an instruction; load_instruction does the same for a
+file under assets/ and fails synth when the result is over its token budget.
+
+    python -m ai_agent_pipeline.instructions ai_agent_pipeline/assets/functional_agent_instructions.txt
+"""
+import re
+import sys
+import textwrap
+
+# Bedrock rejects agent instructions shorter than this
+MIN_CHARACTERS = 40
+
+
+class InstructionBudgetError(ValueError):
+    """A compiled instruction is over its token budget, or too short for Bedrock."""
+
+
+class CompiledInstruction:
+    def __init__(self, source, text):
+        self.source = source
+        self.text = text
+        self.tokens = estimate_tokens(text)
+        self.source_tokens = estimate_tokens(source)
+
+    def __str__(self):
+        return self.text
+
+
+def estimate_tokens(text):
+    """Rough token count, about four characters per token for English text."""
+    return (len(text) + 3) // 4
+
+
+def compile_text(text):
+    """
+    Dedent and minify instruction text: the common indentation is removed
+    (ignoring a flush-left first line, as left by pasting from a triple-quoted
+    string), runs of spaces are collapsed, trailing whitespace and blank lines
+    are dropped. Line breaks and relative indentation of nested lists are kept,
+    since the model reads them as structure.
+    """
+    lines = text.expandtabs(4).strip("\n").split("\n")
+    rest = textwrap.dedent("\n".join(lines[1:])).split("\n") if len(lines) > 1 else []
+    compiled = []
+    for line in [lines[0].strip()] + rest:
+        if not line.strip():
+            continue
+        indent = len(line) - len(line.lstrip(" "))
+        # Half the indentation, at most four spaces, is enough to keep nesting visible
+        compiled.append(" " * min(indent // 2, 4) + re.sub(r"\s+", " ", line.strip()))
+    return "\n".join(compiled)
+
+
+def compile_instruction(text, max_tokens=None, name="instruction"):
+    """Compile text and check it against max_tokens. Raises InstructionBudgetError."""
+    compiled = CompiledInstruction(text, compile_text(text))
+    if len(compiled.text) < MIN_CHARACTERS:
+        raise InstructionBudgetError(
+            f"{name} is {len(compiled.text)} characters after compiling; Bedrock needs at least {MIN_CHARACTERS}"
+        )
+    if max_tokens and compiled.tokens > max_tokens:
+        raise InstructionBudgetError(
+            f"{name} is ~{compiled.tokens} tokens after compiling, over its budget of {max_tokens}"
+        )
+    return compiled
+
+
+def load_instruction(path, max_tokens=None):
+    """Read and compile the instruction asset at path."""
+    with open(path, encoding="utf-8") as f:
+        return compile_instruction(f.read(), max_tokens, name=path)
+
+
+def main(paths):
+    for path in paths:
+        compiled = load_instruction(path)
+        saved = compiled.source_tokens - compiled.tokens
+        print(f"{path}: ~{compiled.source_tokens} -> ~{compiled.tokens} tokens "
+              f"({saved} saved per agent turn, {len(compiled.source)} -> {len(compiled.text)} characters)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,43 @@
+from constructs import Construct
+
+from aws_cdk import (
+    Stack,
+    aws_ec2 as ec2
+)
+
+
+class NetworkStack(Stack):
+    """VPC and security group for the Batch compute environment."""
+
+    def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+
+        # Create VPC
+        vpc = ec2.Vpc(
+            self, "BatchVPC",
+            max_azs=2,
+            subnet_configuration=[
+                ec2.SubnetConfiguration(
+                    name="Public",
+                    subnet_type=ec2.SubnetType.PUBLIC,
+                    cidr_mask=24
+                ),
+                ec2.SubnetConfiguration(
+                    name="Private",
+                    subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS,
+                    cidr_mask=24
+                )
+            ]
+        )
+
+        # Create Security Group
+        security_group = ec2.SecurityGroup(
+            self, "BatchSecurityGroup",
+            vpc=vpc,
+            description="Security group for Batch compute environment",
+            allow_all_outbound=True
+        )
+
+        self.vpc = vpc
+        self.security_group = security_group
@@ -1,14 +1,37 @@
 #!/usr/bin/env python3
 import os
 import aws_cdk as cdk
+from ai_agent_pipeline.agents_stack import AgentsStack
+from ai_agent_pipeline.api_stack import ApiStack
+from ai_agent_pipeline.compute_stack import ComputeStack
+from ai_agent_pipeline.network_stack import NetworkStack
 from ai_agent_pipeline.pipeline_stack import AiAgentPipelineStack
 
 app = cdk.App()
+env = cdk.Environment(
+    account=os.getenv('CDK_DEFAULT_ACCOUNT'),
+    region=app.node.try_get_context('region') or os.getenv('CDK_DEFAULT_REGION')
+)
+
+# Independent stacks wired by explicit references; `cdk deploy --all --concurrency 3`
+# rolls out network and agents, then compute, then the API and the pipeline.
+network = NetworkStack(app, "AiAgentNetworkStack", env=env)
+agents = AgentsStack(app, "AiAgentAgentsStack", env=env)
+compute = ComputeStack(app, "AiAgentComputeStack",
+    vpc=network.vpc,
+    security_group=network.security_group,
+    agents=agents,
+    env=env
+)
+ApiStack(app, "AiAgentApiStack",
+    agents=agents,
+    knowledge_base_bucket=compute.buildspec_bucket,
+    env=env
+)
 AiAgentPipelineStack(app, "AiAgentPipelineStack",
-    env=cdk.Environment(
-        account=os.getenv('CDK_DEFAULT_ACCOUNT'),
-        region=app.node.try_get_context('region') or os.getenv('CDK_DEFAULT_REGION')
-    )
+    agents=agents,
+    buildspec_bucket=compute.buildspec_bucket,
+    env=env
 )
 
-app.synth()
\ No newline at end of file
+app.synth()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Runs the async job flow end to end without AWS.
+
+Submits prompts with "async": true through index.handler, runs worker.handler
+on the queued messages, and long-polls GET /jobs/{jobId} from client threads
+while the fake agent streams. With --backend moto the job table and queue are
+moto's DynamoDB and SQS; with --backend memory they are in-process stand-ins.
+
+    python benchmarks/async_jobs.py --backend moto --jobs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'lambda', 'tools'))
+sys.path.insert(0, os.path.join(ROOT, 'ai_agent_pipeline', 'assets'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('BEDROCK_AGENT_ID', 'AGENT')
+os.environ.setdefault('BEDROCK_AGENT_ALIAS_ID', 'ALIAS')
+os.environ['METRICS_ENABLED'] = 'false'
+
+import clients  # noqa: E402
+import index  # noqa: E402
+import jobs  # noqa: E402
+import worker  # noqa: E402
+from fake_agent_runtime import FakeAgentRuntime  # noqa: E402
+
+
+def poll_until_done(job_id, wait, log):
+    """Long-poll the job like an API client would, recording each observed version."""
+    since = -1
+    while True:
+        response = index.handler({
+            'pathParameters': {'jobId': job_id},
+            'queryStringParameters': {'since': str(since), 'wait': str(wait)}
+        }, None)
+        job = json.loads(response['body'])
+        log.append((time.perf_counter(), job['status'], job['version'], job['progress']['responseBytes']))
+        if job['status'] in jobs.TERMINAL:
+            return job
+        since = job['version']
+
+
+def moto_backend():
+    import boto3
+    from moto import mock_aws
+    mock = mock_aws()
+    mock.start()
+    dynamodb = boto3.client('dynamodb')
+    dynamodb.create_table(
+        TableName='jobs',
+        KeySchema=[{'AttributeName': 'jobId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'jobId', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    sqs = boto3.client('sqs')
+    queue_url = sqs.create_queue(QueueName='jobs')['QueueUrl']
+
+    def deliver():
+        # Stand-in for the SQS event source mapping
+        while True:
+            messages = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=1, WaitTimeSeconds=0,
+                                           AttributeNames=['ApproximateReceiveCount']).get('Messages', [])
+            if not messages:
+                return
+            message = messages[0]
+            result = worker.handler({'Records': [{
+                'messageId': message['MessageId'],
+                'receiptHandle': message['ReceiptHandle'],
+                'body': message['Body'],
+                'attributes': message['Attributes']
+            }]}, None)
+            if not result['batchItemFailures']:
+                sqs.delete_message(QueueUrl=queue_url, ReceiptHandle=message['ReceiptHandle'])
+
+    service = jobs.JobService(jobs.DynamoDBJobStore('jobs', dynamodb), jobs.SQSQueue(queue_url, sqs), progress_interval=0.2)
+    return service, deliver, mock.stop
+
+
+def memory_backend():
+    queue = jobs.MemoryQueue()
+
+    def deliver():
+        for event in queue.drain():
+            worker.handler(event, None)
+
+    return jobs.JobService(jobs.MemoryJobStore(), queue, progress_interval=0.2), deliver, lambda: None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--backend', choices=['memory', 'moto'], default='memory')
+    parser.add_argument('--jobs', type=int, default=3)
+    parser.add_argument('--wait', type=float, default=5, help='Long-poll wait per GET, in seconds')
+    args = parser.parse_args()
+
+    # A slow agent: answers take several seconds and stream in 20 chunks
+    clients.set_client('bedrock-agent-runtime', FakeAgentRuntime(first_chunk_latency=0.5, chunk_latency=0.15, chunks=20))
+    index.job_service, deliver, stop = moto_backend() if args.backend == 'moto' else memory_backend()
+
+    try:
+        submitted = []
+        for i in range(args.jobs):
+            start = time.perf_counter()
+            response = index.handler({'body': json.dumps({'prompt': f'Walk me through reflow profile tuning #{i}', 'async': True})}, None)
+            assert response['statusCode'] == 202, response['body']
+            submitted.append((json.loads(response['body'])['jobId'], start, (time.perf_counter() - start) * 1000))
+
+        logs = {job_id: [] for job_id, _, _ in submitted}
+        pollers = [
+            threading.Thread(target=poll_until_done, args=(job_id, args.wait, logs[job_id]))
+            for job_id, _, _ in submitted
+        ]
+        for poller in pollers:
+            poller.start()
+        deliver()
+        for poller in pollers:
+            poller.join()
+
+        for job_id, start, submit_ms in submitted:
+            log = logs[job_id]
+            first_progress = next((t for t, status, _, size in log if size), log[-1][0])
+            print(f"{job_id[:8]}  submit {submit_ms:6.1f} ms  first partial {(first_progress - start) * 1000:7.1f} ms  "
+                  f"done {(log[-1][0] - start) * 1000:7.1f} ms  polls {len(log):3d}  status {log[-1][1]}")
+        print(f"mean submit latency: {statistics.mean(s for _, _, s in submitted):.1f} ms "
+              f"({args.backend} backend)")
+    finally:
+        stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Reports the size of each Lambda bundle and layer, and the time saved on resynth.
+
+Synthesizes the app with the context from cdk.json and lists every zip asset:
+files, unpacked and deflated size. Synthesizing again into the same cloud
+assembly shows what content hashing buys: an unchanged asset is neither
+rebundled nor, at deploy time, re-uploaded. --ref reports an older revision
+too (e.g. before the dependency layer) for comparison.
+
+    python benchmarks/bundle_size.py --ref HEAD~1
+"""
+import argparse
+import io
+import json
+import os
+import tempfile
+import zipfile
+
+from synth_time import ROOT, checkout, synth
+
+
+def zipped_size(directory):
+    """Size of directory as a deflated zip, roughly what CDK uploads."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                archive.write(path, os.path.relpath(path, directory))
+    return buffer.tell()
+
+
+def assets(outdir):
+    """[(stack, asset path, files, bytes, zipped bytes)] for the zip assets in a cloud assembly."""
+    found = {}
+    for name in sorted(os.listdir(outdir)):
+        if not name.endswith('.assets.json'):
+            continue
+        with open(os.path.join(outdir, name)) as f:
+            manifest = json.load(f)
+        for asset in manifest.get('files', {}).values():
+            source = asset['source']
+            path = os.path.join(outdir, source['path'])
+            if source.get('packaging') != 'zip' or not os.path.isdir(path) or path in found:
+                continue
+            sizes = [os.path.getsize(os.path.join(root, file)) for root, _, files in os.walk(path) for file in files]
+            found[path] = (name[:-len('.assets.json')], source['path'], len(sizes), sum(sizes), zipped_size(path))
+    return list(found.values())
+
+
+def report(label, app_dir, context):
+    with tempfile.TemporaryDirectory() as outdir:
+        first = synth(app_dir, context, outdir)
+        again = synth(app_dir, context, outdir)
+        rows = assets(outdir)
+    print(f"{label}: synth {first:.1f} s, resynth of unchanged assets {again:.1f} s")
+    for stack, path, files, size, zipped in rows:
+        print(f"  {stack:<20} {path[:18]:<18} {files:5d} files {size / 2**20:8.2f} MiB "
+              f"{zipped / 2**20:8.2f} MiB zipped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--ref', help='Also report this git revision for comparison')
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, 'cdk.json')) as f:
+        report('working tree', ROOT, json.load(f).get('context', {}))
+    if args.ref:
+        with tempfile.TemporaryDirectory() as directory:
+            checkout(args.ref, directory)
+            with open(os.path.join(directory, 'cdk.json')) as f:
+                report(args.ref, directory, json.load(f).get('context', {}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of per-invocation AWS client overhead.
+
+Compares building a new client inside every handler call (the old pattern)
+against the shared clients module, which builds one client per container.
+Calls are answered by botocore stubs, so no network or credentials are needed
+and the numbers isolate session setup, client construction and config work.
+
+    python benchmarks/client_overhead.py --iterations 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import boto3
+from botocore.stub import Stubber
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda', 'tools'))
+import clients  # noqa: E402
+
+SERVICE = 'bedrock-agent-runtime'
+RESPONSE = {'sessionSummaries': []}
+
+
+def per_invocation_client():
+    client = boto3.client(SERVICE)
+    with Stubber(client) as stubber:
+        stubber.add_response('list_sessions', RESPONSE)
+        client.list_sessions()
+
+
+def shared_client(stubber):
+    client = clients.get_client(SERVICE)
+    stubber.add_response('list_sessions', RESPONSE)
+    client.list_sessions()
+
+
+def measure(fn, iterations, *args):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(name, samples):
+    ordered = sorted(samples)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"{name:<24} mean {statistics.mean(samples):8.3f} ms  "
+          f"p50 {statistics.median(samples):8.3f} ms  p95 {p95:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=100)
+    args = parser.parse_args()
+
+    # Static credentials and region keep credential resolution off the network
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+
+    baseline = measure(per_invocation_client, args.iterations)
+
+    clients.reset_clients()
+    cold_start = time.perf_counter()
+    stubber = Stubber(clients.get_client(SERVICE))
+    stubber.activate()
+    cold_ms = (time.perf_counter() - cold_start) * 1000
+    shared = measure(shared_client, args.iterations, stubber)
+    stubber.deactivate()
+
+    report('client per invocation', baseline)
+    report('shared client', shared)
+    print(f"shared client one-time build: {cold_ms:.3f} ms")
+    print(f"saved per warm invocation:    "
+          f"{statistics.mean(baseline) - statistics.mean(shared):.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Measure Lambda init duration for each handler and enforce a startup budget.
+
+Each run copies lambda/tools to a temporary directory and imports the handler
+module in a fresh interpreter, which is what the Lambda init phase does
+(including client prewarming). Bytecode writes are disabled to mimic the
+read-only /var/task. Runs are made from plain sources and from a bundle
+precompiled with unchecked-hash bytecode, as produced by the CDK bundling.
+Exits non-zero when the precompiled median init time exceeds --budget-ms.
+
+    python benchmarks/cold_start.py --runs 5 --budget-ms 800
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+TOOLS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda', 'tools')
+HANDLERS = ['index', 'tools']
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+__import__(sys.argv[1])
+print(json.dumps({'initMs': (time.perf_counter() - start) * 1000}))
+"""
+
+
+def bundle(directory, precompile):
+    shutil.copytree(TOOLS_DIR, directory, ignore=shutil.ignore_patterns('__pycache__', '*.pyc'))
+    if precompile:
+        subprocess.run(
+            [sys.executable, '-m', 'compileall', '-q', '--invalidation-mode', 'unchecked-hash', directory],
+            check=True
+        )
+
+
+def init_ms(directory, module, env):
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, module],
+        cwd=directory, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])['initMs']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lambda init duration per handler')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=1000.0)
+    parser.add_argument('--tools-prewarm', default='', help='Value for TOOLS_PREWARM')
+    args = parser.parse_args()
+
+    env = dict(
+        os.environ,
+        AWS_DEFAULT_REGION=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+        AWS_ACCESS_KEY_ID='testing',
+        AWS_SECRET_ACCESS_KEY='testing',
+        BEDROCK_AGENT_ID='local-agent',
+        BEDROCK_AGENT_ALIAS_ID='local-alias',
+        TOOLS_PREWARM=args.tools_prewarm,
+        PYTHONDONTWRITEBYTECODE='1'
+    )
+
+    over_budget = []
+    print(f"{'handler':<8} {'source ms':>10} {'precompiled ms':>15} {'budget ms':>10}")
+    with tempfile.TemporaryDirectory() as root:
+        source_dir = os.path.join(root, 'source')
+        compiled_dir = os.path.join(root, 'compiled')
+        bundle(source_dir, precompile=False)
+        bundle(compiled_dir, precompile=True)
+        for module in HANDLERS:
+            source = statistics.median(init_ms(source_dir, module, env) for _ in range(args.runs))
+            compiled = statistics.median(init_ms(compiled_dir, module, env) for _ in range(args.runs))
+            print(f"{module:<8} {source:>10.1f} {compiled:>15.1f} {args.budget_ms:>10.0f}")
+            if compiled > args.budget_ms:
+                over_budget.append(module)
+
+    if over_budget:
+        print(f"Over startup budget: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
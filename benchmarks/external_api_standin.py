@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Exercise the external_api tool client against a local HTTP stand-in server.
+
+The stand-in answers part lookups at /parts/<id> after a configurable delay
+and returns 500s from /broken/. The script reports how many upstream calls
+a burst of identical concurrent lookups costs (singleflight + TTL cache),
+and how quickly the circuit breaker starts rejecting calls to a failing host.
+
+    python benchmarks/external_api_standin.py --callers 50 --delay 0.2
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda', 'tools'))
+import external_api  # noqa: E402
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    delay = 0.1
+    hits = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with StandInHandler.lock:
+            StandInHandler.hits += 1
+        time.sleep(self.delay)
+        if self.path.startswith('/broken/'):
+            self.send_response(500)
+            self.end_headers()
+            return
+        body = json.dumps({'part': self.path.rsplit('/', 1)[-1], 'stock': 42}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def burst(client, url, callers):
+    def call(_):
+        try:
+            return client.request('GET', url)
+        except external_api.UpstreamError as e:
+            return {'error': str(e)}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        results = list(executor.map(call, range(callers)))
+    return results, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='external_api client against a local stand-in')
+    parser.add_argument('--callers', type=int, default=50)
+    parser.add_argument('--delay', type=float, default=0.2)
+    args = parser.parse_args()
+
+    StandInHandler.delay = args.delay
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    client = external_api.ExternalApiClient(['127.0.0.1'], failure_threshold=3, reset_timeout=1)
+
+    results, elapsed = burst(client, f"{base}/parts/LM358", args.callers)
+    print(f"concurrent burst: {args.callers} callers, {StandInHandler.hits} upstream call(s), "
+          f"{sum(r.get('coalesced', False) for r in results)} coalesced, {elapsed:.1f} ms")
+
+    StandInHandler.hits = 0
+    results, elapsed = burst(client, f"{base}/parts/LM358", args.callers)
+    print(f"repeat burst:     {args.callers} callers, {StandInHandler.hits} upstream call(s), "
+          f"{sum(r.get('cached', False) for r in results)} cached, {elapsed:.1f} ms")
+
+    StandInHandler.hits = 0
+    timings = []
+    for _ in range(8):
+        start = time.perf_counter()
+        try:
+            client.request('GET', f"{base}/broken/part")
+        except external_api.UpstreamError:
+            pass
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"failing host:     8 calls, {StandInHandler.hits} reached upstream, "
+          f"per-call ms {[round(t, 1) for t in timings]}")
+    print(f"client stats:     {client.stats}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
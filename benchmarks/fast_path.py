@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Compares a Q Business lookup through the agent with the direct-tool fast path.
+
+Builds a small knowledge-base index, then sends the same lookups three ways
+through index.handler: POST /invoke to a fake agent whose turn is modelled as
+plan, tool call, answer (--model-ms per model call plus --agent-overhead-ms
+of orchestration, with the real knowledge_base tool run in between), POST
+/tools/knowledge_base returning the tool result, and the same with a
+question, which adds one --model-ms Converse call. Query embeddings take
+--embed-ms in every mode. Reports p50/p95 latency per mode and the speedup
+over the agent; no AWS access is needed.
+
+    python benchmarks/fast_path.py --requests 50 --model-ms 700 --agent-overhead-ms 400
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'lambda', 'tools'))
+sys.path.insert(0, os.path.join(ROOT, 'ai_agent_pipeline', 'assets'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('BEDROCK_AGENT_ID', 'AGENT')
+os.environ.setdefault('BEDROCK_AGENT_ALIAS_ID', 'ALIAS')
+
+import clients  # noqa: E402
+import index  # noqa: E402
+import kb_ingest  # noqa: E402
+import knowledge_base  # noqa: E402
+from cache import LRUCache  # noqa: E402
+from fake_agent_runtime import FakeAgentRuntime  # noqa: E402
+
+TOPICS = ['solder joint', 'reflow profile', 'conformal coating', 'BGA voiding', 'ESD handling', 'wave solder',
+          'moisture sensitivity', 'tombstoning', 'flux residue', 'X-ray inspection', 'stencil aperture', 'via fill']
+WORDS = ('inspect verify record operator station lot board panel component defect measure tolerance temperature '
+         'humidity nitrogen paste nozzle feeder placement cure bake reject rework class criteria acceptance').split()
+
+
+class FakeBedrockRuntime:
+    """Query embeddings (invoke_model) and single-call answers (converse) with fixed latencies."""
+
+    def __init__(self, embedder, embed_ms, model_ms):
+        self.embedder = embedder
+        self.embed_ms = embed_ms
+        self.model_ms = model_ms
+
+    def invoke_model(self, modelId, body, **kwargs):
+        time.sleep(self.embed_ms / 1000)
+        vector = self.embedder.embed([json.loads(body)['inputText']])[0]
+        return {'body': io.BytesIO(json.dumps({'embedding': vector.tolist()}).encode('utf-8'))}
+
+    def converse(self, modelId, messages, **kwargs):
+        time.sleep(self.model_ms / 1000)
+        return {
+            'output': {'message': {'role': 'assistant', 'content': [{'text': 'Class 3 applies; see the passages.'}]}},
+            'usage': {'inputTokens': len(messages[0]['content'][0]['text']) // 4, 'outputTokens': 40}
+        }
+
+
+def build_index(directory, embedder, rng, documents):
+    chunks = []
+    for number in range(documents):
+        topic = TOPICS[number % len(TOPICS)]
+        for step in range(8):
+            text = f"{topic} step {step + 1}: " + ' '.join(rng.choices(WORDS, k=60))
+            chunks.append({'id': f"proc-{number}-{step}", 'source': f"proc-{number}.md", 'text': text})
+    knowledge_base.write_index(directory, embedder.embed([c['text'] for c in chunks]), chunks, model=embedder.model)
+    return len(chunks)
+
+
+def agent_runtime(args, query_of):
+    """A fake agent whose first chunk waits for a plan call, the real tool call and the answer call."""
+    def first_chunk():
+        return (2 * args.model_ms + args.agent_overhead_ms) / 1000
+
+    def responder(prompt):
+        # The action group runs the same tool the fast path calls directly
+        knowledge_base.handle({'query': query_of[prompt], 'top_k': 5})
+        return 'Class 3 applies to avionics assemblies; see IPC-A-610 section 1.4. ' * 6
+
+    return FakeAgentRuntime(first_chunk_latency=first_chunk, chunk_latency=args.chunk_ms / 1000, chunks=args.chunks,
+                            responder=responder)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def timed(event):
+    start = time.perf_counter()
+    response = index.handler(event, None)
+    elapsed = (time.perf_counter() - start) * 1000
+    if response['statusCode'] != 200:
+        raise SystemExit(f"{event.get('pathParameters')}: {response['statusCode']} {response['body']}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--documents', type=int, default=500)
+    parser.add_argument('--model-ms', type=float, default=700, help='One model call (plan, answer or Converse)')
+    parser.add_argument('--agent-overhead-ms', type=float, default=400,
+                        help='Agent orchestration outside the model calls: action-group invoke, trace, session')
+    parser.add_argument('--embed-ms', type=float, default=40)
+    parser.add_argument('--chunks', type=int, default=12)
+    parser.add_argument('--chunk-ms', type=float, default=15)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    embedder = kb_ingest.FakeEmbedder(256)
+    with tempfile.TemporaryDirectory() as directory:
+        rows = build_index(directory, embedder, rng, args.documents)
+        os.environ['KNOWLEDGE_BASE_INDEX_DIR'] = directory
+        os.environ.pop('KNOWLEDGE_BASE_INDEX_URI', None)
+        clients.set_client('bedrock-runtime', FakeBedrockRuntime(embedder, args.embed_ms, args.model_ms))
+
+        queries = [f"{rng.choice(TOPICS)} acceptance criteria {rng.choice(WORDS)}" for _ in range(args.requests)]
+        prompts = [f"Search the knowledge base: {query} ({n})" for n, query in enumerate(queries)]
+        clients.set_client('bedrock-agent-runtime', agent_runtime(args, dict(zip(prompts, queries))))
+
+        modes = {
+            'agent (/invoke)': lambda n, query: {
+                'body': json.dumps({'prompt': prompts[n]})
+            },
+            'fast path, tool result': lambda n, query: {
+                'pathParameters': {'tool': 'knowledge_base'},
+                'body': json.dumps({'query': query})
+            },
+            'fast path, tool + 1 model call': lambda n, query: {
+                'pathParameters': {'tool': 'knowledge_base'},
+                'body': json.dumps({'query': query, 'question': f"Which class applies to {query}?"})
+            }
+        }
+        latencies = {}
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            # Map the index and build clients before timing
+            index.handler(modes['fast path, tool result'](0, queries[0]), None)
+            for name, event in modes.items():
+                # Every mode embeds its queries afresh rather than hitting the previous mode's cache
+                knowledge_base._embedding_cache = LRUCache(max_entries=1024, ttl_seconds=3600)
+                latencies[name] = [timed(event(n, query)) for n, query in enumerate(queries)]
+
+    print(f"{args.requests} lookups against {rows} chunks; model call {args.model_ms:g} ms, "
+          f"agent overhead {args.agent_overhead_ms:g} ms, embedding {args.embed_ms:g} ms")
+    agent_p50 = percentile(latencies['agent (/invoke)'], 50)
+    for name, values in latencies.items():
+        p50 = percentile(values, 50)
+        print(f"{name:<32} p50 {p50:8.1f} ms  p95 {percentile(values, 95):8.1f} ms  {agent_p50 / p50:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
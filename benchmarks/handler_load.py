@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Load-tests the API handler against the offline fake agent runtime.
+
+Drives the real index.handler (or index.stream_handler with --mode stream)
+from --concurrency threads per level, with FakeAgentRuntime shaping the
+completion stream: time to first chunk, chunk pacing and sizes, jitter,
+throttling and trace events for a share of the requests. For each level it
+reports throughput, latency and time-to-first-chunk percentiles, response
+statuses, throttle retries and CPU time per request. A serial pass against a
+zero-latency stream then measures allocations per request with tracemalloc,
+and --profile prints where the handler spends its CPU. Log output (metrics,
+traces) goes to /dev/null, as it would go to the Lambda log agent.
+
+    python benchmarks/handler_load.py --concurrency 4 16 64 --requests 200 \\
+        --chunk-size 16-96 --jitter 0.3 --throttle-rate 0.02 --trace-rate 0.1
+"""
+import argparse
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'lambda', 'tools'))
+sys.path.insert(0, os.path.join(ROOT, 'ai_agent_pipeline', 'assets'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('BEDROCK_AGENT_ID', 'AGENT')
+os.environ.setdefault('BEDROCK_AGENT_ALIAS_ID', 'ALIAS')
+# Throttled calls back off for real; keep the waits short enough for a CI run
+os.environ.setdefault('ADMISSION_BASE_DELAY_SECONDS', '0.05')
+
+import admission  # noqa: E402
+import clients  # noqa: E402
+import index  # noqa: E402
+from fake_agent_runtime import FakeAgentRuntime  # noqa: E402
+
+
+class ResponseStream:
+    """Collects what stream_handler writes, like the Lambda response stream."""
+
+    def __init__(self):
+        self.frames = []
+        self.status_code = 200
+
+    def set_status(self, status_code, headers=None):
+        if self.frames:
+            return False
+        self.status_code = status_code
+        return True
+
+    def write(self, data):
+        self.frames.append(data)
+
+    def close(self):
+        pass
+
+    def last_frame(self):
+        return json.loads(self.frames[-1]) if self.frames else {}
+
+
+def events(count, trace_rate):
+    """Distinct prompts; every 1/trace_rate-th request asks for its trace breakdown."""
+    every = round(1 / trace_rate) if trace_rate else 0
+    for number in range(count):
+        body = {'prompt': f'Request {number}: which IPC-A-610 class applies to avionics assemblies?'}
+        if every and number % every == 0:
+            body['trace'] = True
+        yield {'body': json.dumps(body)}
+
+
+def call(event, mode):
+    """Run one request. Returns (status, seconds, time to first chunk in ms or None)."""
+    start = time.perf_counter()
+    if mode == 'stream':
+        stream = ResponseStream()
+        index.stream_handler(event, stream, None)
+        elapsed = time.perf_counter() - start
+        frame = stream.last_frame()
+        if 'error' in frame:
+            return (429 if 'retryAfter' in frame else 500), elapsed, None
+        return 200, elapsed, frame['metrics']['timeToFirstByteMs']
+    response = index.handler(event, None)
+    elapsed = time.perf_counter() - start
+    ttfb = json.loads(response['body'])['metrics']['timeToFirstByteMs'] if response['statusCode'] == 200 else None
+    return response['statusCode'], elapsed, ttfb
+
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def runtime(args, latency=True):
+    return FakeAgentRuntime(
+        first_chunk_latency=args.first_chunk_ms / 1000 if latency else 0,
+        chunk_latency=args.chunk_ms / 1000 if latency else 0,
+        chunks=args.chunks,
+        chunk_size=args.chunk_size,
+        jitter=args.jitter,
+        throttle_rate=args.throttle_rate if latency else 0,
+        seed=args.seed
+    )
+
+
+def load(args, concurrency):
+    fake = runtime(args)
+    clients.set_client('bedrock-agent-runtime', fake)
+    index.admission_control = admission.from_environment()
+    requests = list(events(args.requests, args.trace_rate))
+
+    cpu = time.process_time()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda event: call(event, args.mode), requests))
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+
+    latencies = [seconds * 1000 for status, seconds, _ in results if status == 200]
+    ttfbs = [ttfb for status, _, ttfb in results if status == 200]
+    statuses = {}
+    for status, _, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    return {
+        'concurrency': concurrency,
+        'rps': len(results) / elapsed,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'ttfb50': percentile(ttfbs, 50),
+        'ttfb95': percentile(ttfbs, 95),
+        'statuses': statuses,
+        'throttled': fake.throttled,
+        'retried': index.admission_control.stats().get('retried', 0),
+        'cpuMs': cpu * 1000 / len(results)
+    }
+
+
+def allocations(args):
+    """Peak traced memory per request above what was live before it, and what the run left allocated."""
+    clients.set_client('bedrock-agent-runtime', runtime(args, latency=False))
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    peaks = []
+    for event in events(args.alloc_requests, args.trace_rate):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        call(event, args.mode)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return peaks, retained
+
+
+def profile(args):
+    clients.set_client('bedrock-agent-runtime', runtime(args, latency=False))
+    profiler = cProfile.Profile()
+    profiler.enable()
+    for event in events(args.alloc_requests, args.trace_rate):
+        call(event, args.mode)
+    profiler.disable()
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats('tottime').print_stats(15)
+    return output.getvalue()
+
+
+def chunk_size(value):
+    low, _, high = value.partition('-')
+    return (int(low), int(high)) if high else int(low)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--mode', choices=['buffered', 'stream'], default='buffered')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[4, 16, 64])
+    parser.add_argument('--requests', type=int, default=200, help='Requests per concurrency level')
+    parser.add_argument('--first-chunk-ms', type=float, default=200)
+    parser.add_argument('--chunk-ms', type=float, default=10)
+    parser.add_argument('--chunks', type=int, default=20)
+    parser.add_argument('--chunk-size', type=chunk_size, default=(16, 96), help='Bytes per chunk, N or MIN-MAX')
+    parser.add_argument('--jitter', type=float, default=0.3)
+    parser.add_argument('--throttle-rate', type=float, default=0.02)
+    parser.add_argument('--trace-rate', type=float, default=0.1, help='Share of requests that ask for their trace')
+    parser.add_argument('--alloc-requests', type=int, default=100)
+    parser.add_argument('--profile', action='store_true', help='Print the top functions by CPU time')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        # Warm imports, caches and lazily built state so the first level is not charged for them
+        clients.set_client('bedrock-agent-runtime', runtime(args, latency=False))
+        for event in events(20, args.trace_rate):
+            call(event, args.mode)
+        levels = [load(args, concurrency) for concurrency in args.concurrency]
+        peaks, retained = allocations(args)
+        report = profile(args) if args.profile else None
+
+    print(f"{args.mode} handler, {args.requests} requests per level, first chunk {args.first_chunk_ms:g} ms, "
+          f"{args.chunks} chunks every {args.chunk_ms:g} ms, jitter {args.jitter:g}, "
+          f"throttle rate {args.throttle_rate:g}, trace rate {args.trace_rate:g}")
+    print(f"{'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ttfb50':>8} {'ttfb95':>8} "
+          f"{'cpu ms/req':>10} {'throttled':>9} {'retried':>7}  statuses")
+    for level in levels:
+        statuses = ' '.join(f"{status}:{count}" for status, count in sorted(level['statuses'].items()))
+        print(f"{level['concurrency']:>5} {level['rps']:8.1f} {level['p50']:8.1f} {level['p95']:8.1f} {level['p99']:8.1f} "
+              f"{level['ttfb50']:8.1f} {level['ttfb95']:8.1f} {level['cpuMs']:10.3f} {level['throttled']:9d} "
+              f"{level['retried']:7d}  {statuses}")
+    print(f"allocations per request ({len(peaks)} serial requests, zero-latency stream): "
+          f"peak p50 {statistics.median(peaks) / 1024:.1f} KiB, max {max(peaks) / 1024:.1f} KiB, "
+          f"retained after the run {retained / 1024:.1f} KiB")
+    if report:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
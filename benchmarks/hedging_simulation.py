@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Local simulation of hedged agent requests against a heavy-tailed fake agent.
+
+Most calls answer after --fast-ms; a --slow-fraction of them stall for
+--slow-ms. The same request sequence runs through index.handler without and
+with hedging, and the latency percentiles, hedge rate and hedge wins are
+compared. No AWS access is needed.
+
+    python benchmarks/hedging_simulation.py --requests 400 --concurrency 8
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'lambda', 'tools'))
+sys.path.insert(0, os.path.join(ROOT, 'ai_agent_pipeline', 'assets'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('BEDROCK_AGENT_ID', 'AGENT')
+os.environ.setdefault('BEDROCK_AGENT_ALIAS_ID', 'ALIAS')
+os.environ['METRICS_ENABLED'] = 'false'
+
+import clients  # noqa: E402
+import hedging  # noqa: E402
+import index  # noqa: E402
+from fake_agent_runtime import FakeAgentRuntime  # noqa: E402
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+def run(requests, concurrency, hedge):
+    def one(i):
+        body = {'prompt': f'What is the limit for item {i}?', 'hedge': hedge}
+        start = time.perf_counter()
+        response = index.handler({'body': json.dumps(body)}, None)
+        assert response['statusCode'] == 200, response['body']
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(one, range(requests)))
+
+
+def report(name, samples, hedger):
+    stats = hedger.stats()
+    hedged = stats['hedged'] / stats['requests'] * 100 if stats['requests'] else 0
+    print(f"{name:<12} p50 {statistics.median(samples):7.1f} ms  p95 {percentile(samples, 95):7.1f} ms  "
+          f"p99 {percentile(samples, 99):7.1f} ms  max {max(samples):7.1f} ms  "
+          f"hedged {hedged:4.1f}%  hedge wins {stats['hedgeWins']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--fast-ms', type=float, default=40)
+    parser.add_argument('--slow-ms', type=float, default=600)
+    parser.add_argument('--slow-fraction', type=float, default=0.04)
+    parser.add_argument('--budget-percent', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    def first_chunk_latency():
+        slow = rng.random() < args.slow_fraction
+        base = args.slow_ms if slow else args.fast_ms
+        return base * rng.uniform(0.8, 1.2) / 1000
+
+    clients.set_client('bedrock-agent-runtime', FakeAgentRuntime(
+        first_chunk_latency=first_chunk_latency, chunk_latency=0.001
+    ))
+
+    results = {}
+    for name, hedge in (('no hedging', False), ('hedging', True)):
+        rng.seed(args.seed)
+        index.hedger = hedging.Hedger(
+            default_delay_ms=args.fast_ms * 2,
+            budget=hedging.HedgeBudget(ratio=args.budget_percent / 100)
+        )
+        results[name] = run(args.requests, args.concurrency, hedge)
+        report(name, results[name], index.hedger)
+
+    baseline, hedged = results['no hedging'], results['hedging']
+    print(f"p99 change: {percentile(hedged, 99) - percentile(baseline, 99):+.1f} ms  "
+          f"p95 change: {percentile(hedged, 95) - percentile(baseline, 95):+.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Runs incremental knowledge-base ingestion against a synthetic corpus.
+
+Generates manufacturing-style documents, ingests them, then edits, re-uploads,
+adds and deletes some and ingests again, reporting how many chunks were
+embedded and how long each run took. One run is interrupted part-way to show
+it resuming from its checkpoint. Finally the knowledge_base tool opens the
+published index the way the Lambda does and answers a query. Embeddings come
+from FakeEmbedder with --embed-ms of simulated latency per chunk; with
+--backend moto the bucket is moto's S3, otherwise a local directory.
+
+    python benchmarks/kb_ingestion.py --backend moto --documents 200
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'lambda', 'tools'))
+sys.path.insert(0, os.path.join(ROOT, 'ai_agent_pipeline', 'assets'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import bulk_inference  # noqa: E402
+import clients  # noqa: E402
+import kb_ingest  # noqa: E402
+import knowledge_base  # noqa: E402
+
+DOCUMENTS = 'knowledge-base/documents/'
+INDEX = 'knowledge-base/index'
+
+TOPICS = ['solder joint', 'reflow profile', 'conformal coating', 'via fill', 'BGA voiding', 'ESD handling',
+          'stencil aperture', 'wave solder', 'moisture sensitivity', 'tombstoning', 'flux residue', 'X-ray inspection']
+WORDS = ('inspect verify record operator station lot board panel component defect measure tolerance '
+         'temperature humidity nitrogen paste squeegee nozzle feeder placement cure bake reject rework '
+         'supplier audit class criteria acceptance magnification fillet wetting pad lead').split()
+
+
+class SlowEmbedder(kb_ingest.FakeEmbedder):
+    """FakeEmbedder with per-chunk latency, and an optional failure after a number of batches."""
+
+    def __init__(self, dimension, embed_ms, fail_after=None):
+        super().__init__(dimension)
+        self.embed_ms = embed_ms
+        self.fail_after = fail_after
+        self.batches = 0
+
+    def embed(self, texts):
+        if self.fail_after is not None and self.batches >= self.fail_after:
+            raise RuntimeError('simulated Spot interruption')
+        self.batches += 1
+        time.sleep(len(texts) * self.embed_ms / 1000)
+        return super().embed(texts)
+
+
+class FakeBedrockRuntime:
+    """invoke_model for the knowledge_base tool's query embedding, backed by FakeEmbedder."""
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+
+    def invoke_model(self, modelId, body, **kwargs):
+        vector = self.embedder.embed([json.loads(body)['inputText']])[0]
+        return {'body': io.BytesIO(json.dumps({'embedding': vector.tolist()}).encode('utf-8'))}
+
+
+def document(rng, number, paragraphs):
+    topic = TOPICS[number % len(TOPICS)]
+    lines = [f"# Procedure {number}: {topic}", '']
+    for paragraph in range(paragraphs):
+        words = rng.choices(WORDS, k=rng.randint(40, 90))
+        lines += [f"Step {paragraph + 1} for {topic}: " + ' '.join(words) + '.', '']
+    return '\n'.join(lines)
+
+
+def put(store, key, text):
+    store.write(key, text.encode('utf-8'))
+
+
+def backend(kind, directory):
+    if kind == 'local':
+        return bulk_inference.LocalStore(directory), lambda: None
+    import boto3
+    from moto import mock_aws
+    mock = mock_aws()
+    mock.start()
+    s3 = boto3.client('s3')
+    s3.create_bucket(Bucket='assets')
+    clients.set_client('s3', s3)
+    return bulk_inference.S3Store('assets', s3), mock.stop
+
+
+def run(label, store, embedder, work_root, **kwargs):
+    with tempfile.TemporaryDirectory(dir=work_root) as work_dir:
+        summary = kb_ingest.ingest(store, DOCUMENTS, INDEX, embedder, work_dir, **kwargs)
+    print(f"{label:<34} {summary['seconds']:6.2f} s  mode {summary['mode']:<9} embedded {summary['embedded']:5d} "
+          f"reused {summary['reusedChunks']:4d}  unchanged docs {summary['unchanged']:4d}  "
+          f"same content {summary['sameContent']:3d}  removed {summary['removed']:3d}  resumed parts {summary['resumedParts']}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--backend', choices=['local', 'moto'], default='local')
+    parser.add_argument('--documents', type=int, default=200)
+    parser.add_argument('--paragraphs', type=int, default=12)
+    parser.add_argument('--dimension', type=int, default=256)
+    parser.add_argument('--embed-ms', type=float, default=2, help='Simulated embedding latency per chunk')
+    parser.add_argument('--batch-size', type=int, default=32)
+    args = parser.parse_args()
+    rng = random.Random(7)
+    options = {'batch_size': args.batch_size, 'checkpoint_every': 25, 'max_chars': 800}
+
+    with tempfile.TemporaryDirectory() as root:
+        store, stop = backend(args.backend, os.path.join(root, 'bucket'))
+        try:
+            texts = {f"{DOCUMENTS}proc-{n:05d}.md": document(rng, n, args.paragraphs) for n in range(args.documents)}
+            for key, text in texts.items():
+                put(store, key, text)
+            put(store, f"{DOCUMENTS}scan.pdf", '%PDF-1.7')
+
+            embedder = SlowEmbedder(args.dimension, args.embed_ms)
+            full = run('initial ingest', store, embedder, root, **options)
+            run('no changes', store, embedder, root, **options)
+
+            keys = sorted(texts)
+            count = max(1, args.documents // 20)
+            for key in keys[:count]:
+                # Edit one paragraph; the rest of the document's chunks keep their vectors
+                texts[key] = texts[key].replace('Step 2 for', 'Step 2 (revised) for', 1)
+                put(store, key, texts[key])
+            for key in keys[count:2 * count]:
+                put(store, key, texts[key])
+            for key in keys[-count:]:
+                store.delete(key)
+            run('5% edited, 5% re-uploaded, deleted', store, embedder, root, **options)
+
+            for n in range(args.documents, args.documents + count):
+                put(store, f"{DOCUMENTS}proc-{n:05d}.md", document(rng, n, args.paragraphs))
+            run('5% new documents', store, embedder, root, **options)
+
+            for n in range(args.documents + count, args.documents + 5 * count):
+                put(store, f"{DOCUMENTS}proc-{n:05d}.md", document(rng, n, args.paragraphs))
+            try:
+                run('interrupted', store, SlowEmbedder(args.dimension, args.embed_ms, fail_after=2), root,
+                    **dict(options, checkpoint_every=max(1, count // 2)))
+            except RuntimeError as e:
+                print(f"{'interrupted':<34} {e}")
+            run('resumed', store, embedder, root, **dict(options, checkpoint_every=max(1, count // 2)))
+
+            print(f"full re-embed of the corpus would embed ~{full['embedded']} chunks per run")
+
+            # Query the published index the way the Lambda does
+            if args.backend == 'moto':
+                os.environ['KNOWLEDGE_BASE_INDEX_URI'] = f"s3://assets/{INDEX}"
+                knowledge_base.DOWNLOAD_DIR = os.path.join(root, 'lambda-tmp')
+            else:
+                os.environ['KNOWLEDGE_BASE_INDEX_DIR'] = os.path.join(
+                    root, 'bucket', store.read_json(f"{INDEX}/current.json")['path'])
+            clients.set_client('bedrock-runtime', FakeBedrockRuntime(kb_ingest.FakeEmbedder(args.dimension)))
+            response = knowledge_base.handle({'query': 'reflow profile revised step nitrogen', 'top_k': 3})
+            for result in json.loads(response['body'])['results']:
+                print(f"  {result['score']:.3f}  {result['id']}: {result['text'][:70].replace(chr(10), ' ')}...")
+        finally:
+            stop()
+
+
+if __name__ == '__main__':
+    main()
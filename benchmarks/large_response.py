@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Measures the handler's memory on very long answers, inline and spilled to S3.
+
+For each --sizes-mb, one subprocess per mode answers a single prompt whose
+completion is that long and reports how far it pushed the process's peak
+RSS, the response payload size and the time taken. `inline` is the default
+buffered handler; `spill` is large-response mode with the multipart parts
+hashed and dropped by a stand-in S3 client, so the numbers are the handler's
+own. Then a moto round trip checks that the object in S3 matches the answer
+byte for byte, that the presigned URL points at it, and that a stream that
+fails part-way aborts its upload.
+
+    python benchmarks/large_response.py --sizes-mb 2 16 64
+"""
+import argparse
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'lambda', 'tools'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('BEDROCK_AGENT_ID', 'AGENT')
+os.environ.setdefault('BEDROCK_AGENT_ALIAS_ID', 'ALIAS')
+os.environ.setdefault('METRICS_ENABLED', 'false')
+
+import clients  # noqa: E402
+import index  # noqa: E402
+import spill  # noqa: E402
+
+MB = 1024 * 1024
+# Lambda's limit for a synchronous response payload
+PAYLOAD_LIMIT = 6 * MB
+LINE = 'Station {n:07d} — reflow peak 245 °C, conveyor 0.9 m/min, voiding < 25 %, result: pass.\n'
+
+
+def report(size, chunk_bytes):
+    """size bytes of report as completion-sized byte chunks, split wherever they fall, multi-byte characters too."""
+    buffer = b''
+    produced = 0
+    n = 0
+    while produced < size:
+        while len(buffer) < chunk_bytes:
+            buffer += LINE.format(n=n).encode('utf-8')
+            n += 1
+        chunk, buffer = buffer[:min(chunk_bytes, size - produced)], buffer[chunk_bytes:]
+        produced += len(chunk)
+        yield chunk
+
+
+def expected(size, chunk_bytes):
+    digest = hashlib.sha256()
+    for chunk in report(size, chunk_bytes):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ReportAgent:
+    """invoke_agent answering with a long report, generated as it is read so the fake holds none of it."""
+
+    def __init__(self, size, chunk_bytes=4096, fail_after=None):
+        self.size = size
+        self.chunk_bytes = chunk_bytes
+        self.fail_after = fail_after
+
+    def invoke_agent(self, agentId, agentAliasId, inputText, sessionId=None, enableTrace=False, **kwargs):
+        return {'sessionId': sessionId or 'session', 'completion': self._stream()}
+
+    def _stream(self):
+        produced = 0
+        for chunk in report(self.size, self.chunk_bytes):
+            if self.fail_after is not None and produced >= self.fail_after:
+                raise ConnectionError('stream dropped')
+            produced += len(chunk)
+            yield {'chunk': {'bytes': chunk}}
+
+
+class DiscardingS3:
+    """The multipart calls SpillWriter makes, hashing each part and keeping nothing."""
+
+    def create_multipart_upload(self, **kwargs):
+        return {'UploadId': 'upload'}
+
+    def upload_part(self, Body, **kwargs):
+        return {'ETag': hashlib.md5(Body).hexdigest()}
+
+    def complete_multipart_upload(self, **kwargs):
+        return {}
+
+    def abort_multipart_upload(self, **kwargs):
+        return {}
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://{Params['Bucket']}.s3.amazonaws.com/{Params['Key']}?X-Amz-Expires={ExpiresIn}"
+
+
+def peak_rss_mb():
+    # Kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(mode, size_mb, threshold_mb):
+    """Answer one long prompt and print the RSS it took, as JSON for the parent."""
+    size = int(size_mb * MB)
+    if mode == 'spill':
+        index.response_spill = spill.ResponseSpill('responses', threshold_bytes=int(threshold_mb * MB),
+                                                   client=DiscardingS3())
+    else:
+        index.response_spill = None
+    event = {'body': json.dumps({'prompt': 'Write the full line report for every station.'})}
+
+    # Warm up on a short answer so imports and first-call state are in the baseline
+    clients.set_client('bedrock-agent-runtime', ReportAgent(64 * 1024))
+    index.handler(event, None)
+
+    clients.set_client('bedrock-agent-runtime', ReportAgent(size))
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    response = index.handler(event, None)
+    seconds = time.perf_counter() - start
+    after = peak_rss_mb()
+    body = json.loads(response['body'])
+    print(json.dumps({
+        'mode': mode,
+        'sizeMb': size_mb,
+        'statusCode': response['statusCode'],
+        'payloadBytes': len(response['body']),
+        'spilled': 'spilled' in body,
+        'baselineRssMb': round(before, 1),
+        'peakRssMb': round(after, 1),
+        'seconds': round(seconds, 3)
+    }))
+
+
+def run_child(mode, size_mb, threshold_mb):
+    output = subprocess.run(
+        [sys.executable, __file__, '--child', mode, '--sizes-mb', str(size_mb), '--threshold-mb', str(threshold_mb)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def round_trip(size_mb, threshold_mb):
+    """Spill one answer to moto's S3 and check the object, the URL and abort-on-failure."""
+    from moto import mock_aws
+
+    size = int(size_mb * MB)
+    with mock_aws():
+        # The container-wide client, with the settings the function uses to sign URLs
+        clients.reset_clients()
+        s3 = clients.get_client('s3')
+        s3.create_bucket(Bucket='responses')
+        index.response_spill = spill.ResponseSpill('responses', threshold_bytes=int(threshold_mb * MB))
+        event = {'body': json.dumps({'prompt': 'Write the full line report for every station.'})}
+
+        clients.set_client('bedrock-agent-runtime', ReportAgent(size))
+        body = json.loads(index.handler(event, None)['body'])
+        spilled = body['spilled']
+        stored = s3.get_object(Bucket='responses', Key=spilled['key'])
+        digest = hashlib.sha256(stored['Body'].read()).hexdigest()
+        matches = digest == expected(size, 4096)
+        url_ok = spilled['key'] in spilled['url'] and f"X-Amz-Expires={spilled['expiresInSeconds']}" in spilled['url']
+        print(f"moto round trip: {size_mb:g} MB in {spilled['parts']} parts, object matches the answer: {matches}, "
+              f"content type {stored['ContentType']}, presigned URL ok: {url_ok}, "
+              f"preview {len(body['response'])} chars")
+
+        clients.set_client('bedrock-agent-runtime', ReportAgent(size, fail_after=size // 2))
+        failed = index.handler(event, None)
+        uploads = s3.list_multipart_uploads(Bucket='responses').get('Uploads', [])
+        print(f"stream dropped half-way: status {failed['statusCode']}, multipart uploads left open: {len(uploads)}")
+        index.response_spill = None
+    return matches and url_ok and not uploads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes-mb', type=float, nargs='+', default=[2, 16, 64])
+    parser.add_argument('--threshold-mb', type=float, default=1)
+    parser.add_argument('--child', choices=['inline', 'spill'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.sizes_mb[0], args.threshold_mb)
+        return
+
+    print(f"threshold {args.threshold_mb:g} MB, {spill.MIN_PART_BYTES // MB} MB parts")
+    print(f"{'answer':>8} {'mode':>7} {'peak RSS +MB':>13} {'payload':>12} {'seconds':>8}")
+    for size_mb in args.sizes_mb:
+        for mode in ('inline', 'spill'):
+            result = run_child(mode, size_mb, args.threshold_mb)
+            payload = f"{result['payloadBytes'] / 1024:.0f} KiB"
+            if result['payloadBytes'] > PAYLOAD_LIMIT:
+                payload += '!'
+            print(f"{size_mb:>6g}MB {mode:>7} {result['peakRssMb'] - result['baselineRssMb']:13.1f} "
+                  f"{payload:>12} {result['seconds']:8.2f}")
+    print("! over Lambda's 6 MB response payload limit")
+
+    if not round_trip(min(max(args.sizes_mb), 12), args.threshold_mb):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
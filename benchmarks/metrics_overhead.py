@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Measures the cost of the EMF metrics emitted by the API handler.
+
+Runs index.handler against a zero-latency fake agent with METRICS_ENABLED set
+to false and then true, so the difference is the per-request instrumentation
+cost. Also times metrics.emit on its own. Log lines go to /dev/null, as they
+would be handed off to the Lambda log agent.
+
+    python benchmarks/metrics_overhead.py --iterations 2000 --budget-us 100
+"""
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'lambda', 'tools'))
+sys.path.insert(0, os.path.join(ROOT, 'ai_agent_pipeline', 'assets'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('BEDROCK_AGENT_ID', 'AGENT')
+os.environ.setdefault('BEDROCK_AGENT_ALIAS_ID', 'ALIAS')
+
+import clients  # noqa: E402
+import metrics  # noqa: E402
+from agent import InvocationTimer  # noqa: E402
+from fake_agent_runtime import FakeAgentRuntime  # noqa: E402
+
+EVENT = {'body': json.dumps({'prompt': 'How do I rotate my access keys?'})}
+
+
+def measure(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def handler_samples(enabled, iterations):
+    os.environ['METRICS_ENABLED'] = 'true' if enabled else 'false'
+    import index
+    measure(lambda: index.handler(EVENT, None), min(iterations, 100))
+    return measure(lambda: index.handler(EVENT, None), iterations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=1000)
+    parser.add_argument('--budget-us', type=float, default=None,
+                        help='Exit non-zero when the median per-request overhead exceeds this')
+    args = parser.parse_args()
+
+    clients.set_client('bedrock-agent-runtime', FakeAgentRuntime(first_chunk_latency=0, chunk_latency=0))
+    timer = InvocationTimer()
+    timer.record_chunk(512)
+    timer.stop()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        emit_samples = measure(lambda: metrics.record_invocation(timer, cached=False, stream=devnull), args.iterations)
+        off = handler_samples(False, args.iterations)
+        on = handler_samples(True, args.iterations)
+
+    overhead = statistics.median(on) - statistics.median(off)
+    print(f"record_invocation   p50 {statistics.median(emit_samples):8.2f} us")
+    print(f"handler, metrics off p50 {statistics.median(off):8.2f} us")
+    print(f"handler, metrics on  p50 {statistics.median(on):8.2f} us")
+    print(f"overhead per request     {overhead:8.2f} us ({overhead / statistics.median(off) * 100:.1f}% of a zero-latency call)")
+
+    if args.budget_us is not None and overhead > args.budget_us:
+        print(f"overhead exceeds the {args.budget_us} us budget")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Query latency of the knowledge-base vector index against corpus size.
+
+For each corpus size a random, normalized index is written to a temporary
+directory and opened the way the Lambda opens it (memory-mapped). The script
+reports the cold open time, the first query (page faults included) and warm
+query percentiles. Query embeddings are generated locally, so no Bedrock
+calls are made.
+
+    python benchmarks/retrieval_latency.py --sizes 1000 10000 100000 1000000 --dim 256
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda', 'tools'))
+import knowledge_base  # noqa: E402
+
+
+def build_index(directory, size, dim, rng):
+    # Write in blocks so a 1M-row corpus never needs two full copies in memory
+    block = 100000
+    with open(os.path.join(directory, 'embeddings.f32'), 'wb') as f:
+        for start in range(0, size, block):
+            rows = rng.standard_normal((min(block, size - start), dim), dtype=np.float32)
+            rows /= np.linalg.norm(rows, axis=1, keepdims=True)
+            rows.tofile(f)
+    offsets = []
+    with open(os.path.join(directory, 'chunks.jsonl'), 'wb') as f:
+        for row in range(size):
+            offsets.append(f.tell())
+            f.write(b'{"id":"chunk-%d","text":"synthetic chunk"}\n' % row)
+    np.asarray(offsets, dtype=np.uint64).tofile(os.path.join(directory, 'offsets.u64'))
+    with open(os.path.join(directory, 'index.json'), 'w') as f:
+        f.write('{"dimension": %d, "count": %d, "model": "synthetic"}' % (dim, size))
+
+
+def run(size, dim, queries, top_k, rng):
+    with tempfile.TemporaryDirectory() as directory:
+        build_index(directory, size, dim, rng)
+
+        start = time.perf_counter()
+        index = knowledge_base.VectorIndex(directory)
+        open_ms = (time.perf_counter() - start) * 1000
+
+        vectors = rng.standard_normal((queries + 1, dim), dtype=np.float32)
+        start = time.perf_counter()
+        [index.chunk(row) for row, _ in index.search(vectors[0], top_k)]
+        first_ms = (time.perf_counter() - start) * 1000
+
+        samples = []
+        for vector in vectors[1:]:
+            start = time.perf_counter()
+            [index.chunk(row) for row, _ in index.search(vector, top_k)]
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        return {
+            'open': open_ms,
+            'first': first_ms,
+            'p50': statistics.median(samples),
+            'p95': samples[int(len(samples) * 0.95) - 1]
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Knowledge-base query latency vs corpus size')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--top-k', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'chunks':>10} {'open ms':>9} {'first ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for size in args.sizes:
+        r = run(size, args.dim, args.queries, args.top_k, rng)
+        print(f"{size:>10} {r['open']:>9.2f} {r['first']:>9.2f} {r['p50']:>9.2f} {r['p95']:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Measures per-turn latency of a long session with and without compaction.
+
+The fake agent's time to first chunk grows with the history its session has
+built up (--context-ms per 1000 characters). The same conversation runs
+through index.handler once with sessions unmanaged and once with the session
+manager compacting every --max-turns turns, and the time to first chunk per
+turn is compared, along with the saving the manager reported against the
+saving actually seen on the same turns. No AWS access is needed.
+
+    python benchmarks/session_compaction.py --turns 40 --max-turns 10
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'lambda', 'tools'))
+sys.path.insert(0, os.path.join(ROOT, 'ai_agent_pipeline', 'assets'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('BEDROCK_AGENT_ID', 'AGENT')
+os.environ.setdefault('BEDROCK_AGENT_ALIAS_ID', 'ALIAS')
+os.environ['METRICS_ENABLED'] = 'false'
+
+import clients  # noqa: E402
+import index  # noqa: E402
+import sessions  # noqa: E402
+from fake_agent_runtime import FakeAgentRuntime  # noqa: E402
+
+
+def run(turns, session_id):
+    samples = []
+    infos = []
+    for turn in range(turns):
+        body = {'prompt': f'Step {turn}: what should the reflow peak temperature be for board rev {turn}?',
+                'sessionId': session_id}
+        response = index.handler({'body': json.dumps(body)}, None)
+        assert response['statusCode'] == 200, response['body']
+        payload = json.loads(response['body'])
+        assert payload['sessionId'] == session_id
+        samples.append(payload['metrics']['timeToFirstByteMs'])
+        infos.append(payload.get('session'))
+    return samples, infos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--turns', type=int, default=40)
+    parser.add_argument('--max-turns', type=int, default=10)
+    parser.add_argument('--summary-tokens', type=int, default=300)
+    parser.add_argument('--base-ms', type=float, default=30)
+    parser.add_argument('--context-ms', type=float, default=20, help='Extra first-chunk ms per 1000 characters of history')
+    args = parser.parse_args()
+
+    clients.set_client('bedrock-agent-runtime', FakeAgentRuntime(
+        first_chunk_latency=args.base_ms / 1000,
+        chunk_latency=0.001,
+        context_latency=args.context_ms / 1000
+    ))
+
+    index.session_manager = None
+    baseline, _ = run(args.turns, 'bench-unmanaged')
+
+    index.session_manager = sessions.SessionManager(max_turns=args.max_turns, summary_tokens=args.summary_tokens)
+    compacted, infos = run(args.turns, 'bench-compacted')
+
+    print(f"{'turn':>4}  {'unmanaged':>10}  {'compacted':>10}  {'agent session tokens':>20}")
+    for turn in range(0, args.turns, max(1, args.turns // 20)):
+        marker = '  <- compacted' if infos[turn]['compacted'] else ''
+        print(f"{turn + 1:>4}  {baseline[turn]:8.1f}ms  {compacted[turn]:8.1f}ms  {infos[turn]['approxTokens']:>20}{marker}")
+
+    stats = index.session_manager.stats()
+    print(f"mean time to first chunk: unmanaged {statistics.mean(baseline):.1f} ms, "
+          f"compacted {statistics.mean(compacted):.1f} ms")
+    # The turns the manager reported a saving for, compared with the same turns of the unmanaged run
+    measured = [turn for turn, info in enumerate(infos) if info['latencySavingMs'] is not None]
+    actual = statistics.mean(baseline[turn] - compacted[turn] for turn in measured) if measured else None
+    print(f"compactions {stats['compactions']}, saving per turn after compaction: "
+          f"reported {stats['averageLatencySavingMs']} ms, "
+          f"actual {'n/a' if actual is None else f'{actual:.2f} ms'}")
+
+
+if __name__ == '__main__':
+    main()
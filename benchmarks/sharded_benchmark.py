@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Runs the agent benchmark the way the batch build does, offline.
+
+Starts --shards copies of agent_benchmark.py against FakeAgentRuntime side by
+side, one per shard of the corpus, then merges their results into a single
+report as the merge build does, and compares the wall time with a serial run
+of the whole corpus. No AWS access is needed.
+
+    python benchmarks/sharded_benchmark.py --shards 4 --repeat 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BENCHMARK = os.path.join(ROOT, 'ai_agent_pipeline', 'assets', 'agent_benchmark.py')
+
+
+def benchmark(*args):
+    return subprocess.Popen([sys.executable, BENCHMARK, '--fake', *args], stdout=subprocess.DEVNULL)
+
+
+def timed(processes):
+    start = time.perf_counter()
+    for process in processes:
+        if process.wait() != 0:
+            raise SystemExit(f"{' '.join(process.args)} exited with {process.returncode}")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--shards', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=5, help='Times to run the corpus, to stand in for a larger one')
+    args = parser.parse_args()
+    common = ['--judge', '--concurrency', str(args.concurrency), '--repeat', str(args.repeat)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        serial_output = os.path.join(directory, 'serial.json')
+        serial = timed([benchmark(*common, '--output', serial_output)])
+
+        sharded = timed([
+            benchmark(*common, '--shard', f'{index}/{args.shards}',
+                      '--output', os.path.join(directory, f'shard-{index}-of-{args.shards}.json'))
+            for index in range(args.shards)
+        ])
+        merged_output = os.path.join(directory, 'merged.json')
+        merge = timed([benchmark('--merge', directory, '--shards', str(args.shards), '--output', merged_output)])
+
+        with open(serial_output) as f:
+            serial_summary = json.load(f)['summary']
+        with open(merged_output) as f:
+            merged = json.load(f)
+
+    print(f"serial:  {serial:6.2f} s  {serial_summary['requests']} requests, p95 {serial_summary['latencyP95Ms']} ms")
+    print(f"sharded: {sharded:6.2f} s  {args.shards} shards + {merge:.2f} s merge, "
+          f"{merged['summary']['requests']} requests, p95 {merged['summary']['latencyP95Ms']} ms")
+    for shard in merged['shards']:
+        print(f"  shard {shard['shard']}: {shard['requests']} requests in {shard['elapsedSeconds']} s")
+
+
+if __name__ == '__main__':
+    main()
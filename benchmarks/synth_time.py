@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Times `cdk synth` of the app and reports the size of each stack's template.
+
+Each run is a fresh `python app.py` with the context from cdk.json, as the
+CDK CLI would start it. --bundle-stacks sets the stacks whose assets are
+bundled, as `cdk deploy <stack>` does: with the split stacks, deploying
+AiAgentAgentsStack alone skips Lambda bundling entirely. --ref synthesizes
+an older revision too (e.g. the single-stack layout) for comparison.
+
+    python benchmarks/synth_time.py --runs 3 --bundle-stacks AiAgentAgentsStack --ref HEAD~1
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def synth(app_dir, context, outdir):
+    env = dict(os.environ, CDK_OUTDIR=outdir, CDK_CONTEXT_JSON=json.dumps(context))
+    start = time.perf_counter()
+    subprocess.run([sys.executable, 'app.py'], cwd=app_dir, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def templates(outdir):
+    """{stack name: (resource count, template bytes)} from a cloud assembly directory."""
+    sizes = {}
+    for name in sorted(os.listdir(outdir)):
+        if name.endswith('.template.json'):
+            with open(os.path.join(outdir, name)) as f:
+                body = f.read()
+            sizes[name[:-len('.template.json')]] = (len(json.loads(body).get('Resources', {})), len(body))
+    return sizes
+
+
+def measure(label, app_dir, context, runs):
+    times = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as outdir:
+            times.append(synth(app_dir, context, outdir))
+            sizes = templates(outdir)
+    print(f"{label}: synth {statistics.median(times):.2f} s median of {runs} (min {min(times):.2f} s)")
+    for stack, (resources, size) in sizes.items():
+        print(f"  {stack:<28} {resources:4d} resources  {size / 1024:7.1f} KiB")
+
+
+def checkout(ref, directory):
+    """Export the tree at ref into directory without touching the working copy."""
+    archive = subprocess.run(['git', 'archive', ref], cwd=ROOT, check=True, capture_output=True).stdout
+    subprocess.run(['tar', '-x', '-C', directory], input=archive, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--bundle-stacks', nargs='*', default=None,
+                        help='Stacks whose assets are bundled (default: all, as for `cdk deploy --all`)')
+    parser.add_argument('--ref', help='Also synthesize this git revision for comparison')
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, 'cdk.json')) as f:
+        context = json.load(f).get('context', {})
+
+    measure('working tree, all stacks bundled', ROOT, context, args.runs)
+    if args.bundle_stacks is not None:
+        selected = dict(context, **{'aws:cdk:bundling-stacks': args.bundle_stacks})
+        measure(f"working tree, bundling only {' '.join(args.bundle_stacks) or 'nothing'}", ROOT, selected, args.runs)
+    if args.ref:
+        with tempfile.TemporaryDirectory() as directory:
+            checkout(args.ref, directory)
+            with open(os.path.join(directory, 'cdk.json')) as f:
+                measure(f'{args.ref}, all stacks bundled', directory, json.load(f).get('context', {}), args.runs)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Snapshot check for the synthesized CloudFormation templates.
+
+Synthesizes the app with the context from cdk.json and compares each stack's
+template with benchmarks/snapshots/<stack>.template.json, printing a diff and
+exiting non-zero when they differ. Asset hashes and Lambda version IDs change
+with every code edit, so they are masked before comparing; what is left is
+the infrastructure itself. Review the diff, then accept it with --update.
+
+    python benchmarks/template_snapshot.py            # check
+    python benchmarks/template_snapshot.py --update   # rewrite the snapshots
+"""
+import argparse
+import difflib
+import json
+import os
+import re
+import sys
+import tempfile
+
+from synth_time import ROOT, synth
+
+SNAPSHOTS = os.path.join(ROOT, 'benchmarks', 'snapshots')
+
+MASKS = [
+    # Asset hashes in S3 keys, staging paths and asset parameters
+    (re.compile(r'[0-9a-f]{64}'), '<asset-hash>'),
+    # Lambda versions are named after a hash of the function configuration and code
+    (re.compile(r'CurrentVersion[0-9A-F]{8}[0-9a-f]{32}'), 'CurrentVersion<hash>'),
+]
+
+
+def normalize(template):
+    text = json.dumps(template, indent=1, sort_keys=True)
+    for pattern, replacement in MASKS:
+        text = pattern.sub(replacement, text)
+    return text + '\n'
+
+
+def synthesized():
+    with open(os.path.join(ROOT, 'cdk.json')) as f:
+        context = json.load(f).get('context', {})
+    with tempfile.TemporaryDirectory() as outdir:
+        synth(ROOT, context, outdir)
+        stacks = {}
+        for name in sorted(os.listdir(outdir)):
+            if name.endswith('.template.json'):
+                with open(os.path.join(outdir, name)) as f:
+                    stacks[name] = normalize(json.load(f))
+        return stacks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--update', action='store_true', help='Rewrite the snapshots from the current synth')
+    args = parser.parse_args()
+
+    current = synthesized()
+    existing = sorted(name for name in os.listdir(SNAPSHOTS) if name.endswith('.template.json')) \
+        if os.path.isdir(SNAPSHOTS) else []
+
+    if args.update:
+        os.makedirs(SNAPSHOTS, exist_ok=True)
+        for name in existing:
+            if name not in current:
+                os.remove(os.path.join(SNAPSHOTS, name))
+        for name, text in current.items():
+            with open(os.path.join(SNAPSHOTS, name), 'w') as f:
+                f.write(text)
+        print(f"wrote {len(current)} snapshots to {os.path.relpath(SNAPSHOTS, ROOT)}")
+        return
+
+    changed = 0
+    for name in sorted(set(current) | set(existing)):
+        path = os.path.join(SNAPSHOTS, name)
+        expected = open(path).read() if name in existing else ''
+        actual = current.get(name, '')
+        if expected == actual:
+            print(f"{name}: unchanged")
+            continue
+        changed += 1
+        sys.stdout.writelines(difflib.unified_diff(
+            expected.splitlines(True), actual.splitlines(True),
+            f"snapshots/{name}", f"synth/{name}"
+        ))
+    if changed:
+        print(f"{changed} template(s) differ from the snapshots; rerun with --update to accept")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
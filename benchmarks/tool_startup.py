@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Startup cost of the tool dispatcher and of each registered tool.
+
+Every measurement runs in a fresh interpreter so module caches start cold, as
+they do in a new Lambda container. For each tool the script reports the
+dispatcher import, the tool module import and its warm-up hook (client and
+index initialization), using static credentials so nothing touches the network.
+
+    python benchmarks/tool_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+TOOLS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda', 'tools')
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import tools
+dispatcher = time.perf_counter()
+module = tools.load_tool(sys.argv[1])
+imported = time.perf_counter()
+if hasattr(module, 'warmup'):
+    module.warmup()
+warmed = time.perf_counter()
+print(json.dumps({
+    'dispatcher': (dispatcher - start) * 1000,
+    'import': (imported - dispatcher) * 1000,
+    'init': (warmed - imported) * 1000
+}))
+"""
+
+
+def probe(tool, env):
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, tool],
+        cwd=TOOLS_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-tool import and init time')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    sys.path.insert(0, TOOLS_DIR)
+    import tools
+
+    env = dict(
+        os.environ,
+        AWS_DEFAULT_REGION=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+        AWS_ACCESS_KEY_ID='testing',
+        AWS_SECRET_ACCESS_KEY='testing',
+        PYTHONDONTWRITEBYTECODE='1'
+    )
+    print(f"{'tool':<16} {'dispatcher ms':>14} {'import ms':>10} {'init ms':>9}")
+    for tool in tools.TOOLS:
+        samples = [probe(tool, env) for _ in range(args.runs)]
+        row = {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+        print(f"{tool:<16} {row['dispatcher']:>14.2f} {row['import']:>10.2f} {row['init']:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
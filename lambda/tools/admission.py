@@ -0,0 +1,213 @@
+"""
+Admission control for agent calls: a token bucket per agent alias, jittered
+retries on throttling, and load shedding once the time budget is spent.
+
+The bucket state lives in a pluggable store. LocalBucketStore keeps it per
+container; DynamoDBBucketStore shares one bucket across all containers.
+"""
+import math
+import os
+import random
+import threading
+import time
+
+from metrics import is_throttle
+
+
+class Overloaded(Exception):
+    """The request could not be admitted in time; retry after retry_after seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+def refill(tokens, updated_at, rate, burst, now):
+    return min(burst, tokens + max(now - updated_at, 0) * rate)
+
+
+class LocalBucketStore:
+    """Token buckets held in this container only."""
+
+    def __init__(self):
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, now):
+        """Take one token. Returns 0 when granted, else the seconds until one is available."""
+        with self._lock:
+            tokens, updated_at = self.buckets.get(key, (burst, now))
+            tokens = refill(tokens, updated_at, rate, burst, now)
+            if tokens >= 1:
+                self.buckets[key] = (tokens - 1, now)
+                return 0
+            self.buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+
+
+class DynamoDBBucketStore:
+    """
+    Token buckets in a DynamoDB table with partition key `bucketKey`, shared
+    by every container. Updates are optimistic: each write is conditional on
+    the `updatedAt` value that was read. Pass a client to point it at
+    DynamoDB Local or moto.
+    """
+
+    def __init__(self, table_name, client=None, max_conflicts=3):
+        self.table_name = table_name
+        self.max_conflicts = max_conflicts
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from clients import get_client
+            self._client = get_client('dynamodb')
+        return self._client
+
+    def take(self, key, rate, burst, now):
+        for _ in range(self.max_conflicts):
+            item = self.client.get_item(
+                TableName=self.table_name,
+                Key={'bucketKey': {'S': key}},
+                ConsistentRead=True
+            ).get('Item')
+            if item is None:
+                tokens, previous = burst, None
+            else:
+                previous = item['updatedAt']['N']
+                tokens = refill(float(item['tokens']['N']), float(previous), rate, burst, now)
+            granted = tokens >= 1
+            try:
+                self._write(key, tokens - 1 if granted else tokens, now, previous)
+            except self.client.exceptions.ConditionalCheckFailedException:
+                # Another container took a token first; re-read and try again
+                continue
+            return 0 if granted else (1 - tokens) / rate
+        return 1 / rate
+
+    def _write(self, key, tokens, now, previous):
+        condition = {'ConditionExpression': 'attribute_not_exists(bucketKey)'}
+        if previous is not None:
+            condition = {
+                'ConditionExpression': 'updatedAt = :previous',
+                'ExpressionAttributeValues': {':previous': {'N': previous}}
+            }
+        self.client.put_item(
+            TableName=self.table_name,
+            Item={
+                'bucketKey': {'S': key},
+                'tokens': {'N': repr(tokens)},
+                'updatedAt': {'N': repr(now)}
+            },
+            **condition
+        )
+
+
+class AdmissionControl:
+    """
+    Wraps agent calls with a per-alias token bucket and jittered exponential
+    backoff on throttling errors. Waiting never runs past the deadline: when
+    the next wait or retry would, Overloaded is raised instead. Errors from a
+    shared store are counted and the call is admitted (fail open).
+    """
+
+    def __init__(self, store=None, rate=0, burst=None, max_attempts=4, base_delay=0.2, max_delay=5,
+                 sleep=time.sleep, clock=time.time):
+        self.store = store or LocalBucketStore()
+        self.rate = rate
+        self.burst = burst or max(1, rate)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.clock = clock
+        self.counters = {'admitted': 0, 'waited': 0, 'retried': 0, 'shed': 0, 'errors': 0}
+        self._lock = threading.Lock()
+
+    def admit(self, key, deadline):
+        """Block until a token for key is available, or raise Overloaded."""
+        if not self.rate:
+            return
+        while True:
+            now = self.clock()
+            try:
+                wait = self.store.take(key, self.rate, self.burst, now)
+            except Exception:
+                self._count('errors')
+                wait = 0
+            if not wait:
+                self._count('admitted')
+                return
+            if now + wait > deadline:
+                self._count('shed')
+                raise Overloaded(f'Rate limit for {key} reached', wait)
+            self._count('waited')
+            self.sleep(wait)
+
+    def try_admit(self, key):
+        """Take a token for key only if one is available right now, e.g. for an optional hedge."""
+        if not self.rate:
+            return True
+        try:
+            wait = self.store.take(key, self.rate, self.burst, self.clock())
+        except Exception:
+            self._count('errors')
+            return True
+        if wait:
+            return False
+        self._count('admitted')
+        return True
+
+    def call(self, key, fn, deadline):
+        """Run fn() once admitted, retrying throttling errors until the deadline."""
+        attempt = 0
+        while True:
+            self.admit(key, deadline)
+            try:
+                return fn()
+            except Exception as e:
+                if not is_throttle(e):
+                    raise
+                attempt += 1
+                # Full jitter keeps retries from concurrent containers apart
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                if attempt >= self.max_attempts or self.clock() + delay > deadline:
+                    self._count('shed')
+                    raise Overloaded('Agent is throttling requests', max(delay, self.base_delay * 2 ** attempt)) from e
+                self._count('retried')
+                self.sleep(delay)
+
+    def deadline(self, context=None):
+        """
+        Latest time to keep waiting: ADMISSION_MAX_WAIT_SECONDS from now, cut
+        short so ADMISSION_RESERVE_SECONDS of the Lambda time remain for the
+        agent call itself.
+        """
+        now = self.clock()
+        deadline = now + float(os.environ.get('ADMISSION_MAX_WAIT_SECONDS', '10'))
+        if context is not None:
+            remaining = context.get_remaining_time_in_millis() / 1000
+            deadline = min(deadline, now + remaining - float(os.environ.get('ADMISSION_RESERVE_SECONDS', '60')))
+        return deadline
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+
+def from_environment():
+    """Build admission control from function environment variables."""
+    table_name = os.environ.get('ADMISSION_TABLE')
+    return AdmissionControl(
+        store=DynamoDBBucketStore(table_name) if table_name else LocalBucketStore(),
+        rate=float(os.environ.get('ADMISSION_RATE', '0')),
+        burst=float(os.environ.get('ADMISSION_BURST', '0')) or None,
+        max_attempts=int(os.environ.get('ADMISSION_MAX_ATTEMPTS', '4')),
+        base_delay=float(os.environ.get('ADMISSION_BASE_DELAY_SECONDS', '0.2')),
+        max_delay=float(os.environ.get('ADMISSION_MAX_DELAY_SECONDS', '5'))
+    )
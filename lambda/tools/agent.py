@@ -0,0 +1,97 @@
+import codecs
+import itertools
+import time
+
+
+class InvocationTimer:
+    """
+    Tracks time-to-first-byte, total latency and chunk sizes for a single agent
+    invocation. Start it before calling invoke_agent so TTFB includes the
+    request round trip.
+    """
+
+    def __init__(self):
+        self.restart()
+
+    def restart(self):
+        """Start over, e.g. when a call is retried on another alias."""
+        self.started = time.perf_counter()
+        self.first_byte = None
+        self.finished = None
+        self.chunks = 0
+        self.response_bytes = 0
+
+    def mark_first_byte(self):
+        if self.first_byte is None:
+            self.first_byte = time.perf_counter()
+
+    def record_chunk(self, size):
+        self.chunks += 1
+        self.response_bytes += size
+
+    def stop(self):
+        if self.finished is None:
+            self.finished = time.perf_counter()
+
+    def as_dict(self):
+        end = self.finished or time.perf_counter()
+        first_byte = self.first_byte or end
+        return {
+            'timeToFirstByteMs': round((first_byte - self.started) * 1000, 2),
+            'latencyMs': round((end - self.started) * 1000, 2),
+            'chunks': self.chunks,
+            'responseBytes': self.response_bytes
+        }
+
+
+def iter_completion(response, timer=None, on_trace=None):
+    """
+    Yield decoded text from the invoke_agent completion event stream as each
+    chunk arrives. Decoding is incremental so multi-byte characters split
+    across chunks are not corrupted. Trace events (enableTrace) are passed to
+    on_trace as they arrive.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for event in response['completion']:
+        if on_trace and 'trace' in event:
+            on_trace(event['trace'])
+            continue
+        chunk = event.get('chunk')
+        if not chunk or 'bytes' not in chunk:
+            continue
+        if timer:
+            timer.record_chunk(len(chunk['bytes']))
+        text = decoder.decode(chunk['bytes'])
+        if text:
+            if timer:
+                timer.mark_first_byte()
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+    if timer:
+        timer.stop()
+
+
+def await_first_event(response):
+    """
+    Wait for the first event of the completion stream, where the agent reports
+    errors such as throttling that it hit before answering. Returns the response
+    with its completion replaying that event.
+    """
+    events = iter(response['completion'])
+    first = next(events, None)
+    return dict(response, completion=events if first is None else itertools.chain([first], events))
+
+
+def collect_completion(response, timer=None, on_trace=None, on_text=None):
+    """
+    Buffer the whole completion, joining parts once instead of concatenating.
+    on_text, if given, sees each decoded part as it arrives (e.g. to report progress).
+    """
+    parts = []
+    for text in iter_completion(response, timer, on_trace):
+        if on_text:
+            on_text(text)
+        parts.append(text)
+    return ''.join(parts)
@@ -0,0 +1,72 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+def max_prompts():
+    return int(os.environ.get('BATCH_MAX_PROMPTS', '100'))
+
+
+def max_concurrency():
+    return int(os.environ.get('BATCH_MAX_CONCURRENCY', '10'))
+
+
+def parse_items(body):
+    """
+    Normalize the `prompts` array into request bodies. Each entry is either a
+    prompt string or an object with `prompt` and optional `sessionId`,
+    `cache`, `trace`, `tier`, `route` and `hedge`.
+    Raises ValueError when the batch is malformed.
+    """
+    prompts = body.get('prompts')
+    if not isinstance(prompts, list) or not prompts:
+        raise ValueError('prompts must be a non-empty array')
+    if len(prompts) > max_prompts():
+        raise ValueError(f'At most {max_prompts()} prompts are allowed per batch')
+
+    items = []
+    for index, entry in enumerate(prompts):
+        if isinstance(entry, str):
+            entry = {'prompt': entry}
+        if not isinstance(entry, dict) or not entry.get('prompt'):
+            raise ValueError(f'prompts[{index}] must be a prompt string or an object with a prompt')
+        item = {'prompt': entry['prompt']}
+        if entry.get('sessionId'):
+            item['sessionId'] = entry['sessionId']
+        for option in ('cache', 'trace', 'tier', 'route', 'hedge'):
+            if option in entry:
+                item[option] = entry[option]
+        items.append(item)
+    return items
+
+
+def concurrency_limit(body, item_count):
+    """
+    Requested concurrency, capped by BATCH_MAX_CONCURRENCY and the batch size.
+    Raises ValueError unless `concurrency` is absent or a positive integer.
+    """
+    requested = body.get('concurrency')
+    if requested is None:
+        requested = max_concurrency()
+    elif isinstance(requested, bool) or not isinstance(requested, (int, str)) or not str(requested).isdigit():
+        raise ValueError('concurrency must be a positive integer')
+    requested = int(requested)
+    if requested < 1:
+        raise ValueError('concurrency must be a positive integer')
+    return max(1, min(requested, max_concurrency(), item_count))
+
+
+def run_batch(items, invoke, concurrency):
+    """
+    Run invoke(item) for every item on a bounded thread pool.
+    Results come back in input order; a failing item records its error
+    instead of failing the whole batch.
+    """
+    def run(indexed):
+        index, item = indexed
+        try:
+            return {'index': index, **invoke(item)}
+        except Exception as e:
+            return {'index': index, 'error': str(e)}
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(run, enumerate(items)))
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace and case so trivially different prompts share an entry."""
+    return ' '.join(prompt.split()).casefold()
+
+
+def cache_key(agent_id, agent_alias_id, prompt, scope=''):
+    """Key for prompt's answer; scope names the route or tier that answers it."""
+    raw = '\x1f'.join([agent_id, agent_alias_id, scope, normalize_prompt(prompt)])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache whose entries expire after a TTL."""
+
+    def __init__(self, max_entries=256, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DictBackend:
+    """Shared-tier stand-in backed by a dict, for local runs and benchmarks."""
+
+    def __init__(self):
+        self.items = {}
+
+    def get(self, key):
+        item = self.items.get(key)
+        if item is None or item[1] <= time.time():
+            return None
+        return item[0]
+
+    def put(self, key, value, ttl_seconds):
+        self.items[key] = (value, time.time() + ttl_seconds)
+
+
+class DynamoDBBackend:
+    """
+    Shared tier stored in a DynamoDB table with partition key `cacheKey` and
+    TTL attribute `expiresAt`. Pass a client to point it at DynamoDB Local or moto.
+    """
+
+    def __init__(self, table_name, client=None):
+        self.table_name = table_name
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            # Imported here so modules that only need the LRU do not load boto3
+            from clients import get_client
+            self._client = get_client('dynamodb')
+        return self._client
+
+    def get(self, key):
+        item = self.client.get_item(
+            TableName=self.table_name,
+            Key={'cacheKey': {'S': key}}
+        ).get('Item')
+        # DynamoDB TTL deletion is lazy, so check expiry ourselves
+        if item is None or int(item['expiresAt']['N']) <= time.time():
+            return None
+        return json.loads(item['value']['S'])
+
+    def put(self, key, value, ttl_seconds):
+        self.client.put_item(
+            TableName=self.table_name,
+            Item={
+                'cacheKey': {'S': key},
+                'value': {'S': json.dumps(value)},
+                'expiresAt': {'N': str(int(time.time() + ttl_seconds))}
+            }
+        )
+
+
+class ResponseCache:
+    """
+    Two-tier cache for agent responses: an in-process LRU in front of an
+    optional shared backend. Shared-tier errors are counted and treated as
+    misses so the cache can never fail a request.
+    """
+
+    def __init__(self, local=None, shared=None, ttl_seconds=300, allow_sessions=False):
+        self.local = local or LRUCache(ttl_seconds=ttl_seconds)
+        self.shared = shared
+        self.ttl_seconds = ttl_seconds
+        self.allow_sessions = allow_sessions
+        self.counters = {'hits': 0, 'sharedHits': 0, 'misses': 0, 'bypassed': 0, 'errors': 0}
+        self._lock = threading.Lock()
+
+    def should_use(self, body):
+        """Per-request opt-out via `"cache": false`; sessions bypass unless allowed."""
+        if body.get('cache') is False:
+            return False
+        if body.get('sessionId') and not self.allow_sessions:
+            return False
+        return True
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            self._count('hits')
+            return value
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception:
+                self._count('errors')
+                value = None
+            if value is not None:
+                self.local.put(key, value)
+                self._count('hits')
+                self._count('sharedHits')
+                return value
+        self._count('misses')
+        return None
+
+    def put(self, key, value):
+        self.local.put(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.put(key, value, self.ttl_seconds)
+            except Exception:
+                self._count('errors')
+
+    def bypass(self):
+        self._count('bypassed')
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+
+def from_environment():
+    """
+    Build the cache from function environment variables, or return None when
+    RESPONSE_CACHE_ENABLED is not set to true.
+    """
+    if os.environ.get('RESPONSE_CACHE_ENABLED', 'false').lower() != 'true':
+        return None
+    ttl_seconds = int(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', '300'))
+    table_name = os.environ.get('RESPONSE_CACHE_TABLE')
+    return ResponseCache(
+        local=LRUCache(
+            max_entries=int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '256')),
+            ttl_seconds=ttl_seconds
+        ),
+        shared=DynamoDBBackend(table_name) if table_name else None,
+        ttl_seconds=ttl_seconds,
+        allow_sessions=os.environ.get('RESPONSE_CACHE_ALLOW_SESSIONS', 'false').lower() == 'true'
+    )
@@ -0,0 +1,72 @@
+import os
+import threading
+
+# Clients are created once per container and reused across warm invocations
+_clients = {}
+_lock = threading.Lock()
+
+# Per-service settings on top of the shared ones. S3 presigned URLs (large
+# responses) must be SigV4, which botocore does not default to in us-east-1.
+SERVICE_SETTINGS = {
+    's3': {'signature_version': 's3v4'}
+}
+
+
+def client_config(service_name=None):
+    """
+    Build the botocore config shared by all clients, plus service_name's
+    SERVICE_SETTINGS. Every shared setting can be overridden through
+    environment variables on the function.
+    """
+    from botocore.config import Config
+    return Config(
+        **SERVICE_SETTINGS.get(service_name, {}),
+        max_pool_connections=int(os.environ.get('AWS_CLIENT_MAX_POOL_CONNECTIONS', '50')),
+        tcp_keepalive=os.environ.get('AWS_CLIENT_TCP_KEEPALIVE', 'true').lower() == 'true',
+        connect_timeout=float(os.environ.get('AWS_CLIENT_CONNECT_TIMEOUT', '5')),
+        # invoke_agent streams for the length of the answer, so reads must be long
+        read_timeout=float(os.environ.get('AWS_CLIENT_READ_TIMEOUT', '300')),
+        retries={
+            'max_attempts': int(os.environ.get('AWS_CLIENT_MAX_ATTEMPTS', '3')),
+            'mode': os.environ.get('AWS_CLIENT_RETRY_MODE', 'adaptive')
+        }
+    )
+
+
+def get_client(service_name):
+    """Return the container-wide client for service_name, creating it on first use."""
+    client = _clients.get(service_name)
+    if client is None:
+        with _lock:
+            client = _clients.get(service_name)
+            if client is None:
+                # boto3 is imported on first use so handlers that never call AWS skip it
+                import boto3
+                client = boto3.session.Session().client(service_name, config=client_config(service_name))
+                _clients[service_name] = client
+    return client
+
+
+def prewarm(service_names):
+    """
+    Create clients during the Lambda init phase, which runs at full CPU and
+    ahead of traffic under provisioned concurrency. Failures are left for the
+    first real call to report.
+    """
+    for service_name in service_names:
+        try:
+            get_client(service_name)
+        except Exception as e:
+            print(f"Client prewarm failed for {service_name}: {e}")
+
+
+def set_client(service_name, client):
+    """Install a client for service_name, e.g. a stubbed or fake client in benchmarks."""
+    with _lock:
+        _clients[service_name] = client
+
+
+def reset_clients():
+    """Drop all cached clients so the next get_client call builds new ones."""
+    with _lock:
+        _clients.clear()
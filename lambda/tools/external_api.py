@@ -0,0 +1,312 @@
+"""
+Pooled, coalescing HTTP client for supplier and part-lookup APIs.
+
+Requests go through one urllib3 pool per container. Identical GETs that are
+in flight at the same time share a single upstream call (singleflight), and
+successful GET responses are kept in a small TTL cache. Each upstream host
+has a concurrency limit and a circuit breaker, so a slow or failing supplier
+fails fast instead of tying up Lambda concurrency.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+import urllib3
+
+from cache import LRUCache
+
+# Fast-path operation published in the Q Business plugin schema, see plugin_schema.py.
+# Lookups only: the fast path sends a GET whatever the caller asks for.
+OPERATION = {
+    'summary': 'Look up a supplier or part API',
+    'description': 'Calls an allowed supplier or part-lookup API (stock, lead time, part details) with a GET '
+                   'and returns its status and body.',
+    'parameters': {
+        'url': {'type': 'string', 'description': 'API URL; the host must be on the allow list'},
+        'params': {'type': 'object', 'description': 'Query string parameters'}
+    },
+    'required': ['url'],
+    'fixed': {'method': 'GET'}
+}
+
+
+class UpstreamError(Exception):
+    """Raised when a host is unavailable: circuit open, too busy, or failing."""
+
+    def __init__(self, message, status_code=503):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls
+    for `reset_timeout` seconds, then lets one trial call through (half-open).
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return (result, shared); shared is True when another caller did the work."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'done': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result'], True
+        try:
+            call['result'] = fn()
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+        return call['result'], False
+
+
+class ExternalApiClient:
+    def __init__(self, allowed_hosts, max_connections=10, host_concurrency=8,
+                 connect_timeout=2.0, read_timeout=5.0, cache_ttl=60, cache_size=512,
+                 failure_threshold=5, reset_timeout=30, acquire_timeout=1.0):
+        self.allowed_hosts = set(allowed_hosts)
+        self.pool = urllib3.PoolManager(
+            maxsize=max_connections,
+            retries=False,
+            timeout=urllib3.Timeout(connect=connect_timeout, read=read_timeout)
+        )
+        self.host_concurrency = host_concurrency
+        self.acquire_timeout = acquire_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.cache = LRUCache(max_entries=cache_size, ttl_seconds=cache_ttl)
+        self.flights = SingleFlight()
+        self.stats = {'upstream': 0, 'cacheHits': 0, 'coalesced': 0, 'rejected': 0}
+        self._limits = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _host_state(self, host):
+        with self._lock:
+            if host not in self._limits:
+                self._limits[host] = threading.BoundedSemaphore(self.host_concurrency)
+                self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._limits[host], self._breakers[host]
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def request(self, method, url, params=None, headers=None, body=None):
+        """
+        Call the upstream API and return {'status', 'body', 'cached', 'coalesced'}.
+        Raises ValueError for disallowed URLs and UpstreamError when the host is unavailable.
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or parts.hostname not in self.allowed_hosts:
+            raise ValueError(f"Host not allowed: {parts.hostname}")
+        if params:
+            url = f"{url}{'&' if parts.query else '?'}{urlencode(params)}"
+        method = method.upper()
+
+        if method != 'GET':
+            return dict(self._send(parts.netloc, method, url, headers, body), cached=False, coalesced=False)
+
+        key = request_key(url, headers)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count('cacheHits')
+            return dict(cached, cached=True, coalesced=False)
+
+        result, shared = self.flights.do(key, lambda: self._fetch_and_cache(parts.netloc, url, headers, key))
+        if shared:
+            self._count('coalesced')
+        return dict(result, cached=False, coalesced=shared)
+
+    def _fetch_and_cache(self, host, url, headers, key):
+        result = self._send(host, 'GET', url, headers, None)
+        if 200 <= result['status'] < 300:
+            self.cache.put(key, result)
+        return result
+
+    def _send(self, host, method, url, headers, body):
+        limit, breaker = self._host_state(host)
+        if not breaker.allow():
+            self._count('rejected')
+            raise UpstreamError(f"Circuit open for {host}")
+        if not limit.acquire(timeout=self.acquire_timeout):
+            # A saturated host is a slow host: count it towards opening the circuit
+            self._count('rejected')
+            breaker.record_failure()
+            raise UpstreamError(f"Too many concurrent requests to {host}", status_code=429)
+        try:
+            self._count('upstream')
+            response = self.pool.request(method, url, headers=headers, body=body)
+        except urllib3.exceptions.HTTPError as e:
+            breaker.record_failure()
+            raise UpstreamError(f"{host} unavailable: {e}", status_code=504) from e
+        finally:
+            limit.release()
+
+        # 5xx and 429 mean the supplier is struggling; 4xx are the caller's problem
+        if response.status >= 500 or response.status == 429:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return {'status': response.status, 'body': decode_body(response)}
+
+
+def request_key(url, headers):
+    """
+    Cache and singleflight key for a GET. Headers such as Authorization can
+    change the answer, so they are part of it (as a hash, to keep credentials
+    out of the key); header names are case-insensitive.
+    """
+    if not headers:
+        return url
+    canonical = json.dumps(sorted((name.lower(), str(value)) for name, value in headers.items()))
+    return f"{url}#{hashlib.sha256(canonical.encode('utf-8')).hexdigest()}"
+
+
+def decode_body(response):
+    data = response.data
+    if 'json' in (response.headers.get('Content-Type') or ''):
+        try:
+            return json.loads(data)
+        except ValueError:
+            pass
+    return data.decode('utf-8', errors='replace')
+
+
+def handle(event):
+    """
+    Call an allowed supplier or part-lookup API.
+    Expects 'url' and optional 'method' (default GET), 'params', 'headers' and 'body'.
+    """
+    if not event.get('url'):
+        return {
+            'statusCode': 400,
+            'body': json.dumps({
+                'error': 'url is required'
+            })
+        }
+
+    body = event.get('body')
+    try:
+        result = get_client().request(
+            event.get('method', 'GET'),
+            event['url'],
+            params=event.get('params'),
+            headers=event.get('headers'),
+            body=json.dumps(body) if isinstance(body, (dict, list)) else body
+        )
+    except ValueError as e:
+        return {
+            'statusCode': 403,
+            'body': json.dumps({
+                'error': str(e)
+            })
+        }
+    except UpstreamError as e:
+        return {
+            'statusCode': e.status_code,
+            'body': json.dumps({
+                'error': str(e)
+            })
+        }
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps(result)
+    }
+
+
+def warmup():
+    """Build the pooled client ahead of the first call."""
+    get_client()
+
+
+def allowed_hosts():
+    return [h.strip() for h in os.environ.get('EXTERNAL_API_ALLOWED_HOSTS', '').split(',') if h.strip()]
+
+
+def enabled():
+    """Without an allow list every call is refused, so the operation is not published."""
+    return bool(allowed_hosts())
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Build the container-wide client from environment variables on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ExternalApiClient(
+                    allowed_hosts=allowed_hosts(),
+                    max_connections=int(os.environ.get('EXTERNAL_API_MAX_CONNECTIONS', '10')),
+                    host_concurrency=int(os.environ.get('EXTERNAL_API_HOST_CONCURRENCY', '8')),
+                    connect_timeout=float(os.environ.get('EXTERNAL_API_CONNECT_TIMEOUT', '2')),
+                    read_timeout=float(os.environ.get('EXTERNAL_API_READ_TIMEOUT', '5')),
+                    cache_ttl=int(os.environ.get('EXTERNAL_API_CACHE_TTL', '60')),
+                    failure_threshold=int(os.environ.get('EXTERNAL_API_FAILURE_THRESHOLD', '5')),
+                    reset_timeout=float(os.environ.get('EXTERNAL_API_RESET_TIMEOUT', '30'))
+                )
+    return _client
@@ -0,0 +1,87 @@
+"""
+Direct-tool fast path for lookups whose intent is already known.
+
+A full agent turn plans with the model, calls the tool through the action
+group Lambda, then calls the model again to write the answer. Q Business
+already picks the operation and its parameters from the plugin schema (see
+plugin_schema.py), so POST /tools/{tool} skips the agent: the API function
+runs the registered tool in-process and returns its JSON result. With a
+`question` in the body, one Converse call on FAST_PATH_MODEL_ID turns the
+result into a short answer. Only tools that publish an OPERATION are exposed,
+and only the parameters it declares are passed on: anything else in the body
+(a method, headers, a request body) is dropped, and the operation's `fixed`
+values always win.
+"""
+import json
+import os
+import time
+
+import tools
+from clients import get_client
+
+ANSWER_PROMPT = (
+    'Answer the question using only the {tool} result below. Be brief and quote figures exactly. '
+    'If the result does not answer the question, say so.\n\n'
+    'Question: {question}\n\n'
+    'Result:\n{result}'
+)
+
+
+class FastPathError(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def answer(tool, question, result_body, model_id, max_result_chars=20000, max_tokens=512, bedrock_client=None):
+    """Write a short answer to question from a tool result with one Converse call. Returns (text, usage)."""
+    client = bedrock_client or get_client('bedrock-runtime')
+    response = client.converse(
+        modelId=model_id,
+        messages=[{'role': 'user', 'content': [{'text': ANSWER_PROMPT.format(
+            tool=tool,
+            question=question,
+            result=result_body[:max_result_chars]
+        )}]}],
+        inferenceConfig={'maxTokens': max_tokens, 'temperature': 0}
+    )
+    text = ''.join(part.get('text', '') for part in response['output']['message']['content'])
+    return text, response.get('usage', {})
+
+
+def run(name, body, bedrock_client=None):
+    """
+    Run tool name with body's parameters. Returns (status code, payload);
+    raises FastPathError for tools that are not exposed.
+    """
+    operation = tools.describe_tool(name) if name in tools.TOOLS else None
+    if not operation:
+        raise FastPathError(f"No fast-path operation for tool: {name}", 404)
+    params = {key: body[key] for key in operation.get('parameters', {}) if key in body}
+    params.update(operation.get('fixed', {}))
+
+    start = time.perf_counter()
+    result = tools.dispatch(dict(params, tool_type=name))
+    tool_ms = (time.perf_counter() - start) * 1000
+    if result['statusCode'] >= 400:
+        return result['statusCode'], dict(json.loads(result['body']), tool=name)
+
+    payload = {'tool': name, 'result': json.loads(result['body'])}
+    timings = {'toolMs': round(tool_ms, 2)}
+    if body.get('question'):
+        model_start = time.perf_counter()
+        payload['answer'], usage = answer(
+            name,
+            body['question'],
+            result['body'],
+            os.environ.get('FAST_PATH_MODEL_ID', 'anthropic.claude-3-haiku-20240307-v1:0'),
+            int(os.environ.get('FAST_PATH_MAX_RESULT_CHARS', '20000')),
+            bedrock_client=bedrock_client
+        )
+        timings['modelMs'] = round((time.perf_counter() - model_start) * 1000, 2)
+        if usage:
+            timings['inputTokens'] = usage.get('inputTokens')
+            timings['outputTokens'] = usage.get('outputTokens')
+    timings['latencyMs'] = round((time.perf_counter() - start) * 1000, 2)
+    payload['metrics'] = timings
+    return 200, payload
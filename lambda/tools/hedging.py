@@ -0,0 +1,221 @@
+"""
+Hedged invoke_agent calls for cutting tail latency.
+
+If the primary call has produced no event after the hedge delay (by default
+the observed p95 time to first event), a duplicate is sent to a replica alias
+(or the same one). Whichever produces its first event first wins; the other
+stream is closed. A budget caps hedges to a fraction of requests so hedging
+cannot double the load on the agent.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+_END = object()
+
+
+class LatencyWindow:
+    """The last max_samples times to first event, in seconds."""
+
+    def __init__(self, max_samples=200):
+        self.samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, q, min_samples=20):
+        """The q-th percentile, or None until min_samples have been seen."""
+        with self._lock:
+            if len(self.samples) < min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+class HedgeBudget:
+    """Allows hedges for at most `ratio` of requests, with up to `burst` saved up."""
+
+    def __init__(self, ratio=0.1, burst=5):
+        self.ratio = ratio
+        self.burst = burst
+        self.credits = burst
+        self._lock = threading.Lock()
+
+    def add_request(self):
+        with self._lock:
+            self.credits = min(self.burst, self.credits + self.ratio)
+
+    def take(self):
+        with self._lock:
+            if self.credits >= 1:
+                self.credits -= 1
+                return True
+            return False
+
+
+class Attempt:
+    def __init__(self, target):
+        self.target = target
+        self.response = None
+        self.iterator = None
+        self.first = _END
+        self.error = None
+        self.done = False
+        self.cancelled = False
+
+    def cancel(self):
+        """Close the stream so the connection is released; safe to call more than once."""
+        self.cancelled = True
+        completion = (self.response or {}).get('completion')
+        if completion is not None and hasattr(completion, 'close'):
+            try:
+                completion.close()
+            except ValueError:
+                # A generator cannot be closed while its thread is inside it; that thread closes it
+                pass
+
+
+class Race:
+    """Runs attempts on daemon threads and settles on the first one to produce an event."""
+
+    def __init__(self, start, window):
+        self.start = start
+        self.window = window
+        self.attempts = []
+        self.winner = None
+        self._cond = threading.Condition()
+
+    def launch(self, target):
+        attempt = Attempt(target)
+        with self._cond:
+            self.attempts.append(attempt)
+        threading.Thread(target=self._run, args=(attempt,), daemon=True).start()
+
+    def _run(self, attempt):
+        started = time.perf_counter()
+        try:
+            attempt.response = self.start(attempt.target)
+            if attempt.cancelled:
+                attempt.cancel()
+                return
+            attempt.iterator = iter(attempt.response['completion'])
+            attempt.first = next(attempt.iterator, _END)
+            self.window.add(time.perf_counter() - started)
+        except Exception as e:
+            attempt.error = e
+        with self._cond:
+            attempt.done = True
+            if self.winner is None and attempt.error is None:
+                self.winner = attempt
+            elif attempt.error is None:
+                attempt.cancel()
+            self._cond.notify_all()
+
+    def settled(self):
+        return self.winner is not None or all(attempt.done for attempt in self.attempts)
+
+    def wait(self, timeout=None):
+        """Wait until a winner is known or every attempt failed. Returns whether that happened."""
+        with self._cond:
+            return self._cond.wait_for(self.settled, timeout)
+
+    def result(self):
+        """The winning (target, response), cancelling the losers. Raises the first error if all failed."""
+        self.wait()
+        with self._cond:
+            winner = self.winner
+            for attempt in self.attempts:
+                if attempt is not winner:
+                    attempt.cancel()
+        if winner is None:
+            raise self.attempts[0].error
+        first, rest = winner.first, winner.iterator
+
+        def completion():
+            if first is _END:
+                return
+            yield first
+            yield from rest
+
+        return winner.target, dict(winner.response, completion=completion())
+
+
+class Hedger:
+    def __init__(self, tiers=(), delay_ms=None, default_delay_ms=2000, percentile=95, min_samples=20,
+                 budget=None, window=None):
+        self.tiers = set(tiers)
+        self.delay_ms = delay_ms
+        self.default_delay_ms = default_delay_ms
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.budget = budget or HedgeBudget()
+        self.window = window or LatencyWindow()
+        self.counters = {'requests': 0, 'hedged': 0, 'hedgeWins': 0}
+        self._lock = threading.Lock()
+
+    def should_hedge(self, body, tier):
+        """
+        Hedge when the request sets `"hedge": true`, or its tier is listed in
+        HEDGE_TIERS and it does not set `"hedge": false`. Session requests are
+        never hedged: two concurrent calls would race on one session.
+        """
+        if body.get('sessionId'):
+            return False
+        if 'hedge' in body:
+            return body['hedge'] is True
+        return tier in self.tiers
+
+    def delay(self):
+        """Seconds to wait for the primary before hedging."""
+        if self.delay_ms is not None:
+            return self.delay_ms / 1000
+        observed = self.window.percentile(self.percentile, self.min_samples)
+        return observed if observed is not None else self.default_delay_ms / 1000
+
+    def invoke(self, start, primary, replica=None, can_hedge=None):
+        """
+        Call start(primary) and, if it stays silent past the delay and the
+        budget allows, start(replica or primary). Returns (winner, response)
+        where response['completion'] replays the winner's first event.
+        """
+        self.budget.add_request()
+        self._count('requests')
+        race = Race(start, self.window)
+        race.launch(primary)
+        replica = replica or primary
+        if not race.wait(self.delay()) and self.budget.take() and (can_hedge is None or can_hedge(replica)):
+            self._count('hedged')
+            race.launch(replica)
+        winner, response = race.result()
+        # Compare attempts, not targets: a hedge on the same alias has the same name
+        won = race.winner is not race.attempts[0]
+        if won:
+            self._count('hedgeWins')
+        response['hedge'] = {'hedged': len(race.attempts) > 1, 'won': won, 'winner': getattr(winner, 'name', None)}
+        return winner, response
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+
+def from_environment():
+    """Build the hedger from function environment variables."""
+    delay_ms = os.environ.get('HEDGE_DELAY_MS')
+    return Hedger(
+        tiers=[t.strip() for t in os.environ.get('HEDGE_TIERS', '').split(',') if t.strip()],
+        delay_ms=float(delay_ms) if delay_ms else None,
+        default_delay_ms=float(os.environ.get('HEDGE_DEFAULT_DELAY_MS', '2000')),
+        percentile=float(os.environ.get('HEDGE_PERCENTILE', '95')),
+        budget=HedgeBudget(
+            ratio=float(os.environ.get('HEDGE_BUDGET_PERCENT', '10')) / 100,
+            burst=float(os.environ.get('HEDGE_BUDGET_BURST', '5'))
+        )
+    )
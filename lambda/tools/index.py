@@ -1,82 +1,557 @@
+import base64
 import json
-import boto3
 import os
+import time
 import uuid
 
+import admission
+import batch
+import cache
+import fast_path
+import hedging
+import jobs
+import metrics
+import routing
+import sessions
+import spill
+import tracing
+from agent import InvocationTimer, await_first_event, collect_completion, iter_completion
+from clients import get_client, prewarm
+
+# Built once per container; None when RESPONSE_CACHE_ENABLED is not true
+response_cache = cache.from_environment()
+
+# Per-alias token bucket and throttling backoff shared by every request
+admission_control = admission.from_environment()
+
+# Pool of agent aliases to route prompts across, see routing.py
+agent_router = routing.from_environment()
+
+# Duplicates slow calls for request types that opt in, see hedging.py
+hedger = hedging.from_environment()
+
+# Compacts long sessions into fresh agent sessions; None unless a threshold is set
+session_manager = sessions.from_environment()
+
+# Async mode queue and job store; None unless JOBS_TABLE and JOBS_QUEUE_URL are set
+job_service = jobs.from_environment()
+
+# Large-response mode; None unless RESPONSE_SPILL_BUCKET is set
+response_spill = spill.from_environment()
+
+# Build the agent client in the init phase rather than on the first request
+prewarm(['bedrock-agent-runtime'])
+
+
 def handler(event, context):
     """
     Lambda function handling Bedrock Agent requests through API Gateway.
     Processes incoming requests and invokes a Bedrock agent.
+    Also serves GET /jobs/{jobId} for async requests and POST /tools/{tool}
+    for the direct-tool fast path.
     """
     try:
-        # Initialize Bedrock Agent Runtime client
-        bedrock_agent = boto3.client('bedrock-agent-runtime')
-        
-        # Extract request body
-        body = json.loads(event.get('body', '{}'))
-        
-        # Get the input text/prompt
-        input_text = body.get('prompt')
-        
-        if not input_text:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json'
-                },
-                'body': json.dumps({
-                    'error': 'Prompt is required'
-                })
-            }
-
-        # Get agent ID from environment variable
-        agent_id = os.environ.get('BEDROCK_AGENT_ID')
-        agent_alias_id = os.environ.get('BEDROCK_AGENT_ALIAS_ID')
-        
-        if not agent_id or not agent_alias_id:
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json'
-                },
-                'body': json.dumps({
-                    'error': 'Agent ID or Agent Alias ID not configured'
-                })
-            }
-
-        # Invoke Bedrock agent
-        response = bedrock_agent.invoke_agent(
-            agentId=agent_id,
-            agentAliasId=agent_alias_id,
-            sessionId=body.get('sessionId', str(uuid.uuid4())),  # This is correct
-            inputText=input_text
-        )
-        # Extract completion from the event stream
-        completion = ""
-        for event in response['completion']:
-            chunk = event['chunk']
-            if 'bytes' in chunk:
-                completion += chunk['bytes'].decode('utf-8')
+        if (event.get('pathParameters') or {}).get('jobId'):
+            return get_job(event)
+
+        if (event.get('pathParameters') or {}).get('tool'):
+            return run_tool(event)
+
+        # Reuse the container-wide Bedrock Agent Runtime client
+        bedrock_agent = get_client('bedrock-agent-runtime')
+
+        body, error = parse_request(event)
+        if error:
+            return error
+
+        # Async mode answers later on the worker; callers poll /jobs/{jobId}
+        if body.get('async') is True:
+            return submit_job(body)
+
+        # Batch mode fans the prompts out concurrently
+        if 'prompts' in body:
+            return handle_batch(bedrock_agent, body, context)
+
         # Parse and return response
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json'
-            },
-            'body': json.dumps({
-                'agentId': agent_id,
-                'response': completion,
-                'sessionId': response.get('sessionId')
+        return json_response(200, {
+            'agentId': os.environ.get('BEDROCK_AGENT_ID'),
+            **answer_prompt(bedrock_agent, body, context=context)
+        })
+
+    except admission.Overloaded as e:
+        # Shed load instead of failing, and tell the client when to come back
+        return json_response(429, {
+            'error': str(e),
+            'retryAfter': e.retry_after
+        }, {'Retry-After': str(e.retry_after)})
+
+    except Exception as e:
+        return json_response(500, {
+            'error': str(e)
+        })
+
+
+def stream_handler(event, response_stream, context):
+    """
+    Streaming variant of handler, served by the stream function's
+    RESPONSE_STREAM function URL through stream_runtime.py.
+    Writes newline-delimited JSON: one {"chunk": ...} frame per decoded chunk
+    as soon as it arrives, then a final {"done": true, ...} frame with metrics.
+    Takes a single prompt; batch and async requests go to POST /invoke.
+    Errors raised before the first frame set the HTTP status (400, 429 with
+    Retry-After, 500); after it the status is already 200, so they arrive as
+    a final {"error": ...} frame.
+    """
+    try:
+        bedrock_agent = get_client('bedrock-agent-runtime')
+
+        body, error = parse_request(event)
+        if error:
+            response_stream.set_status(error['statusCode'])
+            write_frame(response_stream, json.loads(error['body']))
+            return
+        if 'prompts' in body or body.get('async') is True:
+            response_stream.set_status(400)
+            write_frame(response_stream, {
+                'error': 'Streaming takes a single prompt; send batch and async requests to /invoke'
+            })
+            return
+
+        timer = InvocationTimer()
+        key, cached = lookup_cache(body)
+        if cached is not None:
+            timer.mark_first_byte()
+            write_frame(response_stream, {'chunk': cached['response']})
+            timer.stop()
+            metrics.record_invocation(timer, cached=True, mode='stream')
+            write_frame(response_stream, {
+                'done': True,
+                'agentId': os.environ.get('BEDROCK_AGENT_ID'),
+                'sessionId': None,
+                'cached': True,
+                'metrics': timer.as_dict()
             })
+            return
+
+        trace = tracing.start(body)
+        deadline = admission_control.deadline(context)
+        session = begin_session(bedrock_agent, body, deadline)
+        request = session.body if session else body
+        target = None
+        try:
+            # Only the initial call is retried or rerouted; chunks may be on the wire after it
+            def call(candidate):
+                timer.restart()
+                return start_agent(bedrock_agent, request, candidate, enable_trace=trace is not None)
+
+            _, (target, response) = call_routed(request, call, deadline)
+            parts = []
+            for text in iter_completion(response, timer, trace and trace.on_event):
+                write_frame(response_stream, {'chunk': text})
+                if key or session:
+                    parts.append(text)
+        except Exception as e:
+            if target:
+                get_router().record_failure(target)
+            metrics.record_error(e, mode='stream')
+            finish_trace(trace, e)
+            raise
+        get_router().record_success(target, timer.as_dict()['timeToFirstByteMs'])
+        session_info = finish_session(session, ''.join(parts), timer)
+        metrics.record_invocation(timer, cached=False, mode='stream', route=target.name, hedge=response.get('hedge'),
+                                  session=session_info)
+        finish_trace(trace)
+        if key:
+            response_cache.put(key, {'response': ''.join(parts)})
+
+        done = {
+            'done': True,
+            'agentId': target.agent_id,
+            'route': target.name,
+            'sessionId': body['sessionId'] if session else response.get('sessionId'),
+            'cached': False,
+            'metrics': timer.as_dict()
         }
-            
+        if session_info:
+            done['session'] = session_info
+        if trace and body.get('trace') is True:
+            done['trace'] = trace.breakdown()
+        write_frame(response_stream, done)
+
+    except admission.Overloaded as e:
+        response_stream.set_status(429, {'Retry-After': str(e.retry_after)})
+        write_frame(response_stream, {
+            'error': str(e),
+            'retryAfter': e.retry_after
+        })
     except Exception as e:
+        response_stream.set_status(500)
+        write_frame(response_stream, {
+            'error': str(e)
+        })
+    finally:
+        response_stream.close()
+
+
+def parse_request(event):
+    """
+    Extract and validate the request body.
+    Returns (body, None) on success or (None, error_response) on failure.
+    """
+    body = event.get('body') or '{}'
+    # Function URLs base64-encode bodies they do not recognise as text
+    if event.get('isBase64Encoded'):
+        body = base64.b64decode(body).decode('utf-8')
+    body = json.loads(body)
+
+    # Get the input text/prompt, or the prompts array in batch mode
+    if not body.get('prompt') and 'prompts' not in body:
+        return None, json_response(400, {
+            'error': 'Prompt is required'
+        })
+
+    # Get agent ID from environment variable
+    if not os.environ.get('BEDROCK_AGENT_ID') or not os.environ.get('BEDROCK_AGENT_ALIAS_ID'):
+        return None, json_response(500, {
+            'error': 'Agent ID or Agent Alias ID not configured'
+        })
+
+    return body, None
+
+
+def answer_prompt(bedrock_agent, body, mode='buffered', context=None, on_text=None, spiller=None):
+    """
+    Answer one prompt from the cache or the agent, buffering the completion.
+    on_text sees each decoded part as it arrives (used by the async worker).
+    mode tags the emitted metrics record (buffered, batch or async). The prompt is
+    routed across the alias pool until the agent sends its first event:
+    throttled calls are retried within the admission wait budget, which starts
+    now and is capped by the Lambda time left in context, failed ones move on
+    to the next alias, and admission.Overloaded is raised when every alias is
+    exhausted. Reading the rest of the completion is not retried. In
+    large-response mode, answers past the threshold are uploaded to S3 and the
+    result carries a preview in `response` and the presigned URL in `spilled`.
+    spiller replaces the container's response_spill (the worker spills at a
+    smaller size).
+    """
+    spiller = spiller or response_spill
+    # Serve repeated prompts from the response cache
+    timer = InvocationTimer()
+    key, cached = lookup_cache(body)
+    if cached is not None:
+        timer.stop()
+        metrics.record_invocation(timer, cached=True, mode=mode)
+        if on_text:
+            on_text(cached['response'])
         return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json'
-            },
-            'body': json.dumps({
-                'error': str(e)
-            })
-        }
\ No newline at end of file
+            'response': cached['response'],
+            'sessionId': None,
+            'cached': True,
+            'metrics': timer.as_dict()
+        }
+
+    # Invoke Bedrock agent and buffer the completion, tracing sampled requests
+    trace = tracing.start(body)
+    deadline = admission_control.deadline(context)
+    session = begin_session(bedrock_agent, body, deadline)
+    request = session.body if session else body
+    target = None
+
+    def call(candidate):
+        timer.restart()
+        return start_agent(bedrock_agent, request, candidate, enable_trace=trace is not None)
+
+    try:
+        _, (target, response) = call_routed(request, call, deadline)
+        completion, spilled = collect_response(response, timer, trace and trace.on_event, on_text, spiller)
+    except Exception as e:
+        if target:
+            get_router().record_failure(target)
+        metrics.record_error(e, mode=mode)
+        finish_trace(trace, e)
+        raise
+    get_router().record_success(target, timer.as_dict()['timeToFirstByteMs'])
+    if spilled:
+        session_info = finish_session(session, spilled['preview'], timer, spilled['characters'])
+    else:
+        session_info = finish_session(session, completion, timer)
+    metrics.record_invocation(timer, cached=False, mode=mode, route=target.name, hedge=response.get('hedge'),
+                              session=session_info, spilled=None if spiller is None else bool(spilled))
+    finish_trace(trace)
+    # Presigned URLs expire, so spilled answers are not cached
+    if key and not spilled:
+        response_cache.put(key, {'response': completion})
+
+    result = {
+        'agentId': target.agent_id,
+        'route': target.name,
+        'response': spilled['preview'] if spilled else completion,
+        # Compacted sessions run on a new agent session; the caller keeps its own id
+        'sessionId': body['sessionId'] if session else response.get('sessionId'),
+        'cached': False,
+        'metrics': timer.as_dict()
+    }
+    if spilled:
+        result['spilled'] = {name: value for name, value in spilled.items() if name != 'preview'}
+    if session_info:
+        result['session'] = session_info
+    # Only callers that asked for the trace get the breakdown back
+    if trace and body.get('trace') is True:
+        result['trace'] = trace.breakdown()
+    return result
+
+
+def collect_response(response, timer=None, on_trace=None, on_text=None, spiller=None):
+    """
+    Buffer the completion, or pass it through a spill writer in large-response
+    mode. Returns (text, None), or (None, spilled) once the answer went to S3.
+    """
+    spiller = spiller or response_spill
+    if spiller is None:
+        return collect_completion(response, timer, on_trace, on_text), None
+    writer = spiller.writer()
+    try:
+        for text in iter_completion(response, timer, on_trace):
+            if on_text:
+                on_text(text)
+            writer.add(text)
+        return writer.finish()
+    except Exception:
+        writer.abort()
+        raise
+
+
+def handle_batch(bedrock_agent, body, context=None):
+    """
+    Answer an array of prompts with bounded concurrency.
+    Per-item results and errors are returned in input order. Each item gets
+    its own admission wait budget when it starts.
+    """
+    try:
+        items = batch.parse_items(body)
+        concurrency = batch.concurrency_limit(body, len(items))
+    except ValueError as e:
+        return json_response(400, {
+            'error': str(e)
+        })
+
+    timer = InvocationTimer()
+    results = batch.run_batch(
+        items,
+        lambda item: answer_prompt(bedrock_agent, item, mode='batch', context=context),
+        concurrency
+    )
+    timer.stop()
+
+    return json_response(200, {
+        'agentId': os.environ.get('BEDROCK_AGENT_ID'),
+        'results': results,
+        'metrics': {
+            'count': len(results),
+            'errors': sum(1 for result in results if 'error' in result),
+            'concurrency': concurrency,
+            'latencyMs': timer.as_dict()['latencyMs']
+        }
+    })
+
+
+def run_tool(event):
+    """POST /tools/{tool}: run a registered tool without the agent, see fast_path.py."""
+    tool = event['pathParameters']['tool']
+    try:
+        body = json.loads(event.get('body') or '{}')
+    except ValueError:
+        body = None
+    if not isinstance(body, dict):
+        return json_response(400, {
+            'error': 'Request body must be a JSON object'
+        })
+    try:
+        status_code, payload = fast_path.run(tool, body)
+    except fast_path.FastPathError as e:
+        return json_response(e.status_code, {
+            'error': str(e)
+        })
+    except Exception as e:
+        metrics.record_error(e, mode='fast')
+        raise
+    metrics.record_fast_path(tool, status_code, payload.get('metrics'))
+    return json_response(status_code, payload)
+
+
+def submit_job(body):
+    """Queue body for the worker and return 202 with the job id to poll."""
+    if job_service is None:
+        return json_response(400, {
+            'error': 'Async mode is not configured'
+        })
+    if 'prompts' in body:
+        return json_response(400, {
+            'error': 'Async mode takes a single prompt'
+        })
+    job = job_service.submit(body)
+    return json_response(202, {
+        'jobId': job['jobId'],
+        'status': job['status'],
+        'version': job['version'],
+        'statusUrl': f"/jobs/{job['jobId']}"
+    }, {'Location': f"/jobs/{job['jobId']}"})
+
+
+def get_job(event):
+    """
+    GET /jobs/{jobId}[?since=<version>&wait=<seconds>]. With since and wait the
+    call long-polls until the job moves past that version or finishes.
+    """
+    if job_service is None:
+        return json_response(404, {
+            'error': 'Async mode is not configured'
+        })
+    params = event.get('queryStringParameters') or {}
+    try:
+        since = int(params['since']) if params.get('since') is not None else None
+        wait = float(params.get('wait') or 0)
+    except ValueError:
+        return json_response(400, {
+            'error': 'since must be an integer and wait a number of seconds'
+        })
+
+    job = job_service.poll(event['pathParameters']['jobId'], since, wait)
+    if job is None:
+        return json_response(404, {
+            'error': 'Job not found'
+        })
+    return json_response(200, jobs.public_view(job))
+
+
+def lookup_cache(body):
+    """
+    Look the prompt up in the response cache.
+    Returns (key, cached_value); key is None when the request must not be cached.
+    """
+    if response_cache is None:
+        return None, None
+    if not response_cache.should_use(body):
+        response_cache.bypass()
+        return None, None
+    key = cache.cache_key(
+        os.environ['BEDROCK_AGENT_ID'],
+        os.environ['BEDROCK_AGENT_ALIAS_ID'],
+        body['prompt'],
+        get_router().cache_scope(body)
+    )
+    return key, response_cache.get(key)
+
+
+def get_router():
+    """The alias router, built on first use if the environment was set after import."""
+    global agent_router
+    if agent_router is None:
+        agent_router = routing.from_environment()
+    return agent_router
+
+
+def call_routed(body, call, deadline):
+    """
+    Run call(target) on the routed aliases in turn until one succeeds, each
+    under admission control. Returns (target, result); raises the last error
+    when every alias fails. Successes are recorded by the caller once the
+    time to first chunk is known.
+    """
+    router = get_router()
+    error = None
+    for target in router.route(body):
+        try:
+            return target, admission_control.call(target.key, lambda: call(target), deadline)
+        except Exception as e:
+            router.record_failure(target)
+            error = e
+            if time.time() >= deadline:
+                break
+    raise error
+
+
+def start_agent(bedrock_agent, body, target, enable_trace=False):
+    """
+    Start the agent call on target, hedged with a duplicate on a replica alias
+    when the request opts in, and wait for its first event. Returns (winning
+    target, response); the route reported back is the winner's, since its
+    session is the one that exists.
+    """
+    def start(candidate):
+        return await_first_event(invoke_agent(bedrock_agent, body, enable_trace=enable_trace, target=candidate))
+
+    if not hedger.should_hedge(body, target.tier):
+        return target, start(target)
+    return hedger.invoke(
+        start,
+        target,
+        get_router().replica(target),
+        can_hedge=lambda replica: admission_control.try_admit(replica.key)
+    )
+
+
+def invoke_agent(bedrock_agent, body, enable_trace=False, target=None):
+    """Invoke the Bedrock agent (target alias, or the configured one) and return the raw streaming response."""
+    return bedrock_agent.invoke_agent(
+        agentId=target.agent_id if target else os.environ['BEDROCK_AGENT_ID'],
+        agentAliasId=target.alias_id if target else os.environ['BEDROCK_AGENT_ALIAS_ID'],
+        sessionId=body.get('sessionId', str(uuid.uuid4())),
+        inputText=body['prompt'],
+        enableTrace=enable_trace
+    )
+
+
+def begin_session(bedrock_agent, body, deadline):
+    """
+    Start a managed turn for session requests, compacting the session first
+    when it is over its threshold. With SESSION_SUMMARY_MODE=agent the old
+    agent session is asked for the summary. None when sessions are unmanaged.
+    """
+    if session_manager is None or not body.get('sessionId'):
+        return None
+
+    def summarize(state):
+        request = {**body, 'sessionId': state['agentSessionId'], 'prompt': session_manager.summary_prompt()}
+        _, response = call_routed(
+            request,
+            lambda target: await_first_event(invoke_agent(bedrock_agent, request, target=target)),
+            deadline
+        )
+        return collect_completion(response)
+
+    return session_manager.begin(body, summarize if session_manager.summary_mode == 'agent' else None)
+
+
+def finish_session(session, completion, timer, characters=None):
+    """
+    Record a managed turn and return its session info, or None for unmanaged
+    requests. characters is the full answer length when completion is only its
+    preview.
+    """
+    if session is None:
+        return None
+    return session_manager.finish(session, completion, timer.as_dict()['timeToFirstByteMs'], characters)
+
+
+def finish_trace(trace, error=None):
+    """Close and log a request's trace spans; a no-op for untraced requests."""
+    if trace is None:
+        return
+    trace.finish(error)
+    tracing.emit(trace)
+
+
+def json_response(status_code, payload, headers=None):
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            **(headers or {})
+        },
+        'body': json.dumps(payload)
+    }
+
+
+def write_frame(response_stream, payload):
+    response_stream.write((json.dumps(payload) + '\n').encode('utf-8'))
@@ -0,0 +1,355 @@
+"""
+Asynchronous prompt jobs for answers that outlast the API Gateway timeout.
+
+POST /invoke with "async": true stores a queued job and enqueues its id; the
+worker function answers it, writing partial progress as chunks arrive; and
+GET /jobs/{jobId} returns the job, optionally long-polling until its version
+moves past `since`.
+
+Job stores and queues come in two flavours: MemoryJobStore/MemoryQueue for
+local runs and DynamoDBJobStore/SQSQueue for the deployed stack. The AWS ones
+accept clients, so they can be pointed at moto.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+
+TERMINAL = ('succeeded', 'failed')
+# DynamoDB's item size limit, less room for the attributes stored next to the document
+MAX_DOCUMENT_BYTES = 400 * 1024 - 1024
+
+
+class JobBusy(Exception):
+    """Another worker is answering the job; retry after retry_after seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = max(1, int(retry_after))
+
+
+def new_job(body, ttl_seconds=86400):
+    now = time.time()
+    return {
+        'jobId': str(uuid.uuid4()),
+        'status': 'queued',
+        'version': 0,
+        'createdAt': now,
+        'updatedAt': now,
+        'expiresAt': int(now + ttl_seconds),
+        'request': body,
+        'progress': {'chunks': 0, 'responseBytes': 0, 'partial': ''},
+        'result': None,
+        'error': None
+    }
+
+
+def public_view(job):
+    """The job as returned by GET /jobs/{jobId}, without the original request."""
+    return {key: value for key, value in job.items() if key not in ('request', 'expiresAt')}
+
+
+class MemoryJobStore:
+    """Jobs in a dict; waiters are woken as soon as a job changes."""
+
+    def __init__(self):
+        self.jobs = {}
+        self._cond = threading.Condition()
+
+    def create(self, job):
+        with self._cond:
+            self.jobs[job['jobId']] = json.loads(json.dumps(job))
+
+    def get(self, job_id):
+        with self._cond:
+            job = self.jobs.get(job_id)
+            return json.loads(json.dumps(job)) if job else None
+
+    def update(self, job):
+        with self._cond:
+            job['version'] += 1
+            job['updatedAt'] = time.time()
+            self.jobs[job['jobId']] = json.loads(json.dumps(job))
+            self._cond.notify_all()
+
+    def wait(self, job_id, since, timeout):
+        with self._cond:
+            self._cond.wait_for(lambda: changed(self.jobs.get(job_id), since), timeout)
+        return self.get(job_id)
+
+
+class DynamoDBJobStore:
+    """
+    Jobs in a DynamoDB table with partition key `jobId` and TTL attribute
+    `expiresAt`. The job is kept as a JSON document next to its status and
+    version. Waiting polls with backoff, using strongly consistent reads.
+    """
+
+    def __init__(self, table_name, client=None):
+        self.table_name = table_name
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from clients import get_client
+            self._client = get_client('dynamodb')
+        return self._client
+
+    def create(self, job):
+        self.client.put_item(
+            TableName=self.table_name,
+            Item=self._item(job),
+            ConditionExpression='attribute_not_exists(jobId)'
+        )
+
+    def get(self, job_id):
+        item = self.client.get_item(
+            TableName=self.table_name,
+            Key={'jobId': {'S': job_id}},
+            ConsistentRead=True
+        ).get('Item')
+        return json.loads(item['document']['S']) if item else None
+
+    def update(self, job):
+        job['version'] += 1
+        job['updatedAt'] = time.time()
+        self.client.put_item(TableName=self.table_name, Item=self._item(job))
+
+    def wait(self, job_id, since, timeout, sleep=time.sleep):
+        deadline = time.monotonic() + timeout
+        delay = 0.2
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if changed(job, since) or remaining <= 0:
+                return job
+            sleep(min(delay, remaining))
+            delay = min(delay * 2, 2)
+
+    def _item(self, job):
+        return {
+            'jobId': {'S': job['jobId']},
+            'status': {'S': job['status']},
+            'version': {'N': str(job['version'])},
+            'expiresAt': {'N': str(job['expiresAt'])},
+            'document': {'S': document(job)}
+        }
+
+
+def document(job):
+    return json.dumps(job, ensure_ascii=False)
+
+
+def changed(job, since):
+    """True when there is something new to report to a poller that has seen version `since`."""
+    if job is None or since is None:
+        return True
+    return job['status'] in TERMINAL or job['version'] > since
+
+
+class MemoryQueue:
+    """In-process stand-in for the jobs queue; drain() yields SQS-shaped worker events."""
+
+    def __init__(self):
+        self.messages = []
+        self._lock = threading.Lock()
+
+    def send(self, job_id):
+        with self._lock:
+            self.messages.append({
+                'messageId': str(uuid.uuid4()),
+                'body': json.dumps({'jobId': job_id}),
+                'attributes': {'ApproximateReceiveCount': '1'}
+            })
+
+    def defer(self, record, seconds):
+        """Deliver the record again on the next drain, counting the receive."""
+        count = int(record['attributes']['ApproximateReceiveCount']) + 1
+        with self._lock:
+            self.messages.append(dict(record, attributes={'ApproximateReceiveCount': str(count)}))
+
+    def drain(self):
+        with self._lock:
+            messages, self.messages = self.messages, []
+        for message in messages:
+            yield {'Records': [message]}
+
+
+class SQSQueue:
+    def __init__(self, queue_url, client=None):
+        self.queue_url = queue_url
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from clients import get_client
+            self._client = get_client('sqs')
+        return self._client
+
+    def send(self, job_id):
+        self.client.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps({'jobId': job_id}))
+
+    def defer(self, record, seconds):
+        """Make a received record visible again after seconds instead of the full visibility timeout."""
+        self.client.change_message_visibility(
+            QueueUrl=self.queue_url,
+            ReceiptHandle=record['receiptHandle'],
+            # SQS caps a message's visibility timeout at 12 hours
+            VisibilityTimeout=min(int(seconds), 43200)
+        )
+
+
+class ProgressWriter:
+    """
+    Accumulates answer text for a running job and writes it back at most every
+    interval seconds, so pollers see partial answers without one write per chunk.
+    Only the first max_partial_bytes are kept; the rest is just counted.
+    """
+
+    def __init__(self, store, job, interval=1.0, max_partial_bytes=100000, clock=time.monotonic):
+        self.store = store
+        self.job = job
+        self.interval = interval
+        self.max_partial_bytes = max_partial_bytes
+        self.clock = clock
+        self.parts = []
+        self.chunks = 0
+        self.size = 0
+        self.last_write = clock()
+
+    def add(self, text):
+        if self.size < self.max_partial_bytes:
+            self.parts.append(text)
+        self.chunks += 1
+        self.size += len(text.encode('utf-8'))
+        if self.clock() - self.last_write >= self.interval:
+            self.flush()
+
+    def flush(self):
+        partial = ''.join(self.parts)
+        self.job['progress'] = {
+            'chunks': self.chunks,
+            'responseBytes': self.size,
+            # Keep the item well under the DynamoDB size limit; the result holds the full answer
+            'partial': partial.encode('utf-8')[:self.max_partial_bytes].decode('utf-8', 'ignore')
+        }
+        self.store.update(self.job)
+        self.last_write = self.clock()
+
+
+class JobService:
+    def __init__(self, store, queue, ttl_seconds=86400, max_wait_seconds=20, progress_interval=1.0,
+                 max_result_bytes=256 * 1024, stale_seconds=600):
+        self.store = store
+        self.queue = queue
+        self.ttl_seconds = ttl_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self.progress_interval = progress_interval
+        # Answers past this go to S3 in large-response mode, see worker.py
+        self.max_result_bytes = max_result_bytes
+        # A job left running for longer than the worker timeout has lost its worker
+        self.stale_seconds = stale_seconds
+
+    def submit(self, body):
+        """Store a queued job for body and enqueue it. Returns the job."""
+        job = new_job({k: v for k, v in body.items() if k != 'async'}, self.ttl_seconds)
+        self.store.create(job)
+        self.queue.send(job['jobId'])
+        return job
+
+    def poll(self, job_id, since=None, wait=0):
+        """
+        The job, or None if unknown. With wait > 0 and since set, block up to
+        wait seconds (capped by max_wait_seconds) for a newer version.
+        """
+        wait = min(max(wait, 0), self.max_wait_seconds)
+        if wait and since is not None:
+            return self.store.wait(job_id, since, wait)
+        return self.store.get(job_id)
+
+    def run(self, job_id, answer, last_attempt=False):
+        """
+        Answer a queued job with answer(request, on_text) and record the result.
+        answer must only pass on_text the answer it returns, never text from an
+        attempt it abandoned (index.answer_prompt retries only before the first
+        event). Jobs that are unknown or already finished are skipped, so redelivered
+        messages are harmless. A job another worker is running raises JobBusy;
+        one whose worker stopped updating it for stale_seconds is run again.
+        Exceptions carrying retry_after (admission control gave up) put the job
+        back to queued and propagate, so the queue redelivers it later, unless
+        this is the last attempt, which fails it. A result too large to store
+        with the job fails it too.
+        """
+        job = self.store.get(job_id)
+        if job is None or job['status'] in TERMINAL:
+            return job
+        if job['status'] == 'running':
+            age = time.time() - job['updatedAt']
+            if age < self.stale_seconds:
+                raise JobBusy(f"Job {job_id} is already running", self.stale_seconds - age)
+        job['status'] = 'running'
+        # A job run again starts its partial answer over rather than appending to the last run's
+        job['progress'] = {'chunks': 0, 'responseBytes': 0, 'partial': ''}
+        self.store.update(job)
+        progress = ProgressWriter(self.store, job, self.progress_interval)
+        try:
+            result = answer(job['request'], progress.add)
+        except Exception as e:
+            if getattr(e, 'retry_after', None) is not None and not last_attempt:
+                job['status'] = 'queued'
+                self.store.update(job)
+                raise
+            job['status'] = 'failed'
+            job['error'] = str(e)
+            self.store.update(job)
+            return job
+        # The result holds the full answer, so the partial copy is dropped
+        job['progress'] = {'chunks': progress.chunks, 'responseBytes': progress.size, 'partial': ''}
+        job['status'] = 'succeeded'
+        job['result'] = result
+        size = len(document(job).encode('utf-8'))
+        if size > MAX_DOCUMENT_BYTES:
+            job['status'] = 'failed'
+            job['result'] = None
+            job['error'] = (f"The answer is too large to store with the job ({size} bytes); "
+                            'turn on large-response mode to have it uploaded to S3')
+        self.store.update(job)
+        return job
+
+    def abandon(self, job_id, error):
+        """
+        Fail a job whose message was given up on, unless it finished or a
+        worker is still running it. Returns the job.
+        """
+        job = self.store.get(job_id)
+        if job is None or job['status'] in TERMINAL:
+            return job
+        if job['status'] == 'running' and time.time() - job['updatedAt'] < self.stale_seconds:
+            return job
+        job['status'] = 'failed'
+        job['error'] = error
+        self.store.update(job)
+        return job
+
+
+def from_environment():
+    """
+    Build the job service from JOBS_TABLE and JOBS_QUEUE_URL, or None when
+    async mode is not configured.
+    """
+    table_name = os.environ.get('JOBS_TABLE')
+    queue_url = os.environ.get('JOBS_QUEUE_URL')
+    if not table_name or not queue_url:
+        return None
+    return JobService(
+        DynamoDBJobStore(table_name),
+        SQSQueue(queue_url),
+        ttl_seconds=int(os.environ.get('JOBS_TTL_SECONDS', '86400')),
+        max_wait_seconds=float(os.environ.get('JOBS_MAX_WAIT_SECONDS', '20')),
+        progress_interval=float(os.environ.get('JOBS_PROGRESS_INTERVAL_SECONDS', '1')),
+        max_result_bytes=int(os.environ.get('JOBS_MAX_RESULT_BYTES', str(256 * 1024))),
+        stale_seconds=float(os.environ.get('JOBS_STALE_SECONDS', '600'))
+    )
@@ -0,0 +1,261 @@
+"""
+Local vectorized retrieval over a precomputed embedding index.
+
+Index layout (one directory, bundled with the function):
+    index.json      {"dimension": D, "count": N, "model": "<embedding model id>"}
+    embeddings.f32  N x D float32 rows, L2-normalized, row-major
+    chunks.jsonl    one JSON object per chunk, e.g. {"id", "source", "text"}
+    offsets.u64     N uint64 byte offsets of each line in chunks.jsonl
+
+The files are memory-mapped on first use, so a cold start only pays for the
+pages a query actually touches. Because rows are normalized, cosine similarity
+is a single matrix-vector product.
+
+With KNOWLEDGE_BASE_INDEX_URI (s3://bucket/prefix) set, the index is the one
+published by ai_agent_pipeline/assets/kb_ingest.py instead: the generation
+named in <prefix>/current.json is downloaded to /tmp once per container. A
+newer generation is only picked up by containers started after it was
+published. The function's ephemeral storage must hold the index; a download
+that would not fit fails up front with an error saying how much is needed.
+"""
+import errno
+import json
+import mmap
+import os
+import shutil
+import threading
+
+import numpy as np
+
+from cache import LRUCache, normalize_prompt
+from clients import get_client
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kb_index')
+DOWNLOAD_DIR = '/tmp/kb_index'
+
+# Downloaded last, so a directory with index.json holds a complete generation
+INDEX_FILES = ('embeddings.f32', 'chunks.jsonl', 'offsets.u64', 'index.json')
+
+# Fast-path operation published in the Q Business plugin schema, see plugin_schema.py
+OPERATION = {
+    'summary': 'Search the knowledge base',
+    'description': 'Returns the knowledge-base passages (IPC standards, process specifications, work '
+                   'instructions) closest to a query, with their source documents and scores.',
+    'parameters': {
+        'query': {'type': 'string', 'description': 'What to look up'},
+        'top_k': {'type': 'integer', 'description': 'Number of passages to return', 'default': 5,
+                  'minimum': 1, 'maximum': 50}
+    },
+    'required': ['query']
+}
+
+_index = None
+_index_lock = threading.Lock()
+
+# Query embeddings are reused across warm invocations
+_embedding_cache = LRUCache(
+    max_entries=int(os.environ.get('KNOWLEDGE_BASE_EMBEDDING_CACHE_SIZE', '1024')),
+    ttl_seconds=int(os.environ.get('KNOWLEDGE_BASE_EMBEDDING_CACHE_TTL', '3600'))
+)
+
+
+class VectorIndex:
+    """Read-only, memory-mapped view of an index directory."""
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, 'index.json'), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.dimension = self.manifest['dimension']
+        self.count = self.manifest['count']
+        self.model = self.manifest.get('model')
+        if self.count:
+            self.embeddings = np.memmap(
+                os.path.join(directory, 'embeddings.f32'),
+                dtype=np.float32, mode='r', shape=(self.count, self.dimension)
+            )
+            self.offsets = np.memmap(
+                os.path.join(directory, 'offsets.u64'),
+                dtype=np.uint64, mode='r', shape=(self.count,)
+            )
+            with open(os.path.join(directory, 'chunks.jsonl'), 'rb') as f:
+                self.chunks = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.embeddings = np.zeros((0, self.dimension), dtype=np.float32)
+
+    def chunk(self, row):
+        start = int(self.offsets[row])
+        end = int(self.offsets[row + 1]) if row + 1 < self.count else len(self.chunks)
+        return json.loads(self.chunks[start:end])
+
+    def search(self, query_vector, top_k=5):
+        """Return [(row, score)] for the top_k rows by cosine similarity, best first."""
+        if not self.count or top_k < 1:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        scores = self.embeddings @ query
+        top_k = min(top_k, self.count)
+        # argpartition is O(N); only the k winners get sorted
+        candidates = np.argpartition(scores, -top_k)[-top_k:]
+        best = candidates[np.argsort(scores[candidates])[::-1]]
+        return [(int(row), float(scores[row])) for row in best]
+
+
+def download_index(uri, directory=None, s3_client=None):
+    """
+    Copy the current generation of the index published under uri into
+    directory/<generation> (default DOWNLOAD_DIR), unless it is already there,
+    and return its path.
+    """
+    directory = directory or DOWNLOAD_DIR
+    bucket, _, prefix = uri[len('s3://'):].partition('/')
+    client = s3_client or get_client('s3')
+    try:
+        current = json.loads(client.get_object(Bucket=bucket, Key=f"{prefix.rstrip('/')}/current.json")['Body'].read())
+    except client.exceptions.NoSuchKey:
+        raise FileNotFoundError(f"No knowledge-base index has been published under {uri}")
+    name = f"g{current['generation']:05d}"
+    target = os.path.join(directory, name)
+    if not os.path.exists(os.path.join(target, 'index.json')):
+        os.makedirs(target, exist_ok=True)
+        # Generations left by an earlier, failed attempt only take up space
+        for other in os.listdir(directory):
+            if other != name:
+                shutil.rmtree(os.path.join(directory, other), ignore_errors=True)
+        size = current.get('bytes')
+        if size is None:
+            size = sum(client.head_object(Bucket=bucket, Key=f"{current['path']}/{file}")['ContentLength']
+                       for file in INDEX_FILES)
+        free = shutil.disk_usage(target).free
+        if size > free:
+            raise OSError(errno.ENOSPC, (
+                f"Knowledge-base index generation {current['generation']} needs {size / 2 ** 20:.1f} MiB "
+                f"but {directory} has {free / 2 ** 20:.1f} MiB free; raise the function's ephemeral storage "
+                "(knowledgeBase.ephemeralStorageMb in cdk.json)"
+            ))
+        for file in INDEX_FILES:
+            client.download_file(bucket, f"{current['path']}/{file}", os.path.join(target, file))
+    return target
+
+
+def index_dir():
+    uri = os.environ.get('KNOWLEDGE_BASE_INDEX_URI')
+    if uri:
+        return download_index(uri)
+    return os.environ.get('KNOWLEDGE_BASE_INDEX_DIR', DEFAULT_INDEX_DIR)
+
+
+def get_index():
+    """Load the index on first use and keep it for the container's lifetime."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = VectorIndex(index_dir())
+    return _index
+
+
+def embed_query(text, model_id, dimension, bedrock_client=None):
+    """Embed the query with the index's model, caching by normalized text."""
+    key = (model_id, dimension, normalize_prompt(text))
+    embedding = _embedding_cache.get(key)
+    if embedding is None:
+        client = bedrock_client or get_client('bedrock-runtime')
+        response = client.invoke_model(
+            modelId=model_id,
+            contentType='application/json',
+            accept='application/json',
+            body=json.dumps({'inputText': text, 'dimensions': dimension, 'normalize': True})
+        )
+        embedding = np.asarray(json.loads(response['body'].read())['embedding'], dtype=np.float32)
+        _embedding_cache.put(key, embedding)
+    return embedding
+
+
+def search(query, top_k=5, bedrock_client=None):
+    """Embed query and return the top_k matching chunks with their scores."""
+    index = get_index()
+    model_id = index.model or os.environ.get('KNOWLEDGE_BASE_EMBEDDING_MODEL', 'amazon.titan-embed-text-v2:0')
+    query_vector = embed_query(query, model_id, index.dimension, bedrock_client)
+    return [
+        dict(index.chunk(row), score=round(score, 6))
+        for row, score in index.search(query_vector, top_k)
+    ]
+
+
+def max_top_k():
+    return int(os.environ.get('KNOWLEDGE_BASE_MAX_TOP_K', '50'))
+
+
+def handle(event):
+    """
+    Answer a knowledge lookup from the bundled vector index.
+    Expects 'query' and an optional 'top_k' (default 5), capped at
+    KNOWLEDGE_BASE_MAX_TOP_K.
+    """
+    query = event.get('query')
+    if not query:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({
+                'error': 'query is required'
+            })
+        }
+
+    top_k = event.get('top_k', 5)
+    try:
+        if isinstance(top_k, bool) or int(top_k) != float(top_k):
+            raise ValueError(top_k)
+        top_k = int(top_k)
+    except (TypeError, ValueError):
+        top_k = 0
+    if top_k < 1:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({
+                'error': 'top_k must be a positive integer'
+            })
+        }
+
+    results = search(query, min(top_k, max_top_k()))
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'results': results
+        })
+    }
+
+
+def warmup():
+    """Fetch and map the index and the embedding client ahead of the first query."""
+    local_dir = os.environ.get('KNOWLEDGE_BASE_INDEX_DIR', DEFAULT_INDEX_DIR)
+    if os.environ.get('KNOWLEDGE_BASE_INDEX_URI') or os.path.exists(os.path.join(local_dir, 'index.json')):
+        index = get_index()
+        if index.count:
+            # Fault in the pages the first scan will touch
+            float(index.embeddings[:min(index.count, 1024)].sum())
+    get_client('bedrock-runtime')
+
+
+def write_index(directory, embeddings, chunks, model=None):
+    """
+    Write an index directory from an (N, D) array and N chunk dicts.
+    Rows are normalized here so search can use a plain dot product.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    os.makedirs(directory, exist_ok=True)
+    (embeddings / norms).astype(np.float32).tofile(os.path.join(directory, 'embeddings.f32'))
+
+    offsets = []
+    with open(os.path.join(directory, 'chunks.jsonl'), 'wb') as f:
+        for chunk in chunks:
+            offsets.append(f.tell())
+            f.write(json.dumps(chunk, separators=(',', ':')).encode('utf-8') + b'\n')
+    np.asarray(offsets, dtype=np.uint64).tofile(os.path.join(directory, 'offsets.u64'))
+
+    with open(os.path.join(directory, 'index.json'), 'w', encoding='utf-8') as f:
+        json.dump({'dimension': int(embeddings.shape[1]), 'count': len(offsets), 'model': model}, f)
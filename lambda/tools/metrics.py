@@ -0,0 +1,140 @@
+"""
+Per-request metrics written as CloudWatch embedded metric format (EMF) log lines.
+
+Each record is one JSON line on stdout. CloudWatch Logs extracts the metrics
+asynchronously, so emitting costs a json.dumps and a write with no API call on
+the request path. Set METRICS_ENABLED=false to turn emission off.
+"""
+import json
+import os
+import sys
+import time
+
+UNITS = {
+    'AgentLatency': 'Milliseconds',
+    'TimeToFirstChunk': 'Milliseconds',
+    'ChunkCount': 'Count',
+    'ResponseBytes': 'Bytes',
+    'CacheHit': 'Count',
+    'Errors': 'Count',
+    'Throttles': 'Count',
+    'LoadShed': 'Count',
+    'Hedged': 'Count',
+    'HedgeWin': 'Count',
+    'SessionCompaction': 'Count',
+    'CompactionSaving': 'Milliseconds',
+    'Spilled': 'Count',
+    'FastPathLatency': 'Milliseconds',
+    'FastPathModelLatency': 'Milliseconds',
+    'ColdStart': 'Count'
+}
+
+# Error codes Bedrock and API Gateway use when a request is rate limited
+THROTTLE_CODES = {'throttlingexception', 'throttling', 'toomanyrequestsexception', 'servicequotaexceededexception'}
+
+_cold_start = True
+
+
+def namespace():
+    return os.environ.get('METRICS_NAMESPACE', 'AiAgent')
+
+
+def service():
+    return os.environ.get('POWERTOOLS_SERVICE_NAME', 'bedrock-api')
+
+
+def enabled():
+    return os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+
+
+def take_cold_start():
+    """1 for the first record of this container, 0 afterwards."""
+    global _cold_start
+    cold, _cold_start = _cold_start, False
+    return 1 if cold else 0
+
+
+def is_throttle(error):
+    code = getattr(error, 'response', {}).get('Error', {}).get('Code', '')
+    return code.lower() in THROTTLE_CODES
+
+
+def emit(values, properties=None, stream=None):
+    """
+    Write one EMF record for values ({metric name: number}) under the Service
+    dimension. properties are logged alongside but are not metrics.
+    """
+    if not enabled():
+        return
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': namespace(),
+                'Dimensions': [['Service']],
+                'Metrics': [{'Name': name, 'Unit': UNITS.get(name, 'None')} for name in values]
+            }]
+        },
+        'Service': service(),
+        **(properties or {}),
+        **values
+    }
+    (stream or sys.stdout).write(json.dumps(record, separators=(',', ':')) + '\n')
+
+
+def record_invocation(timer, cached, mode='buffered', stream=None, route=None, hedge=None, session=None,
+                      spilled=None):
+    """
+    Emit one record for a completed agent call or cache hit, tagged with the
+    alias route. hedge is the hedging outcome for calls that were eligible;
+    session is the turn info of managed sessions (see sessions.py); spilled
+    is whether the answer went to S3, when large-response mode is on.
+    """
+    values = {
+        'CacheHit': 1 if cached else 0,
+        'ColdStart': take_cold_start()
+    }
+    # Cache hits would drag the latency percentiles towards zero
+    if not cached:
+        timings = timer.as_dict()
+        values.update({
+            'AgentLatency': timings['latencyMs'],
+            'TimeToFirstChunk': timings['timeToFirstByteMs'],
+            'ChunkCount': timer.chunks,
+            'ResponseBytes': timer.response_bytes
+        })
+    if hedge:
+        values['Hedged'] = 1 if hedge['hedged'] else 0
+        values['HedgeWin'] = 1 if hedge['won'] else 0
+    if session:
+        values['SessionCompaction'] = 1 if session['compacted'] else 0
+        if session['latencySavingMs'] is not None:
+            values['CompactionSaving'] = session['latencySavingMs']
+    if spilled is not None:
+        values['Spilled'] = 1 if spilled else 0
+    emit(values, {'mode': mode, 'route': route} if route else {'mode': mode}, stream)
+
+
+def record_fast_path(tool, status_code, timings=None, stream=None):
+    """Emit one record for a direct-tool fast-path call (see fast_path.py), tagged with the tool."""
+    values = {'ColdStart': take_cold_start()}
+    if timings:
+        values['FastPathLatency'] = timings['latencyMs']
+        if 'modelMs' in timings:
+            values['FastPathModelLatency'] = timings['modelMs']
+    emit(values, {'mode': 'fast', 'tool': tool, 'statusCode': status_code}, stream)
+
+
+def record_error(error, mode='buffered', stream=None):
+    """
+    Emit one record for a failed agent call, flagging throttles and requests
+    shed by admission control (errors carrying retry_after) separately.
+    """
+    shed = getattr(error, 'retry_after', None) is not None
+    throttled = is_throttle(error) or is_throttle(error.__cause__)
+    emit({
+        'Errors': 1,
+        'Throttles': 1 if throttled else 0,
+        'LoadShed': 1 if shed else 0,
+        'ColdStart': take_cold_start()
+    }, {'mode': mode, 'errorType': type(error).__name__}, stream)
@@ -0,0 +1,127 @@
+"""
+OpenAPI schema for the Q Business plugin, generated from the registered tools.
+
+Every tool in tools.TOOLS whose module defines OPERATION gets a
+POST /tools/{name} fast-path operation, unless its enabled() hook is false
+in the environment the schema is generated in (external_api needs
+EXTERNAL_API_ALLOWED_HOSTS, as in the deployed function). Its request body is the tool's
+parameters plus an optional `question`, and the schema sits next to the
+handler instead of in a hand-written copy. /invoke stays in the schema as the
+chat operation for everything else. Print the payload for the plugin's
+ApiSchema with:
+
+    python lambda/tools/plugin_schema.py --server-url https://<api-id>.execute-api.<region>.amazonaws.com/prod
+"""
+import argparse
+import json
+
+import tools
+
+CHAT_DESCRIPTION = ('Answers free-form electronics manufacturing questions through the Bedrock agent, which '
+                    'plans, calls its tools and writes the answer. Use a /tools operation instead when the '
+                    'request is a direct lookup one of them covers.')
+
+
+def tool_operation(name, operation):
+    properties = dict(operation.get('parameters', {}))
+    properties['question'] = {
+        'type': 'string',
+        'description': "The user's question. When given, the result is also summarized into a short answer."
+    }
+    return {
+        'post': {
+            'tags': ['tools'],
+            'summary': operation['summary'],
+            'description': operation['description'],
+            'operationId': name,
+            'requestBody': {
+                'required': True,
+                'content': {'application/json': {'schema': {
+                    'type': 'object',
+                    'properties': properties,
+                    'required': list(operation.get('required', []))
+                }}}
+            },
+            'responses': {
+                '200': {
+                    'description': 'Tool result',
+                    'content': {'application/json': {'schema': {'$ref': '#/components/schemas/ToolResponse'}}}
+                },
+                '400': {'description': 'Invalid parameters'}
+            }
+        }
+    }
+
+
+def build_schema(server_url, names=None):
+    """The plugin's OpenAPI 3 document for the API at server_url, covering names (default: all tools)."""
+    paths = {
+        '/invoke': {
+            'post': {
+                'tags': ['chat'],
+                'summary': 'Chat',
+                'description': CHAT_DESCRIPTION,
+                'operationId': 'chat',
+                'requestBody': {
+                    'required': True,
+                    'content': {'application/json': {'schema': {'$ref': '#/components/schemas/ChatRequest'}}}
+                },
+                'responses': {
+                    '200': {
+                        'description': 'Agent answer',
+                        'content': {'application/json': {'schema': {'$ref': '#/components/schemas/ChatResponse'}}}
+                    }
+                }
+            }
+        }
+    }
+    for name in names or tools.TOOLS:
+        operation = tools.describe_tool(name)
+        if operation:
+            paths[f'/tools/{name}'] = tool_operation(name, operation)
+
+    return {
+        'openapi': '3.0.0',
+        'info': {'title': 'AI agent API', 'version': '1.0.0'},
+        'servers': [{'url': server_url.rstrip('/')}],
+        'paths': paths,
+        'components': {'schemas': {
+            'ChatRequest': {
+                'type': 'object',
+                'properties': {
+                    'prompt': {'type': 'string'},
+                    'sessionId': {'type': 'string'}
+                },
+                'required': ['prompt']
+            },
+            'ChatResponse': {
+                'type': 'object',
+                'properties': {
+                    'response': {'type': 'string'},
+                    'sessionId': {'type': 'string'}
+                },
+                'required': ['response']
+            },
+            'ToolResponse': {
+                'type': 'object',
+                'properties': {
+                    'tool': {'type': 'string'},
+                    'result': {'type': 'object'},
+                    'answer': {'type': 'string', 'description': 'Present when a question was given'}
+                },
+                'required': ['tool', 'result']
+            }
+        }}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--server-url', required=True, help='Base URL of the deployed API stage')
+    parser.add_argument('--tools', nargs='+', help='Tools to include (default: every registered tool)')
+    args = parser.parse_args()
+    print(json.dumps(build_schema(args.server_url, args.tools), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""
+Routes each prompt to one alias in a pool of agent aliases.
+
+The pool comes from AGENT_POOL, a JSON list such as
+    [{"name": "fast", "agentId": "...", "aliasId": "...", "tier": "fast"},
+     {"name": "deep", "agentId": "...", "aliasId": "...", "tier": "deep"}]
+and defaults to the single BEDROCK_AGENT_ID/BEDROCK_AGENT_ALIAS_ID alias.
+
+A keyword and length classifier sends short factual lookups to the fast tier
+and process or troubleshooting questions to the deep tier. Within a tier,
+aliases are ordered by their observed time to first chunk, penalized by their
+recent error rate, and the remaining aliases follow as fallbacks.
+"""
+import json
+import os
+import re
+import threading
+import time
+
+TIERS = ('fast', 'deep')
+
+# Questions that need reasoning over a process rather than a lookup
+DEEP_PATTERN = re.compile(
+    r'\b(why|explain|compare|design|troubleshoot|diagnose|root cause|trade-?offs?|optimi[sz]e|'
+    r'step[- ]by[- ]step|walk me through|how (do|does|should|can|would) (i|we|you|it)|'
+    r'what happens|process|procedure|best practices?|failure mode|defects?)\b'
+)
+# Definitions, limits and other one-line answers
+FAST_PATTERN = re.compile(
+    r'^(what (is|are|does)|define|list|which|who|when|where|how (many|much)|is|are|does)\b|'
+    r'\b(definition|stand for|acronym|limit|maximum|minimum|value of)\b'
+)
+LONG_PROMPT_WORDS = 40
+SHORT_PROMPT_WORDS = 15
+
+
+def classify(prompt):
+    """Return 'fast' or 'deep' for prompt. Costs a few microseconds and no network."""
+    text = ' '.join(prompt.split()).casefold()
+    words = len(text.split())
+    score = 0
+    if words > LONG_PROMPT_WORDS:
+        score += 2
+    elif words <= SHORT_PROMPT_WORDS:
+        score -= 1
+    if DEEP_PATTERN.search(text):
+        score += 2
+    if FAST_PATTERN.search(text):
+        score -= 1
+    # Several questions or sentences in one prompt usually need the large model
+    if text.count('?') > 1 or len(re.findall(r'[.!?](\s|$)', text)) > 2:
+        score += 1
+    return 'deep' if score > 0 else 'fast'
+
+
+class AgentTarget:
+    """One alias in the pool."""
+
+    def __init__(self, name, agent_id, alias_id, tier='deep'):
+        self.name = name
+        self.agent_id = agent_id
+        self.alias_id = alias_id
+        self.tier = tier if tier in TIERS else 'deep'
+
+    @property
+    def key(self):
+        return f'{self.agent_id}/{self.alias_id}'
+
+
+class AliasStats:
+    """
+    Exponentially weighted time to first chunk and error rate for one alias.
+    After failure_threshold consecutive failures the alias cools down and is
+    only tried once the others have failed.
+    """
+
+    def __init__(self, alpha=0.2, failure_threshold=3, cooldown_seconds=30, clock=time.monotonic):
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.clock = clock
+        self.latency_ms = None
+        self.error_rate = 0.0
+        self.failures = 0
+        self.requests = 0
+        self.cooling_until = 0
+        self._lock = threading.Lock()
+
+    def record_success(self, latency_ms):
+        with self._lock:
+            self.requests += 1
+            self.failures = 0
+            self.error_rate *= 1 - self.alpha
+            if self.latency_ms is None:
+                self.latency_ms = latency_ms
+            else:
+                self.latency_ms += self.alpha * (latency_ms - self.latency_ms)
+
+    def record_failure(self):
+        with self._lock:
+            self.requests += 1
+            self.failures += 1
+            self.error_rate += self.alpha * (1 - self.error_rate)
+            if self.failures >= self.failure_threshold:
+                self.cooling_until = self.clock() + self.cooldown_seconds
+
+    def available(self):
+        return self.clock() >= self.cooling_until
+
+    def score(self):
+        """Expected time to first chunk; aliases with no samples yet score 0 so they get tried."""
+        if self.latency_ms is None:
+            return 0
+        return self.latency_ms * (1 + 4 * self.error_rate)
+
+    def as_dict(self):
+        return {
+            'latencyMs': None if self.latency_ms is None else round(self.latency_ms, 2),
+            'errorRate': round(self.error_rate, 4),
+            'requests': self.requests,
+            'available': self.available()
+        }
+
+
+class Router:
+    def __init__(self, pool, default=None, **stats_options):
+        self.pool = pool
+        self.by_name = {target.name: target for target in pool}
+        self.default = default or pool[0]
+        self.stats = {target.name: AliasStats(**stats_options) for target in pool}
+
+    def route(self, body):
+        """
+        Aliases to try for this request, best first. A request with a sessionId
+        stays on the alias that owns the session (its `route`, else the default)
+        because agent sessions do not carry over between aliases.
+        """
+        pinned = self.by_name.get(body.get('route'))
+        if body.get('sessionId'):
+            return [pinned or self.default]
+
+        tier = body.get('tier') if body.get('tier') in TIERS else classify(body['prompt'])
+        ranked = sorted(
+            self.pool,
+            key=lambda target: (
+                not self.stats[target.name].available(),
+                target.tier != tier,
+                self.stats[target.name].score()
+            )
+        )
+        if pinned:
+            ranked.remove(pinned)
+            ranked.insert(0, pinned)
+        return ranked
+
+    def cache_scope(self, body):
+        """
+        What a cached answer to body depends on, known before routing: the
+        alias a pinned or session request goes to, else the tier it is routed
+        to, so answers from the fast and deep tiers are never served for each other.
+        """
+        pinned = self.by_name.get(body.get('route'))
+        if pinned or body.get('sessionId'):
+            return (pinned or self.default).key
+        tiers = {target.tier for target in self.pool}
+        if len(tiers) == 1:
+            return tiers.pop()
+        return body.get('tier') if body.get('tier') in TIERS else classify(body['prompt'])
+
+    def replica(self, target):
+        """Best other available alias in target's tier to hedge against, else target itself."""
+        peers = [
+            peer for peer in self.pool
+            if peer is not target and peer.tier == target.tier and self.stats[peer.name].available()
+        ]
+        return min(peers, key=lambda peer: self.stats[peer.name].score()) if peers else target
+
+    def record_success(self, target, latency_ms):
+        self.stats[target.name].record_success(latency_ms)
+
+    def record_failure(self, target):
+        self.stats[target.name].record_failure()
+
+    def snapshot(self):
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+
+def load_pool():
+    """Parse AGENT_POOL, falling back to the single configured alias."""
+    entries = json.loads(os.environ.get('AGENT_POOL') or '[]')
+    pool = [
+        AgentTarget(entry.get('name') or entry['aliasId'], entry['agentId'], entry['aliasId'], entry.get('tier', 'deep'))
+        for entry in entries
+    ]
+    default_agent = os.environ.get('BEDROCK_AGENT_ID')
+    default_alias = os.environ.get('BEDROCK_AGENT_ALIAS_ID')
+    default = next((t for t in pool if (t.agent_id, t.alias_id) == (default_agent, default_alias)), None)
+    if default is None and default_agent and default_alias:
+        default = AgentTarget('default', default_agent, default_alias, 'deep')
+        pool.insert(0, default)
+    return pool, default
+
+
+def from_environment():
+    """Build the router from AGENT_POOL, or None when no alias is configured."""
+    pool, default = load_pool()
+    if not pool:
+        return None
+    return Router(
+        pool,
+        default,
+        failure_threshold=int(os.environ.get('ROUTING_FAILURE_THRESHOLD', '3')),
+        cooldown_seconds=float(os.environ.get('ROUTING_COOLDOWN_SECONDS', '30'))
+    )
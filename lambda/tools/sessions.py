@@ -0,0 +1,353 @@
+"""
+Conversation-history compaction for long agent sessions.
+
+Bedrock replays a session's history to the model on every turn, so each
+turn of a long engineering session is slower and costlier than the last.
+SessionManager tracks the turns and approximate tokens of each client
+session. Once either passes its threshold, the next turn starts a fresh
+agent session whose first prompt is seeded with a summary of the
+conversation so far. The client keeps using the same sessionId throughout.
+
+The time to first chunk grows roughly linearly with the turns a session has
+replayed. At each compaction the growth per turn is fitted from the last
+turns before it, and every later turn is compared with the latency that line
+projects for the same turn of the uncompacted conversation, so the saving
+per turn is measured against what the turn would have cost rather than
+against the turns just before the compaction.
+"""
+import json
+import os
+import threading
+import time
+
+SEED_TEMPLATE = (
+    'Summary of our conversation so far, carried over from an earlier session:\n'
+    '{summary}\n\n'
+    'Continue the conversation from there. {prompt}'
+)
+
+SUMMARY_PROMPT = (
+    'Summarize our conversation so far in at most {words} words for a colleague taking over. '
+    'Keep the facts, numbers, decisions and open questions; leave out pleasantries.'
+)
+
+# Per-turn text kept for compaction; the agent session holds the full text
+MAX_PROMPT_CHARS = 1000
+MAX_RESPONSE_CHARS = 2000
+MAX_HISTORY_TURNS = 50
+
+
+def estimate_tokens(text):
+    """Rough token count, about four characters per token for English text."""
+    return (len(text) + 3) // 4
+
+
+def new_session(session_id, ttl_seconds=1800):
+    now = time.time()
+    return {
+        'sessionId': session_id,
+        'agentSessionId': session_id,
+        'generation': 0,
+        'turns': 0,
+        'tokens': 0,
+        'totalTurns': 0,
+        'compactions': 0,
+        'history': [],
+        'seed': None,
+        'recentMs': [],
+        'projection': None,
+        'savingsMs': [],
+        'updatedAt': now,
+        'expiresAt': int(now + ttl_seconds)
+    }
+
+
+def compact_history(state, keep_turns=2, max_tokens=1000):
+    """
+    Summary of a session without a model call: the previous summary, one line
+    per older turn, and the last keep_turns turns in full. Oldest lines are
+    dropped first until the summary fits in max_tokens.
+    """
+    history = state['history']
+    split = max(len(history) - keep_turns, 0)
+    lines = [state['seed']] if state.get('seed') else []
+    for turn in history[:split]:
+        lines.append(f"- Asked: {first_sentence(turn['prompt'], 200)} Answered: {first_sentence(turn['response'], 300)}")
+    for turn in history[split:]:
+        lines.append(f"User: {turn['prompt']}\nAssistant: {turn['response']}")
+
+    while len(lines) > 1 and estimate_tokens('\n'.join(lines)) > max_tokens:
+        lines.pop(0)
+    summary = '\n'.join(lines)
+    return summary[-max_tokens * 4:]
+
+
+def first_sentence(text, limit):
+    text = ' '.join(text.split())
+    end = text.find('. ')
+    if 0 < end < limit:
+        return text[:end + 1]
+    return text[:limit] + ('...' if len(text) > limit else '')
+
+
+def mean(values):
+    return sum(values) / len(values) if values else None
+
+
+def fit_line(values):
+    """Least-squares (slope, value at the last point) of values over consecutive turns."""
+    count = len(values)
+    if count < 2:
+        return 0.0, values[-1]
+    middle = (count - 1) / 2
+    average = mean(values)
+    slope = (sum((x - middle) * (y - average) for x, y in enumerate(values))
+             / sum((x - middle) ** 2 for x in range(count)))
+    return slope, average + slope * (count - 1 - middle)
+
+
+def projected_ms(state):
+    """Time to first chunk projected for the current turn had the session never been compacted."""
+    projection = state.get('projection')
+    if not projection:
+        return None
+    return projection['ms'] + projection['slopeMs'] * (state['totalTurns'] - projection['turn'])
+
+
+class MemorySessionStore:
+    """Session state held in this container only; expired entries are dropped on read."""
+
+    def __init__(self):
+        self.sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            state = self.sessions.get(session_id)
+            if state is None or state['expiresAt'] <= time.time():
+                self.sessions.pop(session_id, None)
+                return None
+            return json.loads(json.dumps(state))
+
+    def put(self, state):
+        with self._lock:
+            self.sessions[state['sessionId']] = json.loads(json.dumps(state))
+
+
+class DynamoDBSessionStore:
+    """
+    Session state in a DynamoDB table with partition key `sessionId` and TTL
+    attribute `expiresAt`, kept as a JSON document. Pass a client to point it
+    at DynamoDB Local or moto.
+    """
+
+    def __init__(self, table_name, client=None):
+        self.table_name = table_name
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from clients import get_client
+            self._client = get_client('dynamodb')
+        return self._client
+
+    def get(self, session_id):
+        item = self.client.get_item(
+            TableName=self.table_name,
+            Key={'sessionId': {'S': session_id}},
+            ConsistentRead=True
+        ).get('Item')
+        if item is None or int(item['expiresAt']['N']) <= time.time():
+            return None
+        return json.loads(item['document']['S'])
+
+    def put(self, state):
+        self.client.put_item(
+            TableName=self.table_name,
+            Item={
+                'sessionId': {'S': state['sessionId']},
+                'expiresAt': {'N': str(state['expiresAt'])},
+                'document': {'S': json.dumps(state)}
+            }
+        )
+
+
+class Turn:
+    """One turn of a managed session: the request to send to the agent and the state it updates."""
+
+    def __init__(self, state, body, prompt, compacted):
+        self.state = state
+        self.body = body
+        self.prompt = prompt
+        self.compacted = compacted
+
+
+class SessionManager:
+    """
+    Tracks client sessions and compacts them once they pass max_turns or
+    max_tokens (0 disables a threshold). Concurrent turns of one session are
+    not serialized; the last one to finish wins, as with the agent session.
+    Store errors are counted and the turn goes through unmanaged (fail open).
+    """
+
+    def __init__(self, store=None, max_turns=0, max_tokens=0, keep_turns=2, summary_tokens=1000,
+                 summary_mode='compact', ttl_seconds=1800, window=5):
+        self.store = store or MemorySessionStore()
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.keep_turns = keep_turns
+        self.summary_tokens = summary_tokens
+        self.summary_mode = summary_mode
+        self.ttl_seconds = ttl_seconds
+        self.window = window
+        self.counters = {'turns': 0, 'compactions': 0, 'summaryFallbacks': 0, 'errors': 0}
+        self.savings = []
+        self._lock = threading.Lock()
+
+    def due(self, state):
+        """True when the session's next turn should start a compacted agent session."""
+        if not state['turns']:
+            return False
+        return bool(
+            (self.max_turns and state['turns'] >= self.max_turns)
+            or (self.max_tokens and state['tokens'] >= self.max_tokens)
+        )
+
+    def summary_prompt(self):
+        return SUMMARY_PROMPT.format(words=self.summary_tokens * 3 // 4)
+
+    def begin(self, body, summarize=None):
+        """
+        Start a turn for body. Returns None for requests without a sessionId,
+        else a Turn whose body carries the agent session id and, on the first
+        turn after a compaction, the summary-seeded prompt. summarize(state)
+        may produce the summary (e.g. by asking the agent); compact_history is
+        used when it is not given or fails.
+        """
+        session_id = body.get('sessionId')
+        if not session_id:
+            return None
+        try:
+            state = self.store.get(session_id)
+        except Exception as e:
+            print(f"Session store read failed: {e}")
+            self._count('errors')
+            return None
+        state = state or new_session(session_id, self.ttl_seconds)
+
+        compacted = self.due(state)
+        if compacted:
+            self._compact(state, summarize)
+
+        prompt = body['prompt']
+        if state['seed'] and not state['turns']:
+            prompt = SEED_TEMPLATE.format(summary=state['seed'], prompt=prompt)
+        return Turn(state, {**body, 'sessionId': state['agentSessionId'], 'prompt': prompt}, body['prompt'], compacted)
+
+    def finish(self, turn, response, time_to_first_chunk_ms, response_chars=None):
+        """
+        Record a completed turn and return the session info for the response.
+        response_chars counts the full answer when response is only its start.
+        """
+        state = turn.state
+        state['turns'] += 1
+        state['totalTurns'] += 1
+        answer_tokens = estimate_tokens(response) if response_chars is None else (response_chars + 3) // 4
+        state['tokens'] += estimate_tokens(turn.body['prompt']) + answer_tokens
+        state['history'] = (state['history'] + [{
+            'prompt': turn.prompt[:MAX_PROMPT_CHARS],
+            'response': response[:MAX_RESPONSE_CHARS]
+        }])[-MAX_HISTORY_TURNS:]
+        state['recentMs'] = (state['recentMs'] + [time_to_first_chunk_ms])[-self.window:]
+
+        saving = None
+        projected = projected_ms(state)
+        if projected is not None:
+            saving = round(projected - time_to_first_chunk_ms, 2)
+            state['savingsMs'] = (state.get('savingsMs', []) + [saving])[-self.window:]
+            with self._lock:
+                self.savings = (self.savings + [saving])[-1000:]
+        self._count('turns')
+
+        state['updatedAt'] = time.time()
+        state['expiresAt'] = int(state['updatedAt'] + self.ttl_seconds)
+        try:
+            self.store.put(state)
+        except Exception as e:
+            print(f"Session store write failed: {e}")
+            self._count('errors')
+
+        average = mean(state.get('savingsMs', [])) if saving is not None else None
+        return {
+            'turn': state['totalTurns'],
+            'approxTokens': state['tokens'],
+            'compacted': turn.compacted,
+            'compactions': state['compactions'],
+            'latencySavingMs': saving,
+            'averageLatencySavingMs': round(average, 2) if average is not None else None
+        }
+
+    def stats(self):
+        with self._lock:
+            savings = list(self.savings)
+            counters = dict(self.counters)
+        counters['averageLatencySavingMs'] = round(mean(savings), 2) if savings else None
+        return counters
+
+    def _compact(self, state, summarize):
+        summary = None
+        if summarize is not None:
+            try:
+                summary = summarize(state)
+            except Exception as e:
+                print(f"Session summary failed, compacting locally: {e}")
+                self._count('summaryFallbacks')
+        if not summary:
+            summary = compact_history(state, self.keep_turns, self.summary_tokens)
+
+        # Each agent session grows at the uncompacted rate, so refit the slope from the one that just
+        # ended and continue the projection from where the previous line put this turn
+        if state['recentMs']:
+            slope, last_ms = fit_line(state['recentMs'])
+            projected = projected_ms(state)
+            state['projection'] = {
+                'turn': state['totalTurns'],
+                'ms': last_ms if projected is None else projected,
+                'slopeMs': max(slope, 0.0)
+            }
+        state['recentMs'] = []
+        state['savingsMs'] = []
+        state['generation'] += 1
+        state['compactions'] += 1
+        state['agentSessionId'] = f"{state['sessionId'][:90]}-c{state['generation']}"
+        state['seed'] = summary
+        state['turns'] = 0
+        state['tokens'] = estimate_tokens(summary)
+        state['history'] = []
+        self._count('compactions')
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+
+def from_environment():
+    """
+    Build the session manager from function environment variables, or None
+    when neither SESSION_MAX_TURNS nor SESSION_MAX_TOKENS is set.
+    """
+    max_turns = int(os.environ.get('SESSION_MAX_TURNS', '0'))
+    max_tokens = int(os.environ.get('SESSION_MAX_TOKENS', '0'))
+    if not max_turns and not max_tokens:
+        return None
+    table_name = os.environ.get('SESSIONS_TABLE')
+    return SessionManager(
+        store=DynamoDBSessionStore(table_name) if table_name else MemorySessionStore(),
+        max_turns=max_turns,
+        max_tokens=max_tokens,
+        keep_turns=int(os.environ.get('SESSION_KEEP_TURNS', '2')),
+        summary_tokens=int(os.environ.get('SESSION_SUMMARY_TOKENS', '1000')),
+        summary_mode=os.environ.get('SESSION_SUMMARY_MODE', 'compact'),
+        ttl_seconds=int(os.environ.get('SESSION_TTL_SECONDS', '1800'))
+    )
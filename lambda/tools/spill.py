@@ -0,0 +1,174 @@
+"""
+Large-response mode: answers past a size threshold are written to S3 instead
+of being returned in the Lambda response.
+
+A SpillWriter keeps the decoded completion in memory until it passes
+threshold_bytes of UTF-8. From then on it streams it to S3 as a multipart
+upload, one part_bytes part at a time, so the function holds at most about
+one part however long the answer gets. The handler then returns a presigned
+GET URL and a preview of the first preview_chars characters in place of the
+text. Answers under the threshold never touch S3 and are returned inline as
+before.
+
+Set RESPONSE_SPILL_BUCKET to turn the mode on. The bucket should expire the
+prefix and abort incomplete multipart uploads, since failed requests abort
+their upload but a killed container cannot.
+"""
+import os
+import uuid
+
+# S3's minimum size for every part but the last
+MIN_PART_BYTES = 5 * 1024 * 1024
+CONTENT_TYPE = 'text/plain; charset=utf-8'
+
+
+class SpillWriter:
+    """Collects one answer, switching to a multipart upload once it is too large to return."""
+
+    def __init__(self, spill, key):
+        self.spill = spill
+        self.key = key
+        self.pending = []
+        self.buffer = bytearray()
+        self.preview = []
+        self.preview_chars = 0
+        self.size = 0
+        self.characters = 0
+        self.upload_id = None
+        self.parts = []
+
+    def add(self, text):
+        self.characters += len(text)
+        if self.preview_chars < self.spill.preview_chars:
+            piece = text[:self.spill.preview_chars - self.preview_chars]
+            self.preview.append(piece)
+            self.preview_chars += len(piece)
+        data = text.encode('utf-8')
+        self.size += len(data)
+        if self.upload_id is None:
+            self.pending.append(text)
+            if self.size <= self.spill.threshold_bytes:
+                return
+            self._start()
+            return
+        self.buffer += data
+        if len(self.buffer) >= self.spill.part_bytes:
+            self._upload_part()
+
+    def finish(self):
+        """
+        Returns (text, None) for answers under the threshold, otherwise
+        completes the upload and returns (None, spilled) where spilled holds
+        the presigned url, its expiry, the size and the preview.
+        """
+        if self.upload_id is None:
+            return ''.join(self.pending), None
+        if self.buffer or not self.parts:
+            self._upload_part()
+        client = self.spill.client
+        client.complete_multipart_upload(
+            Bucket=self.spill.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={'Parts': self.parts}
+        )
+        url = client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.spill.bucket, 'Key': self.key},
+            ExpiresIn=self.spill.url_ttl_seconds
+        )
+        return None, {
+            'url': url,
+            'expiresInSeconds': self.spill.url_ttl_seconds,
+            'bucket': self.spill.bucket,
+            'key': self.key,
+            'bytes': self.size,
+            'characters': self.characters,
+            'parts': len(self.parts),
+            'preview': ''.join(self.preview)
+        }
+
+    def abort(self):
+        """Drop a started upload so its parts are not billed; errors are only logged."""
+        if self.upload_id is None:
+            return
+        try:
+            self.spill.client.abort_multipart_upload(Bucket=self.spill.bucket, Key=self.key, UploadId=self.upload_id)
+        except Exception as e:
+            print(f"Aborting response upload {self.key} failed: {e}")
+        self.upload_id = None
+
+    def _start(self):
+        self.upload_id = self.spill.client.create_multipart_upload(
+            Bucket=self.spill.bucket,
+            Key=self.key,
+            ContentType=CONTENT_TYPE
+        )['UploadId']
+        self.buffer += ''.join(self.pending).encode('utf-8')
+        self.pending = []
+        while len(self.buffer) >= self.spill.part_bytes:
+            self._upload_part()
+
+    def _upload_part(self):
+        size = min(len(self.buffer), self.spill.part_bytes)
+        number = len(self.parts) + 1
+        # One copy of the part rather than a slice and then a copy of the slice
+        with memoryview(self.buffer) as view:
+            body = bytes(view[:size])
+        response = self.spill.client.upload_part(
+            Bucket=self.spill.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=number,
+            Body=body
+        )
+        del body
+        del self.buffer[:size]
+        self.parts.append({'PartNumber': number, 'ETag': response['ETag']})
+
+
+class ResponseSpill:
+    def __init__(self, bucket, prefix='responses/', threshold_bytes=1024 * 1024, part_bytes=MIN_PART_BYTES,
+                 preview_chars=2000, url_ttl_seconds=3600, client=None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.threshold_bytes = threshold_bytes
+        self.part_bytes = max(part_bytes, MIN_PART_BYTES)
+        self.preview_chars = preview_chars
+        self.url_ttl_seconds = url_ttl_seconds
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from clients import get_client
+            self._client = get_client('s3')
+        return self._client
+
+    def with_threshold(self, threshold_bytes):
+        """The same spill, switching to S3 at threshold_bytes if that is lower."""
+        return ResponseSpill(self.bucket, self.prefix, min(self.threshold_bytes, threshold_bytes), self.part_bytes,
+                             self.preview_chars, self.url_ttl_seconds, self._client)
+
+    def writer(self):
+        """A writer for one answer, under a fresh key."""
+        return SpillWriter(self, f"{self.prefix}{uuid.uuid4()}.txt")
+
+
+def from_environment():
+    """
+    Build the spill from RESPONSE_SPILL_* variables, or None when
+    RESPONSE_SPILL_BUCKET is not set.
+    """
+    bucket = os.environ.get('RESPONSE_SPILL_BUCKET')
+    if not bucket:
+        return None
+    return ResponseSpill(
+        bucket,
+        prefix=os.environ.get('RESPONSE_SPILL_PREFIX', 'responses/'),
+        # JSON escaping can grow the text several times over; stay well under the 6 MB payload limit
+        threshold_bytes=int(os.environ.get('RESPONSE_SPILL_THRESHOLD_BYTES', str(1024 * 1024))),
+        part_bytes=int(os.environ.get('RESPONSE_SPILL_PART_BYTES', str(MIN_PART_BYTES))),
+        preview_chars=int(os.environ.get('RESPONSE_SPILL_PREVIEW_CHARS', '2000')),
+        url_ttl_seconds=int(os.environ.get('RESPONSE_SPILL_URL_TTL_SECONDS', '3600'))
+    )
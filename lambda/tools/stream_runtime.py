@@ -0,0 +1,169 @@
+"""
+Minimal Lambda runtime loop that streams responses, for index.stream_handler.
+
+The Python managed runtime only calls handler(event, context) and buffers
+what it returns, so a streaming handler needs its own runtime client.
+stream_bootstrap, set as AWS_LAMBDA_EXEC_WRAPPER on the stream function,
+replaces the managed bootstrap with this loop. It fetches each invocation
+from the Runtime API and posts the response in streaming mode
+(Lambda-Runtime-Function-Response-Mode: streaming, chunked transfer
+encoding): an HTTP integration prelude for the function URL, then every
+write the handler makes as one chunk. The prelude is held back until the
+first write, so the handler can still choose the HTTP status and headers
+(set_status) when it fails before producing any output. An exception after
+the stream has started is reported in the error trailers, as the managed
+runtimes do.
+
+The handler is named by _HANDLER (module.function), as for any function.
+"""
+import base64
+import http.client
+import importlib
+import json
+import os
+import sys
+import time
+import traceback
+
+API_VERSION = '2018-06-01'
+# Tells the function URL that an HTTP prelude (status and headers) comes before the body
+HTTP_INTEGRATION_CONTENT_TYPE = 'application/vnd.awslambda.http-integration-response'
+PRELUDE_DELIMITER = b'\x00' * 8
+ERROR_TRAILERS = ('Lambda-Runtime-Function-Error-Type', 'Lambda-Runtime-Function-Error-Body')
+
+
+class Context:
+    """The parts of the Lambda context object the handlers use."""
+
+    def __init__(self, headers):
+        self.aws_request_id = headers['Lambda-Runtime-Aws-Request-Id']
+        self.invoked_function_arn = headers.get('Lambda-Runtime-Invoked-Function-Arn')
+        self.deadline_ms = int(headers.get('Lambda-Runtime-Deadline-Ms', '0'))
+        self.function_name = os.environ.get('AWS_LAMBDA_FUNCTION_NAME')
+        self.function_version = os.environ.get('AWS_LAMBDA_FUNCTION_VERSION')
+        self.memory_limit_in_mb = os.environ.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE')
+        self.log_group_name = os.environ.get('AWS_LAMBDA_LOG_GROUP_NAME')
+        self.log_stream_name = os.environ.get('AWS_LAMBDA_LOG_STREAM_NAME')
+
+    def get_remaining_time_in_millis(self):
+        return max(self.deadline_ms - int(time.time() * 1000), 0)
+
+
+class ResponseStream:
+    """
+    One streamed response: write(data) sends a chunk right away; close()
+    ends the body. fail(error) ends it with the error trailers instead.
+    Nothing is sent until the first write, so set_status can still change
+    the status code and headers up to then.
+    """
+
+    def __init__(self, connection, request_id, status_code=200, headers=None):
+        self.connection = connection
+        self.request_id = request_id
+        self.status_code = status_code
+        self.headers = headers or {'Content-Type': 'application/x-ndjson'}
+        self.started = False
+        self.closed = False
+
+    def set_status(self, status_code, headers=None):
+        """Set the HTTP status (and extra headers) if the prelude has not gone out yet. Returns whether it had not."""
+        if self.started:
+            return False
+        self.status_code = status_code
+        self.headers = dict(self.headers, **(headers or {}))
+        return True
+
+    def write(self, data):
+        if data:
+            self._start()
+            self._send_chunk(data)
+
+    def close(self):
+        self._end(b'')
+
+    def fail(self, error):
+        body = base64.b64encode(json.dumps(error_payload(error)).encode('utf-8')).decode('ascii')
+        self._end(f"{ERROR_TRAILERS[0]}: {type(error).__name__}\r\n{ERROR_TRAILERS[1]}: {body}\r\n".encode('ascii'))
+
+    def _start(self):
+        if self.started:
+            return
+        self.started = True
+        connection = self.connection
+        connection.putrequest('POST', f"/{API_VERSION}/runtime/invocation/{self.request_id}/response")
+        connection.putheader('Lambda-Runtime-Function-Response-Mode', 'streaming')
+        connection.putheader('Transfer-Encoding', 'chunked')
+        connection.putheader('Content-Type', HTTP_INTEGRATION_CONTENT_TYPE)
+        connection.putheader('Trailer', ', '.join(ERROR_TRAILERS))
+        connection.endheaders()
+        prelude = json.dumps({'statusCode': self.status_code, 'headers': self.headers}).encode('utf-8')
+        self._send_chunk(prelude + PRELUDE_DELIMITER)
+
+    def _send_chunk(self, data):
+        self.connection.send(b'%x\r\n%s\r\n' % (len(data), data))
+
+    def _end(self, trailers):
+        if self.closed:
+            return
+        self._start()
+        self.closed = True
+        self.connection.send(b'0\r\n' + trailers + b'\r\n')
+        self.connection.getresponse().read()
+
+
+def error_payload(error):
+    return {
+        'errorMessage': str(error),
+        'errorType': type(error).__name__,
+        'stackTrace': traceback.format_tb(error.__traceback__)
+    }
+
+
+def load_handler(name):
+    module_name, _, function_name = name.rpartition('.')
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def post_error(connection, path, error):
+    connection.request('POST', path, body=json.dumps(error_payload(error)),
+                       headers={'Lambda-Runtime-Function-Error-Type': type(error).__name__})
+    connection.getresponse().read()
+
+
+def serve(runtime_api, handler_name):
+    connection = http.client.HTTPConnection(runtime_api)
+    try:
+        handler = load_handler(handler_name)
+    except Exception as e:
+        post_error(connection, f"/{API_VERSION}/runtime/init/error", e)
+        raise
+
+    while True:
+        connection.request('GET', f"/{API_VERSION}/runtime/invocation/next")
+        response = connection.getresponse()
+        event = json.loads(response.read())
+        context = Context(response.headers)
+        if response.headers.get('Lambda-Runtime-Trace-Id'):
+            os.environ['_X_AMZN_TRACE_ID'] = response.headers['Lambda-Runtime-Trace-Id']
+
+        stream = ResponseStream(connection, context.aws_request_id)
+        try:
+            handler(event, stream, context)
+            stream.close()
+        except Exception as e:
+            print(f"Streaming handler failed: {e}")
+            stream.fail(e)
+
+
+def main():
+    # The managed bootstrap would have put the function code and layers on the path
+    task_root = os.environ.get('LAMBDA_TASK_ROOT', '/var/task')
+    version = f"python{sys.version_info.major}.{sys.version_info.minor}"
+    for path in reversed([task_root, f"/opt/python/lib/{version}/site-packages", '/opt/python']):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    serve(os.environ['AWS_LAMBDA_RUNTIME_API'], os.environ.get('_HANDLER', 'index.stream_handler'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+import importlib
+import json
+import os
+import threading
+import time
+
+# Registered tools: tool name -> module providing handle(event) and, optionally,
+# warmup(). Modules are imported, and create their clients, on first use only.
+TOOLS = {
+    'external_api': 'external_api',
+    'knowledge_base': 'knowledge_base'
+}
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def prewarm_tools():
+    """
+    Warm the tools listed in TOOLS_PREWARM (comma-separated) during the init
+    phase. Tools not listed stay lazy. Failures are left for the first call.
+    """
+    names = [n.strip() for n in os.environ.get('TOOLS_PREWARM', '').split(',') if n.strip()]
+    for name in names:
+        try:
+            warm_tools([name])
+        except Exception as e:
+            print(f"Tool prewarm failed for {name}: {e}")
+
+
+def handler(event, context):
+    """
+    Lambda function serving as a tool for the AI agent.
+    Accepts direct {'tool_type': ...} events, Bedrock agent action-group
+    events and {'warmup': true} events that pre-load the registered tools.
+    """
+    try:
+        if event.get('warmup'):
+            return {
+                'statusCode': 200,
+                'body': json.dumps({
+                    'warmed': warm_tools(event.get('tools'))
+                })
+            }
+
+        if 'actionGroup' in event:
+            return handle_action_group(event)
+
+        # Process the event based on the tool type
+        return dispatch(event)
+
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({
+                'error': str(e)
+            })
+        }
+
+
+def register_tool(name, module_name):
+    """Register a tool implemented by module_name's handle(event)."""
+    TOOLS[name] = module_name
+
+
+def load_tool(name):
+    """Import the tool's module the first time it is used."""
+    module = _loaded.get(name)
+    if module is None:
+        if name not in TOOLS:
+            raise ValueError(f"Unsupported tool type: {name}")
+        with _lock:
+            module = _loaded.get(name)
+            if module is None:
+                module = importlib.import_module(TOOLS[name])
+                _loaded[name] = module
+    return module
+
+
+def warm_tools(names=None):
+    """Load the given tools (default: all) and run their warm-up hooks. Returns ms per tool."""
+    timings = {}
+    for name in names or TOOLS:
+        start = time.perf_counter()
+        module = load_tool(name)
+        if hasattr(module, 'warmup'):
+            module.warmup()
+        timings[name] = round((time.perf_counter() - start) * 1000, 2)
+    return timings
+
+
+def describe_tool(name):
+    """
+    The tool's fast-path OPERATION (see plugin_schema.py), or None if it does
+    not publish one or its enabled() hook says it is not configured here.
+    """
+    module = load_tool(name)
+    if hasattr(module, 'enabled') and not module.enabled():
+        return None
+    return getattr(module, 'OPERATION', None)
+
+
+def dispatch(event):
+    return load_tool(event.get('tool_type')).handle(event)
+
+
+def handle_action_group(event):
+    """
+    Run a tool for a Bedrock agent action group and wrap the result in the
+    response shape the agent expects. The tool is named by the OpenAPI
+    apiPath (e.g. /knowledge_base) or, for function-details action groups,
+    by the function name.
+    """
+    tool_type = event.get('function') or event.get('apiPath', '').strip('/').replace('/', '_').replace('-', '_')
+    params = action_group_parameters(event)
+
+    try:
+        result = dispatch(dict(params, tool_type=tool_type))
+    except ValueError as e:
+        result = {
+            'statusCode': 400,
+            'body': json.dumps({
+                'error': str(e)
+            })
+        }
+
+    if 'function' in event:
+        function_response = {'responseBody': {'TEXT': {'body': result['body']}}}
+        if result['statusCode'] >= 400:
+            function_response['responseState'] = 'FAILURE'
+        response = {
+            'actionGroup': event['actionGroup'],
+            'function': event['function'],
+            'functionResponse': function_response
+        }
+    else:
+        response = {
+            'actionGroup': event['actionGroup'],
+            'apiPath': event.get('apiPath'),
+            'httpMethod': event.get('httpMethod'),
+            'httpStatusCode': result['statusCode'],
+            'responseBody': {'application/json': {'body': result['body']}}
+        }
+
+    return {
+        'messageVersion': event.get('messageVersion', '1.0'),
+        'response': response,
+        'sessionAttributes': event.get('sessionAttributes', {}),
+        'promptSessionAttributes': event.get('promptSessionAttributes', {})
+    }
+
+
+def action_group_parameters(event):
+    """Flatten action-group parameters and request body properties into typed values."""
+    properties = list(event.get('parameters') or [])
+    content = (event.get('requestBody') or {}).get('content', {})
+    for media in content.values():
+        properties.extend(media.get('properties', []))
+    return {p['name']: coerce(p.get('type'), p.get('value')) for p in properties}
+
+
+def coerce(type_name, value):
+    """Action-group values arrive as strings; convert them to their declared type."""
+    if value is None or not isinstance(value, str):
+        return value
+    try:
+        if type_name == 'integer':
+            return int(value)
+        if type_name == 'number':
+            return float(value)
+        if type_name == 'boolean':
+            return value.lower() == 'true'
+        if type_name in ('array', 'object'):
+            return json.loads(value)
+    except ValueError:
+        pass
+    return value
+
+
+prewarm_tools()
@@ -0,0 +1,187 @@
+"""
+Per-step timing spans built from Bedrock agent orchestration traces.
+
+With enableTrace the completion stream interleaves {'trace': ...} events with
+the answer chunks. AgentTrace consumes them one at a time as they arrive and
+pairs each input event with its output event (same traceId) into a span:
+
+    model           modelInvocationInput -> modelInvocationOutput
+    action_group    invocationInput      -> observation (ACTION_GROUP)
+    knowledge_base  invocationInput      -> observation (KNOWLEDGE_BASE)
+
+Spans follow the OpenTelemetry span data model (hex trace and span ids, unix
+nanosecond timestamps, attributes, status) and are logged as one JSON line
+per invocation. Time not covered by a step is reported as orchestration.
+"""
+import json
+import os
+import random
+import sys
+import time
+
+INVOCATION_TYPES = {
+    'ACTION_GROUP': 'action_group',
+    'KNOWLEDGE_BASE': 'knowledge_base',
+    'ACTION_GROUP_CODE_INTERPRETER': 'code_interpreter',
+    'AGENT_COLLABORATOR': 'agent_collaborator'
+}
+
+
+def sample_rate():
+    return float(os.environ.get('AGENT_TRACE_SAMPLE_RATE', '0'))
+
+
+def should_trace(body):
+    """
+    Trace when the request sets `"trace": true` (unless AGENT_TRACE_ALLOW_REQUEST
+    is false) or when it falls into the AGENT_TRACE_SAMPLE_RATE sample.
+    """
+    if body.get('trace') is True and os.environ.get('AGENT_TRACE_ALLOW_REQUEST', 'true').lower() == 'true':
+        return True
+    rate = sample_rate()
+    return rate > 0 and random.random() < rate
+
+
+def start(body):
+    """An AgentTrace for this request, or None when it is not traced."""
+    return AgentTrace() if should_trace(body) else None
+
+
+def current_trace_id():
+    """The Lambda X-Ray root trace id as a 32-hex OpenTelemetry id, or a random one."""
+    header = os.environ.get('_X_AMZN_TRACE_ID', '')
+    for part in header.split(';'):
+        if part.startswith('Root='):
+            # Root=1-5759e988-bd862e3fe1be46a994272793 -> 5759e988bd862e3fe1be46a994272793
+            trace_id = ''.join(part[len('Root='):].split('-')[1:])
+            if len(trace_id) == 32:
+                return trace_id
+    return f'{random.getrandbits(128):032x}'
+
+
+def new_span_id():
+    return f'{random.getrandbits(64):016x}'
+
+
+class AgentTrace:
+    """Collects spans for one invoke_agent call from its streamed trace events."""
+
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id or current_trace_id()
+        self.root = {
+            'traceId': self.trace_id,
+            'spanId': new_span_id(),
+            'name': 'invoke_agent',
+            'kind': 'CLIENT',
+            'startTimeUnixNano': time.time_ns(),
+            'attributes': {},
+            'status': {'code': 'OK'}
+        }
+        self.spans = []
+        self.events = 0
+        self._open = {}
+
+    def on_event(self, payload):
+        """Handle the `trace` member of one completion stream event."""
+        self.events += 1
+        now = time.time_ns()
+        for phase, step in (payload.get('trace') or {}).items():
+            phase = phase[:-len('Trace')] if phase.endswith('Trace') else phase
+            if phase == 'failure':
+                self.root['status'] = {'code': 'ERROR', 'message': step.get('failureReason', '')}
+                continue
+            if 'modelInvocationInput' in step:
+                event = step['modelInvocationInput']
+                self._begin(('model', event.get('traceId')), 'model', now, {
+                    'agent.phase': phase,
+                    'agent.prompt_type': event.get('type')
+                })
+            if 'modelInvocationOutput' in step:
+                event = step['modelInvocationOutput']
+                usage = (event.get('metadata') or {}).get('usage') or {}
+                self._end(('model', event.get('traceId')), now, {
+                    'gen_ai.usage.input_tokens': usage.get('inputTokens'),
+                    'gen_ai.usage.output_tokens': usage.get('outputTokens')
+                })
+            if 'invocationInput' in step:
+                event = step['invocationInput']
+                name = INVOCATION_TYPES.get(event.get('invocationType'))
+                if name:
+                    self._begin(('invocation', event.get('traceId')), name, now, invocation_attributes(event, phase))
+            if 'observation' in step:
+                event = step['observation']
+                self._end(('invocation', event.get('traceId')), now, {})
+
+    def finish(self, error=None):
+        """Close the root span and any steps still open. Returns all spans, root first."""
+        now = time.time_ns()
+        for key in list(self._open):
+            self._end(key, now, {})
+        self.root['endTimeUnixNano'] = now
+        self.root['attributes']['agent.trace_events'] = self.events
+        if error is not None:
+            self.root['status'] = {'code': 'ERROR', 'message': str(error)}
+        return [self.root] + self.spans
+
+    def breakdown(self):
+        """Milliseconds spent per step kind, with the remainder as orchestration."""
+        end = self.root.get('endTimeUnixNano') or time.time_ns()
+        total = (end - self.root['startTimeUnixNano']) / 1e6
+        steps = {}
+        for span in self.spans:
+            duration = (span['endTimeUnixNano'] - span['startTimeUnixNano']) / 1e6
+            steps[span['name']] = steps.get(span['name'], 0) + duration
+        summary = {camel_case(name) + 'Ms': round(ms, 2) for name, ms in steps.items()}
+        summary['orchestrationMs'] = round(max(total - sum(steps.values()), 0), 2)
+        summary['totalMs'] = round(total, 2)
+        summary['steps'] = len(self.spans)
+        return summary
+
+    def _begin(self, key, name, now, attributes):
+        self._open[key] = {
+            'traceId': self.trace_id,
+            'spanId': new_span_id(),
+            'parentSpanId': self.root['spanId'],
+            'name': name,
+            'kind': 'INTERNAL',
+            'startTimeUnixNano': now,
+            'attributes': {k: v for k, v in attributes.items() if v is not None},
+            'status': {'code': 'OK'}
+        }
+
+    def _end(self, key, now, attributes):
+        span = self._open.pop(key, None)
+        if span is None:
+            return
+        span['endTimeUnixNano'] = now
+        span['attributes'].update({k: v for k, v in attributes.items() if v is not None})
+        self.spans.append(span)
+
+
+def camel_case(name):
+    head, *rest = name.split('_')
+    return head + ''.join(part.title() for part in rest)
+
+
+def invocation_attributes(event, phase):
+    action_group = event.get('actionGroupInvocationInput') or {}
+    knowledge_base = event.get('knowledgeBaseLookupInput') or {}
+    return {
+        'agent.phase': phase,
+        'agent.action_group': action_group.get('actionGroupName'),
+        'agent.api_path': action_group.get('apiPath'),
+        'agent.function': action_group.get('function'),
+        'agent.knowledge_base_id': knowledge_base.get('knowledgeBaseId')
+    }
+
+
+def emit(trace, stream=None):
+    """Log the finished spans and their breakdown as one JSON line."""
+    record = {
+        'agentTrace': {
+            'service': os.environ.get('POWERTOOLS_SERVICE_NAME', 'bedrock-api'),
+            'breakdown': trace.breakdown(),
+            'spans': [trace.root] + trace.spans
+        }
+    }
+    (stream or sys.stdout).write(json.dumps(record, separators=(',', ':'), default=str) + '\n')
@@ -0,0 +1,54 @@
+import json
+import os
+
+import admission
+import index
+import jobs
+from clients import get_client
+
+
+def handler(event, context):
+    """
+    SQS-triggered worker answering async jobs queued by index.handler.
+    Jobs that admission control could not run in time, or that another worker
+    is running, are reported as batch item failures and made visible again
+    once they can be retried. On the last receive before the dead-letter queue
+    a deferred job is failed instead. Records from the dead-letter queue fail
+    jobs whose worker never finished them.
+    """
+    failures = []
+    for record in event.get('Records', []):
+        job_id = json.loads(record['body'])['jobId']
+        if from_dead_letter_queue(record):
+            index.job_service.abandon(job_id, 'The job was not answered after repeated attempts')
+            continue
+        receive_count = int(record.get('attributes', {}).get('ApproximateReceiveCount', '1'))
+        last_attempt = receive_count >= int(os.environ.get('JOBS_MAX_RECEIVE_COUNT', '5'))
+        try:
+            run_job(job_id, context, last_attempt)
+        except (admission.Overloaded, jobs.JobBusy) as e:
+            print(f"Job {job_id} deferred for {e.retry_after} s: {e}")
+            index.job_service.queue.defer(record, e.retry_after)
+            failures.append({'itemIdentifier': record['messageId']})
+    return {'batchItemFailures': failures}
+
+
+def from_dead_letter_queue(record):
+    arn = os.environ.get('JOBS_DEAD_LETTER_QUEUE_ARN')
+    return bool(arn) and record.get('eventSourceARN') == arn
+
+
+def run_job(job_id, context=None, last_attempt=False):
+    """Answer one job with the same routing, caching and metrics as the API."""
+    bedrock_agent = get_client('bedrock-agent-runtime')
+
+    # The result is stored in the job's DynamoDB item, so spill at a size that fits in it
+    spiller = None
+    if index.response_spill is not None:
+        spiller = index.response_spill.with_threshold(index.job_service.max_result_bytes)
+
+    def answer(request, on_text):
+        return index.answer_prompt(bedrock_agent, request, mode='async', context=context, on_text=on_text,
+                                   spiller=spiller)
+
+    return index.job_service.run(job_id, answer, last_attempt)
@@ -0,0 +1,41 @@
+"""
+Shared setup for the unit tests: the Lambda code and the ingestion assets are
+flat modules, so their directories go on sys.path the way the benchmarks put
+them there. AWS calls go to fakes or moto, never to an account.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+for path in ('benchmarks', os.path.join('ai_agent_pipeline', 'assets'), os.path.join('lambda', 'tools')):
+    sys.path.insert(0, os.path.join(ROOT, path))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('BEDROCK_AGENT_ID', 'AGENT')
+os.environ.setdefault('BEDROCK_AGENT_ALIAS_ID', 'ALIAS')
+os.environ.setdefault('METRICS_ENABLED', 'false')
+# moto signs requests like the real service, so it needs credentials of some kind
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    """Drop clients a test installed, so the next one starts from the container defaults."""
+    import clients
+    yield
+    clients.reset_clients()
+
+
+@pytest.fixture
+def s3():
+    """moto's S3, installed as the container-wide client, with one bucket."""
+    moto = pytest.importorskip('moto')
+    import clients
+    with moto.mock_aws():
+        clients.reset_clients()
+        client = clients.get_client('s3')
+        client.create_bucket(Bucket='kb-bucket')
+        yield client
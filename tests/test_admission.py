@@ -0,0 +1,171 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+import admission
+import clients
+import index
+from fake_agent_runtime import FakeAgentRuntime
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def throttled():
+    return ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}, 'InvokeAgent')
+
+
+def test_bucket_waits_within_the_deadline():
+    clock = Clock()
+    control = admission.AdmissionControl(rate=2, burst=1, sleep=clock.sleep, clock=clock)
+    control.admit('alias', clock.now + 5)
+    control.admit('alias', clock.now + 5)
+    assert clock.now == pytest.approx(1000.5)
+    assert control.stats() == {'admitted': 2, 'waited': 1, 'retried': 0, 'shed': 0, 'errors': 0}
+
+
+def test_bucket_sheds_past_the_deadline_with_retry_after():
+    clock = Clock()
+    control = admission.AdmissionControl(rate=0.25, burst=1, sleep=clock.sleep, clock=clock)
+    control.admit('alias', clock.now + 1)
+    with pytest.raises(admission.Overloaded) as raised:
+        control.admit('alias', clock.now + 1)
+    # The next token is 4 s away; nothing slept waiting for it
+    assert raised.value.retry_after == 4
+    assert clock.now == 1000.0
+    assert control.stats()['shed'] == 1
+
+
+def test_retry_after_is_a_whole_number_of_at_least_one_second():
+    assert admission.Overloaded('busy', 0.2).retry_after == 1
+    assert admission.Overloaded('busy', 2.1).retry_after == 3
+
+
+def test_throttles_are_retried_then_shed():
+    clock = Clock()
+    control = admission.AdmissionControl(max_attempts=3, base_delay=0.01, sleep=clock.sleep, clock=clock)
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise throttled()
+
+    with pytest.raises(admission.Overloaded) as raised:
+        control.call('alias', call, clock.now + 60)
+    assert len(calls) == 3
+    assert isinstance(raised.value.__cause__, ClientError)
+    assert control.stats()['retried'] == 2
+
+
+def test_other_errors_are_not_retried():
+    control = admission.AdmissionControl(sleep=lambda seconds: None)
+    with pytest.raises(ValueError):
+        control.call('alias', lambda: (_ for _ in ()).throw(ValueError('bad input')), float('inf'))
+    assert control.stats()['retried'] == 0
+
+
+def test_store_errors_fail_open():
+    class Broken:
+        def take(self, key, rate, burst, now):
+            raise ConnectionError('table unavailable')
+
+    control = admission.AdmissionControl(store=Broken(), rate=1)
+    control.admit('alias', 0)
+    assert control.try_admit('alias')
+    assert control.stats()['errors'] == 2
+
+
+def test_handler_returns_429_with_retry_after(monkeypatch):
+    clock = Clock()
+    monkeypatch.setenv('ADMISSION_MAX_WAIT_SECONDS', '0')
+    monkeypatch.setattr(index, 'admission_control',
+                        admission.AdmissionControl(rate=0.5, burst=1, sleep=clock.sleep, clock=clock))
+    monkeypatch.setattr(index, 'response_cache', None)
+    clients.set_client('bedrock-agent-runtime', FakeAgentRuntime(first_chunk_latency=0, chunk_latency=0, chunks=2))
+    event = {'body': json.dumps({'prompt': 'Which IPC class covers avionics?'})}
+
+    assert index.handler(event, None)['statusCode'] == 200
+    shed = index.handler(event, None)
+    assert shed['statusCode'] == 429
+    assert shed['headers']['Retry-After'] == '2'
+    assert json.loads(shed['body'])['retryAfter'] == 2
+
+
+class Context:
+    def __init__(self, remaining_seconds):
+        self.remaining_seconds = remaining_seconds
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_seconds * 1000
+
+
+def batch_results(monkeypatch, context):
+    clock = Clock()
+    monkeypatch.setenv('ADMISSION_MAX_WAIT_SECONDS', '1.5')
+    monkeypatch.setattr(index, 'admission_control',
+                        admission.AdmissionControl(rate=1, burst=1, sleep=clock.sleep, clock=clock))
+    monkeypatch.setattr(index, 'response_cache', None)
+    clients.set_client('bedrock-agent-runtime', FakeAgentRuntime(first_chunk_latency=0, chunk_latency=0, chunks=2))
+    event = {'body': json.dumps({'prompts': ['a', 'b', 'c'], 'concurrency': 1})}
+    return json.loads(index.handler(event, context)['body'])['results']
+
+
+def test_each_batch_item_gets_its_own_wait_budget(monkeypatch):
+    # One token a second: the third item waits until 2 s after the first, past a shared 1.5 s budget
+    assert ['error' in result for result in batch_results(monkeypatch, Context(900))] == [False, False, False]
+
+
+def test_wait_budget_is_capped_by_the_lambda_time_left(monkeypatch):
+    # 60 s are kept for the agent call, leaving half a second to wait in
+    assert ['error' in result for result in batch_results(monkeypatch, Context(60.5))] == [False, True, True]
+
+
+def flaky_runtime(monkeypatch, fail):
+    """A FakeAgentRuntime whose first call's completion stream goes through fail(events)."""
+    monkeypatch.setattr(index, 'admission_control', admission.AdmissionControl(base_delay=0.001))
+    monkeypatch.setattr(index, 'response_cache', None)
+    monkeypatch.setattr(index, 'agent_router', None)
+    runtime = FakeAgentRuntime(first_chunk_latency=0, chunk_latency=0, chunks=3)
+    invoke_agent = runtime.invoke_agent
+
+    def invoke(*args, **kwargs):
+        response = invoke_agent(*args, **kwargs)
+        if runtime.calls == 1:
+            return dict(response, completion=fail(iter(response['completion'])))
+        return response
+
+    monkeypatch.setattr(runtime, 'invoke_agent', invoke)
+    clients.set_client('bedrock-agent-runtime', runtime)
+    return runtime
+
+
+def test_throttles_before_the_first_event_are_retried(monkeypatch):
+    def fail(events):
+        raise throttled()
+        yield
+
+    runtime = flaky_runtime(monkeypatch, fail)
+    response = index.handler({'body': json.dumps({'prompt': 'Which IPC class covers avionics?'})}, None)
+    assert response['statusCode'] == 200
+    assert runtime.calls == 2
+
+
+def test_reading_the_completion_is_not_retried(monkeypatch):
+    def fail(events):
+        yield next(events)
+        raise throttled()
+
+    runtime = flaky_runtime(monkeypatch, fail)
+    response = index.handler({'body': json.dumps({'prompt': 'Which IPC class covers avionics?'})}, None)
+    assert response['statusCode'] == 500
+    assert runtime.calls == 1
+    assert index.admission_control.stats()['retried'] == 0
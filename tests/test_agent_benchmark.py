@@ -0,0 +1,76 @@
+import json
+import sys
+
+import pytest
+
+import agent_benchmark
+
+
+def run(monkeypatch, *args):
+    monkeypatch.setattr(sys, 'argv', ['agent_benchmark.py', '--fake', '--concurrency', '20', *args])
+    return agent_benchmark.main()
+
+
+def summary(**values):
+    return dict({'requests': 20, 'concurrency': 4, 'errorRate': 0.0, 'throughputRps': 10.0,
+                 'latencyP50Ms': 100.0, 'latencyP95Ms': 200.0, 'latencyP99Ms': 250.0,
+                 'firstChunkP95Ms': 80.0, 'judgePassRate': 1.0}, **values)
+
+
+def test_first_run_records_the_baseline(monkeypatch, tmp_path):
+    baseline = tmp_path / 'baseline.json'
+    output = str(tmp_path / 'results.json')
+    assert run(monkeypatch, '--baseline', str(baseline), '--init-baseline', '--output', output) == 0
+    recorded = json.loads(baseline.read_text())
+    assert recorded['requests'] == 20
+    assert recorded['errorRate'] == 0.0
+
+    # The next run is compared with it rather than overwriting it
+    baseline.write_text(json.dumps(dict(recorded, latencyP95Ms=1.0)))
+    assert run(monkeypatch, '--baseline', str(baseline), '--init-baseline', '--output', output) == 1
+    assert json.loads(baseline.read_text())['latencyP95Ms'] == 1.0
+
+
+def test_missing_baseline_is_skipped_without_init(monkeypatch, tmp_path):
+    baseline = tmp_path / 'baseline.json'
+    assert run(monkeypatch, '--baseline', str(baseline), '--output', str(tmp_path / 'results.json')) == 0
+    assert not baseline.exists()
+
+
+def test_failing_run_does_not_seed_the_baseline(monkeypatch, tmp_path):
+    monkeypatch.setattr(agent_benchmark, 'summarize', lambda results, elapsed, concurrency: summary(errorRate=0.5))
+    baseline = tmp_path / 'baseline.json'
+    assert run(monkeypatch, '--baseline', str(baseline), '--init-baseline',
+               '--output', str(tmp_path / 'results.json')) == 1
+    assert not baseline.exists()
+
+
+@pytest.mark.parametrize('change, regressed', [
+    ({}, []),
+    ({'latencyP95Ms': 241.0}, ['latencyP95Ms']),
+    ({'throughputRps': 7.9}, ['throughputRps']),
+    ({'errorRate': 0.05}, ['errorRate']),
+    ({'judgePassRate': 0.9}, ['judgePassRate'])
+])
+def test_regressions_past_the_tolerance(change, regressed):
+    regressions = agent_benchmark.find_regressions(summary(**change), summary(), 0.2, 0.02)
+    assert [regression.split()[0] for regression in regressions] == regressed
+
+
+def test_runs_of_another_shape_are_not_compared():
+    regressions = agent_benchmark.find_regressions(summary(concurrency=16, shards=4), summary(), 0.2, 0.02)
+    assert len(regressions) == 1
+    assert regressions[0].startswith('run shape (concurrency 16, shards 4) does not match')
+    assert agent_benchmark.find_regressions(summary(shards=1), summary(), 0.2, 0.02) == []
+
+
+def test_merged_run_has_its_own_shape(monkeypatch, tmp_path):
+    for index in range(2):
+        assert run(monkeypatch, '--shard', f'{index}/2', '--output', str(tmp_path / f'shard-{index}-of-2.json')) == 0
+    baseline = tmp_path / 'baseline.json'
+    baseline.write_text(json.dumps(summary(concurrency=20)))
+    assert run(monkeypatch, '--merge', str(tmp_path), '--shards', '2', '--baseline', str(baseline),
+               '--output', str(tmp_path / 'results.json')) == 1
+    merged = json.loads((tmp_path / 'results.json').read_text())
+    assert (merged['summary']['concurrency'], merged['summary']['shards']) == (40, 2)
+    assert merged['regressions'][0].startswith('run shape')
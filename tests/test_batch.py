@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+import batch
+import clients
+import index
+from fake_agent_runtime import FakeAgentRuntime
+
+
+@pytest.fixture(autouse=True)
+def agent(monkeypatch):
+    monkeypatch.setattr(index, 'response_cache', None)
+    clients.set_client('bedrock-agent-runtime', FakeAgentRuntime(first_chunk_latency=0, chunk_latency=0, chunks=2))
+
+
+@pytest.mark.parametrize('concurrency', ['fast', 0, -2, 1.5, True, [2]])
+def test_invalid_batch_concurrency_is_a_400(concurrency):
+    event = {'body': json.dumps({'prompts': ['a', 'b'], 'concurrency': concurrency})}
+    response = index.handler(event, None)
+    assert response['statusCode'] == 400
+    assert json.loads(response['body'])['error'] == 'concurrency must be a positive integer'
+
+
+def test_batch_concurrency_is_capped():
+    assert batch.concurrency_limit({}, 3) == 3
+    assert batch.concurrency_limit({'concurrency': '2'}, 5) == 2
+    assert batch.concurrency_limit({'concurrency': 500}, 50) == batch.max_concurrency()
+
+
+def test_batch_answers_every_prompt():
+    response = index.handler({'body': json.dumps({'prompts': ['a', 'b', 'c'], 'concurrency': 2})}, None)
+    assert response['statusCode'] == 200
+
+
+def test_malformed_batches_are_rejected():
+    for body in ({'prompts': []}, {'prompts': 'a'}, {'prompts': ['a', {'sessionId': 's'}]}):
+        response = index.handler({'body': json.dumps(body)}, None)
+        assert response['statusCode'] == 400
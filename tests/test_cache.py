@@ -0,0 +1,84 @@
+import cache
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_evicts_least_recently_used():
+    lru = cache.LRUCache(max_entries=2, ttl_seconds=60)
+    lru.put('a', 1)
+    lru.put('b', 2)
+    # Reading a makes b the oldest entry
+    assert lru.get('a') == 1
+    lru.put('c', 3)
+    assert lru.get('b') is None
+    assert lru.get('a') == 1
+    assert lru.get('c') == 3
+    assert len(lru) == 2
+
+
+def test_lru_expires_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, 'monotonic', clock)
+    lru = cache.LRUCache(ttl_seconds=10)
+    lru.put('a', 1)
+    clock.now += 9.9
+    assert lru.get('a') == 1
+    clock.now += 0.1
+    assert lru.get('a') is None
+    assert len(lru) == 0
+
+
+def test_put_refreshes_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, 'monotonic', clock)
+    lru = cache.LRUCache(ttl_seconds=10)
+    lru.put('a', 1)
+    clock.now += 8
+    lru.put('a', 2)
+    clock.now += 8
+    assert lru.get('a') == 2
+
+
+def test_shared_hit_fills_local_tier():
+    shared = cache.DictBackend()
+    responses = cache.ResponseCache(shared=shared, ttl_seconds=60)
+    shared.put('key', {'response': 'cached'}, 60)
+    assert responses.get('key') == {'response': 'cached'}
+    assert responses.local.get('key') == {'response': 'cached'}
+    assert responses.get('missing') is None
+    assert responses.stats() == {'hits': 1, 'sharedHits': 1, 'misses': 1, 'bypassed': 0, 'errors': 0}
+
+
+def test_shared_errors_count_as_misses():
+    class Broken:
+        def get(self, key):
+            raise ConnectionError('table unavailable')
+
+        def put(self, key, value, ttl_seconds):
+            raise ConnectionError('table unavailable')
+
+    responses = cache.ResponseCache(shared=Broken())
+    responses.put('key', {'response': 'local only'})
+    assert responses.get('key') == {'response': 'local only'}
+    assert responses.get('other') is None
+    assert responses.stats()['errors'] == 2
+
+
+def test_sessions_and_opt_out_bypass_the_cache():
+    responses = cache.ResponseCache()
+    assert responses.should_use({'prompt': 'p'})
+    assert not responses.should_use({'prompt': 'p', 'cache': False})
+    assert not responses.should_use({'prompt': 'p', 'sessionId': 's'})
+    assert cache.ResponseCache(allow_sessions=True).should_use({'prompt': 'p', 'sessionId': 's'})
+
+
+def test_key_ignores_whitespace_and_case():
+    key = cache.cache_key('AGENT', 'ALIAS', 'What is  IPC-A-610?')
+    assert key == cache.cache_key('AGENT', 'ALIAS', 'what is ipc-a-610?')
+    assert key != cache.cache_key('AGENT', 'OTHER', 'What is IPC-A-610?')
@@ -0,0 +1,69 @@
+import threading
+
+import external_api
+
+
+class FakePool:
+    """Stands in for the urllib3 pool: answers with the caller's Authorization header."""
+
+    def __init__(self, release=None):
+        self.calls = []
+        self.release = release
+
+    def request(self, method, url, headers=None, body=None):
+        self.calls.append(headers)
+        if self.release:
+            self.release.wait(5)
+        return FakeResponse((headers or {}).get('Authorization', 'anonymous'))
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.status = 200
+        self.data = text.encode('utf-8')
+        self.headers = {'Content-Type': 'text/plain'}
+
+
+def client(pool):
+    api = external_api.ExternalApiClient(['parts.example.com'])
+    api.pool = pool
+    return api
+
+
+def test_responses_are_cached_per_header_set():
+    pool = FakePool()
+    api = client(pool)
+    url = 'https://parts.example.com/stock'
+    assert api.request('GET', url, headers={'Authorization': 'Bearer a'})['body'] == 'Bearer a'
+    assert api.request('GET', url, headers={'Authorization': 'Bearer b'})['body'] == 'Bearer b'
+    cached = api.request('GET', url, headers={'authorization': 'Bearer a'})
+    assert cached['cached'] is True
+    assert cached['body'] == 'Bearer a'
+    assert api.request('GET', url)['body'] == 'anonymous'
+    assert len(pool.calls) == 3
+
+
+def test_concurrent_calls_with_other_headers_are_not_coalesced():
+    release = threading.Event()
+    pool = FakePool(release)
+    api = client(pool)
+    results = {}
+
+    def fetch(token):
+        results[token] = api.request('GET', 'https://parts.example.com/stock', headers={'Authorization': token})
+
+    threads = [threading.Thread(target=fetch, args=(token,)) for token in ('a', 'b')]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert {token: result['body'] for token, result in results.items()} == {'a': 'a', 'b': 'b'}
+    assert not any(result['coalesced'] for result in results.values())
+
+
+def test_request_key_hides_the_header_values():
+    key = external_api.request_key('https://parts.example.com/stock', {'Authorization': 'Bearer secret'})
+    assert key.startswith('https://parts.example.com/stock#')
+    assert 'secret' not in key
+    assert external_api.request_key('https://parts.example.com/stock', None) == 'https://parts.example.com/stock'
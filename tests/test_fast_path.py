@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+import fast_path
+import index
+import plugin_schema
+import tools
+
+
+@pytest.fixture
+def dispatched(monkeypatch):
+    """The events fast_path hands to the tools, answered with an empty result."""
+    events = []
+
+    def dispatch(event):
+        events.append(event)
+        return {'statusCode': 200, 'body': json.dumps({'ok': True})}
+
+    monkeypatch.setattr(tools, 'dispatch', dispatch)
+    return events
+
+
+def test_external_api_is_hidden_without_an_allow_list(monkeypatch, dispatched):
+    monkeypatch.delenv('EXTERNAL_API_ALLOWED_HOSTS', raising=False)
+    with pytest.raises(fast_path.FastPathError) as raised:
+        fast_path.run('external_api', {'url': 'https://parts.example.com/stock'})
+    assert raised.value.status_code == 404
+    assert '/tools/external_api' not in plugin_schema.build_schema('https://api.example.com')['paths']
+    assert dispatched == []
+
+
+def test_fast_path_forwards_only_declared_parameters(monkeypatch, dispatched):
+    monkeypatch.setenv('EXTERNAL_API_ALLOWED_HOSTS', 'parts.example.com')
+    status, payload = fast_path.run('external_api', {
+        'url': 'https://parts.example.com/stock',
+        'params': {'part': 'R0402'},
+        'method': 'DELETE',
+        'headers': {'Authorization': 'Bearer stolen'},
+        'body': 'x'
+    })
+    assert status == 200
+    assert dispatched == [{
+        'url': 'https://parts.example.com/stock',
+        'params': {'part': 'R0402'},
+        'method': 'GET',
+        'tool_type': 'external_api'
+    }]
+    assert '/tools/external_api' in plugin_schema.build_schema('https://api.example.com')['paths']
+
+
+def test_unknown_tools_are_404():
+    with pytest.raises(fast_path.FastPathError) as raised:
+        fast_path.run('shell', {})
+    assert raised.value.status_code == 404
+
+
+@pytest.mark.parametrize('body', ['{"question": ', '["knowledge_base"]'])
+def test_bodies_that_are_not_json_objects_are_a_400(body, dispatched):
+    response = index.handler({'pathParameters': {'tool': 'knowledge_base'}, 'body': body}, None)
+    assert response['statusCode'] == 400
+    assert json.loads(response['body']) == {'error': 'Request body must be a JSON object'}
+    assert dispatched == []
@@ -0,0 +1,115 @@
+import base64
+import json
+
+import pytest
+
+import admission
+import clients
+import index
+from fake_agent_runtime import FakeAgentRuntime
+
+
+class RecordingStream:
+    def __init__(self):
+        self.data = b''
+        self.closed = False
+        self.status_code = 200
+        self.headers = {}
+
+    def set_status(self, status_code, headers=None):
+        if self.data:
+            return False
+        self.status_code = status_code
+        self.headers.update(headers or {})
+        return True
+
+    def write(self, data):
+        self.data += data
+
+    def close(self):
+        self.closed = True
+
+    def frames(self):
+        return [json.loads(line) for line in self.data.decode('utf-8').splitlines()]
+
+
+@pytest.fixture(autouse=True)
+def agent(monkeypatch):
+    monkeypatch.setattr(index, 'response_cache', None)
+    runtime = FakeAgentRuntime(first_chunk_latency=0, chunk_latency=0, chunks=3, chunk_size=8)
+    clients.set_client('bedrock-agent-runtime', runtime)
+    return runtime
+
+
+def test_buffered_answer():
+    response = index.handler({'body': json.dumps({'prompt': 'Which class covers avionics?'})}, None)
+    body = json.loads(response['body'])
+    assert response['statusCode'] == 200
+    assert body['response']
+    assert body['cached'] is False
+
+
+def test_missing_prompt_is_rejected():
+    assert index.handler({'body': '{}'}, None)['statusCode'] == 400
+
+
+def test_base64_bodies_are_decoded():
+    event = {'body': base64.b64encode(json.dumps({'prompt': 'hi'}).encode('utf-8')).decode('ascii'),
+             'isBase64Encoded': True}
+    body, error = index.parse_request(event)
+    assert error is None
+    assert body == {'prompt': 'hi'}
+
+
+def test_stream_handler_writes_chunks_then_done():
+    stream = RecordingStream()
+    index.stream_handler({'body': json.dumps({'prompt': 'Which class covers avionics?'})}, stream, None)
+    frames = stream.frames()
+    assert stream.closed
+    assert [frame for frame in frames if 'chunk' in frame]
+    assert frames[-1]['done'] is True
+    assert frames[-1]['cached'] is False
+    assert stream.status_code == 200
+
+
+@pytest.mark.parametrize('body', [{'prompts': ['a', 'b']}, {'prompt': 'a', 'async': True}])
+def test_stream_handler_takes_a_single_prompt(body, agent):
+    stream = RecordingStream()
+    index.stream_handler({'body': json.dumps(body)}, stream, None)
+    assert stream.frames() == [{'error': 'Streaming takes a single prompt; send batch and async requests to /invoke'}]
+    assert stream.status_code == 400
+    assert stream.closed
+    assert agent.calls == 0
+
+
+def test_stream_handler_sheds_with_429_before_the_first_chunk(monkeypatch):
+    monkeypatch.setattr(index, 'admission_control', admission.AdmissionControl(rate=0.5, burst=1, clock=lambda: 0.0))
+    monkeypatch.setenv('ADMISSION_MAX_WAIT_SECONDS', '0')
+    event = {'body': json.dumps({'prompt': 'Which class covers avionics?'})}
+    index.stream_handler(event, RecordingStream(), None)
+    stream = RecordingStream()
+    index.stream_handler(event, stream, None)
+    assert stream.status_code == 429
+    assert stream.headers == {'Retry-After': '2'}
+    assert stream.frames()[-1]['retryAfter'] == 2
+
+
+def test_stream_handler_reports_late_errors_in_band(agent, monkeypatch):
+    invoke_agent = agent.invoke_agent
+
+    def broken(*args, **kwargs):
+        response = invoke_agent(*args, **kwargs)
+
+        def completion():
+            yield next(iter(response['completion']))
+            raise ConnectionError('stream dropped')
+
+        return dict(response, completion=completion())
+
+    monkeypatch.setattr(agent, 'invoke_agent', broken)
+    stream = RecordingStream()
+    index.stream_handler({'body': json.dumps({'prompt': 'Which class covers avionics?'})}, stream, None)
+    frames = stream.frames()
+    assert stream.status_code == 200
+    assert 'chunk' in frames[0]
+    assert frames[-1] == {'error': 'stream dropped'}
@@ -0,0 +1,128 @@
+import io
+import json
+import threading
+import time
+
+import hedging
+import metrics
+from agent import InvocationTimer
+
+
+class Target:
+    def __init__(self, name):
+        self.name = name
+
+
+def stream(text, delay=0.0, released=None):
+    def completion():
+        if released is not None:
+            released.wait(5)
+        time.sleep(delay)
+        yield {'chunk': {'bytes': text.encode('utf-8')}}
+
+    return {'sessionId': 'session', 'completion': completion()}
+
+
+def answer(response):
+    return ''.join(event['chunk']['bytes'].decode('utf-8') for event in response['completion'])
+
+
+def test_fast_primary_is_not_hedged():
+    hedger = hedging.Hedger(delay_ms=500)
+    primary = Target('primary')
+    winner, response = hedger.invoke(lambda target: stream(target.name), primary, Target('replica'))
+    assert winner is primary
+    assert answer(response) == 'primary'
+    assert response['hedge'] == {'hedged': False, 'won': False, 'winner': 'primary'}
+    assert hedger.stats() == {'requests': 1, 'hedged': 0, 'hedgeWins': 0}
+
+
+def test_hedge_on_a_replica_that_answers_first_is_a_win():
+    hedger = hedging.Hedger(delay_ms=20)
+    release = threading.Event()
+
+    def start(target):
+        return stream(target.name, released=release if target.name == 'primary' else None)
+
+    winner, response = hedger.invoke(start, Target('primary'), Target('replica'))
+    release.set()
+    assert winner.name == 'replica'
+    assert answer(response) == 'replica'
+    assert response['hedge'] == {'hedged': True, 'won': True, 'winner': 'replica'}
+    assert hedger.stats()['hedgeWins'] == 1
+
+
+def test_hedge_on_the_same_alias_that_answers_first_is_a_win():
+    # With no replica the hedge goes to the primary's alias, so only the attempt tells the two apart
+    hedger = hedging.Hedger(delay_ms=20)
+    primary = Target('only')
+    release = threading.Event()
+    calls = []
+
+    def start(target):
+        calls.append(target)
+        return stream('first' if len(calls) == 1 else 'hedge', released=release if len(calls) == 1 else None)
+
+    winner, response = hedger.invoke(start, primary)
+    release.set()
+    assert winner is primary
+    assert answer(response) == 'hedge'
+    assert response['hedge']['won'] is True
+    assert hedger.stats() == {'requests': 1, 'hedged': 1, 'hedgeWins': 1}
+
+
+def test_primary_that_wins_after_a_hedge_is_not_a_win():
+    hedger = hedging.Hedger(delay_ms=20)
+    release = threading.Event()
+
+    def start(target):
+        return stream(target.name, released=release if target.name == 'replica' else None, delay=0.05)
+
+    winner, response = hedger.invoke(start, Target('primary'), Target('replica'))
+    release.set()
+    assert winner.name == 'primary'
+    assert response['hedge'] == {'hedged': True, 'won': False, 'winner': 'primary'}
+    assert hedger.stats()['hedgeWins'] == 0
+
+
+def test_budget_and_admission_limit_hedges():
+    hedger = hedging.Hedger(delay_ms=1, budget=hedging.HedgeBudget(ratio=0, burst=1))
+    slow = lambda target: stream(target.name, delay=0.03)  # noqa: E731
+    hedger.invoke(slow, Target('primary'), Target('replica'))
+    _, response = hedger.invoke(slow, Target('primary'), Target('replica'))
+    assert response['hedge']['hedged'] is False
+
+    refused = hedging.Hedger(delay_ms=1)
+    _, response = refused.invoke(slow, Target('primary'), Target('replica'), can_hedge=lambda replica: False)
+    assert response['hedge']['hedged'] is False
+    assert hedger.stats()['hedged'] == 1
+    assert refused.stats()['hedged'] == 0
+
+
+def test_failed_primary_falls_back_to_the_hedge():
+    hedger = hedging.Hedger(delay_ms=1)
+
+    def start(target):
+        if target.name == 'primary':
+            time.sleep(0.02)
+            raise ConnectionError('primary failed')
+        return stream(target.name)
+
+    winner, response = hedger.invoke(start, Target('primary'), Target('replica'))
+    assert winner.name == 'replica'
+    assert response['hedge']['won'] is True
+
+
+def test_hedge_outcome_is_recorded_in_metrics(monkeypatch):
+    monkeypatch.setenv('METRICS_ENABLED', 'true')
+    timer = InvocationTimer()
+    timer.mark_first_byte()
+    timer.stop()
+    records = io.StringIO()
+    metrics.record_invocation(timer, cached=False, stream=records,
+                              hedge={'hedged': True, 'won': True, 'winner': 'replica'})
+    metrics.record_invocation(timer, cached=False, stream=records,
+                              hedge={'hedged': True, 'won': False, 'winner': 'primary'})
+    first, second = [json.loads(line) for line in records.getvalue().splitlines()]
+    assert (first['Hedged'], first['HedgeWin']) == (1, 1)
+    assert (second['Hedged'], second['HedgeWin']) == (1, 0)
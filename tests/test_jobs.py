@@ -0,0 +1,286 @@
+import json
+import threading
+import time
+
+import pytest
+
+import admission
+import clients
+import index
+import jobs
+import worker
+from fake_agent_runtime import FakeAgentRuntime, throttling_error
+
+
+@pytest.fixture
+def service():
+    return jobs.JobService(jobs.MemoryJobStore(), jobs.MemoryQueue(), max_wait_seconds=2, progress_interval=0)
+
+
+def message_job_ids(queue):
+    return [json.loads(event['Records'][0]['body'])['jobId'] for event in queue.drain()]
+
+
+def test_submit_stores_a_queued_job_and_enqueues_it(service):
+    job = service.submit({'prompt': 'Summarize the audit', 'async': True})
+    assert job['status'] == 'queued'
+    assert job['version'] == 0
+    assert job['request'] == {'prompt': 'Summarize the audit'}
+    assert message_job_ids(service.queue) == [job['jobId']]
+    assert 'request' not in jobs.public_view(job)
+
+
+def test_run_moves_through_running_to_succeeded(service):
+    job = service.submit({'prompt': 'p'})
+    seen = []
+
+    def answer(request, on_text):
+        seen.append(service.poll(job['jobId'])['status'])
+        on_text('Class ')
+        on_text('3')
+        return {'response': 'Class 3'}
+
+    finished = service.run(job['jobId'], answer)
+    assert seen == ['running']
+    assert finished['status'] == 'succeeded'
+    assert finished['result'] == {'response': 'Class 3'}
+    assert finished['progress'] == {'chunks': 2, 'responseBytes': 7, 'partial': ''}
+    # running, two progress writes, then the result
+    assert service.poll(job['jobId'])['version'] == 4
+
+
+def test_long_poll_returns_as_soon_as_the_version_moves(service):
+    job = service.submit({'prompt': 'p'})
+    started = threading.Event()
+
+    def worker():
+        started.wait(5)
+        time.sleep(0.05)
+        service.run(job['jobId'], lambda request, on_text: {'response': 'done'})
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    began = time.monotonic()
+    started.set()
+    polled = service.poll(job['jobId'], since=0, wait=2)
+    thread.join()
+    assert polled['version'] > 0
+    assert time.monotonic() - began < 1.5
+
+
+def test_long_poll_times_out_with_the_unchanged_job(service):
+    job = service.submit({'prompt': 'p'})
+    began = time.monotonic()
+    polled = service.poll(job['jobId'], since=0, wait=0.2)
+    assert polled['status'] == 'queued'
+    assert polled['version'] == 0
+    assert time.monotonic() - began >= 0.2
+
+
+def test_wait_is_capped_and_terminal_jobs_return_at_once(service):
+    job = service.submit({'prompt': 'p'})
+    service.run(job['jobId'], lambda request, on_text: {'response': 'done'})
+    began = time.monotonic()
+    # A poller that has already seen the final version is not kept waiting
+    polled = service.poll(job['jobId'], since=99, wait=60)
+    assert polled['status'] == 'succeeded'
+    assert time.monotonic() - began < 0.5
+    assert service.poll('unknown', since=0, wait=0.01) is None
+
+
+def test_redelivered_messages_are_skipped(service):
+    job = service.submit({'prompt': 'p'})
+    service.run(job['jobId'], lambda request, on_text: {'response': 'first'})
+    again = service.run(job['jobId'], lambda request, on_text: {'response': 'second'})
+    assert again['result'] == {'response': 'first'}
+
+
+def test_errors_fail_the_job(service):
+    job = service.submit({'prompt': 'p'})
+
+    def answer(request, on_text):
+        raise RuntimeError('agent failed')
+
+    failed = service.run(job['jobId'], answer)
+    assert failed['status'] == 'failed'
+    assert failed['error'] == 'agent failed'
+
+
+def test_shed_jobs_go_back_to_queued(service):
+    job = service.submit({'prompt': 'p'})
+
+    def answer(request, on_text):
+        raise admission.Overloaded('busy', 5)
+
+    with pytest.raises(admission.Overloaded):
+        service.run(job['jobId'], answer)
+    assert service.poll(job['jobId'])['status'] == 'queued'
+
+
+def test_results_too_large_for_the_item_fail_clearly(service):
+    job = service.submit({'prompt': 'p'})
+    # Multi-byte characters count by their UTF-8 size
+    text = '°' * (jobs.MAX_DOCUMENT_BYTES // 2 + 1)
+    failed = service.run(job['jobId'], lambda request, on_text: {'response': text})
+    assert failed['status'] == 'failed'
+    assert failed['result'] is None
+    assert 'large-response mode' in failed['error']
+    assert len(jobs.document(failed).encode('utf-8')) < jobs.MAX_DOCUMENT_BYTES
+
+
+def test_progress_is_throttled_and_truncated():
+    store = jobs.MemoryJobStore()
+    job = jobs.new_job({'prompt': 'p'})
+    store.create(job)
+    now = [0.0]
+    writer = jobs.ProgressWriter(store, job, interval=1.0, max_partial_bytes=4, clock=lambda: now[0])
+    writer.add('ab')
+    writer.add('cd')
+    assert store.get(job['jobId'])['version'] == 0
+    now[0] = 1.0
+    writer.add('ef')
+    progress = store.get(job['jobId'])['progress']
+    assert progress == {'chunks': 3, 'responseBytes': 6, 'partial': 'abcd'}
+
+
+def test_running_jobs_are_left_to_their_worker_until_stale(service):
+    job = service.submit({'prompt': 'p'})
+    service.store.jobs[job['jobId']]['status'] = 'running'
+    with pytest.raises(jobs.JobBusy) as raised:
+        service.run(job['jobId'], lambda request, on_text: {'response': 'twice'})
+    assert 590 <= raised.value.retry_after <= 600
+
+    # The worker timed out or crashed without finishing it
+    service.store.jobs[job['jobId']]['updatedAt'] -= 600
+    assert service.run(job['jobId'], lambda request, on_text: {'response': 'done'})['status'] == 'succeeded'
+
+
+def test_shed_jobs_fail_on_the_last_attempt(service):
+    job = service.submit({'prompt': 'p'})
+
+    def answer(request, on_text):
+        raise admission.Overloaded('busy', 5)
+
+    failed = service.run(job['jobId'], answer, last_attempt=True)
+    assert failed['status'] == 'failed'
+    assert failed['error'] == 'busy'
+
+
+def test_abandoned_jobs_fail_unless_a_worker_is_on_them(service):
+    queued, running, stale = (service.submit({'prompt': 'p'})['jobId'] for _ in range(3))
+    for job_id in (running, stale):
+        service.store.jobs[job_id]['status'] = 'running'
+    service.store.jobs[stale]['updatedAt'] -= 600
+    assert service.abandon(queued, 'gave up')['status'] == 'failed'
+    assert service.abandon(running, 'gave up')['status'] == 'running'
+    assert service.abandon(stale, 'gave up')['error'] == 'gave up'
+
+
+@pytest.fixture
+def overloaded_worker(service, monkeypatch):
+    """The worker on an in-memory job service, with an agent that is always over its rate limit."""
+    monkeypatch.setattr(index, 'job_service', service)
+    monkeypatch.setattr(index, 'admission_control', admission.AdmissionControl(rate=0.001, burst=1))
+    monkeypatch.setenv('ADMISSION_MAX_WAIT_SECONDS', '0')
+    monkeypatch.setattr(index, 'response_cache', None)
+    index.admission_control.admit(index.get_router().route({'prompt': 'p'})[0].key, float('inf'))
+    clients.set_client('bedrock-agent-runtime', FakeAgentRuntime(first_chunk_latency=0, chunk_latency=0))
+    return service
+
+
+def test_worker_defers_until_the_last_receive(overloaded_worker, monkeypatch):
+    monkeypatch.setenv('JOBS_MAX_RECEIVE_COUNT', '3')
+    job = overloaded_worker.submit({'prompt': 'p'})
+    receives = 0
+    while overloaded_worker.queue.messages:
+        for event in overloaded_worker.queue.drain():
+            receives += 1
+            worker.handler(event, None)
+    assert receives == 3
+    final = overloaded_worker.poll(job['jobId'])
+    assert final['status'] == 'failed'
+    assert 'Rate limit' in final['error']
+
+
+def test_dead_letters_fail_the_job(overloaded_worker, monkeypatch):
+    monkeypatch.setenv('JOBS_DEAD_LETTER_QUEUE_ARN', 'arn:aws:sqs:us-east-1:123456789012:jobs-dlq')
+    job = overloaded_worker.submit({'prompt': 'p'})
+    record = next(overloaded_worker.queue.drain())['Records'][0]
+    assert worker.handler({'Records': [dict(record, eventSourceARN='arn:aws:sqs:us-east-1:123456789012:jobs-dlq')]},
+                          None) == {'batchItemFailures': []}
+    assert overloaded_worker.poll(job['jobId'])['status'] == 'failed'
+
+
+def test_sqs_deferral_shortens_the_visibility_timeout():
+    moto = pytest.importorskip('moto')
+    with moto.mock_aws():
+        clients.reset_clients()
+        sqs = clients.get_client('sqs')
+        url = sqs.create_queue(QueueName='jobs', Attributes={'VisibilityTimeout': '900'})['QueueUrl']
+        queue = jobs.SQSQueue(url)
+        queue.send('job-1')
+        message = sqs.receive_message(QueueUrl=url)['Messages'][0]
+        assert not sqs.receive_message(QueueUrl=url).get('Messages')
+        queue.defer({'receiptHandle': message['ReceiptHandle']}, 0)
+        assert sqs.receive_message(QueueUrl=url)['Messages'][0]['Body'] == message['Body']
+
+
+def test_rerun_jobs_start_their_partial_answer_over(service):
+    job = service.submit({'prompt': 'p'})
+    stored = service.store.jobs[job['jobId']]
+    stored.update(status='running', updatedAt=stored['updatedAt'] - 600,
+                  progress={'chunks': 1, 'responseBytes': 6, 'partial': 'Class '})
+    partials = []
+
+    def answer(request, on_text):
+        partials.append(service.poll(job['jobId'])['progress']['partial'])
+        on_text('Class 3')
+        partials.append(service.poll(job['jobId'])['progress']['partial'])
+        return {'response': 'Class 3'}
+
+    service.run(job['jobId'], answer)
+    assert partials == ['', 'Class 3']
+
+
+@pytest.mark.parametrize('answered', [False, True])
+def test_partials_come_only_from_the_attempt_that_answers(service, monkeypatch, answered):
+    monkeypatch.setattr(index, 'job_service', service)
+    monkeypatch.setattr(index, 'admission_control', admission.AdmissionControl(base_delay=0.001))
+    monkeypatch.setattr(index, 'response_cache', None)
+    monkeypatch.setattr(index, 'agent_router', None)
+    runtime = FakeAgentRuntime(first_chunk_latency=0, chunk_latency=0, chunk_size=8,
+                               responder=lambda text: 'Class 3 avionics')
+    invoke_agent = runtime.invoke_agent
+
+    def invoke(*args, **kwargs):
+        response = invoke_agent(*args, **kwargs)
+        if runtime.calls > 1:
+            return response
+
+        # The first call is throttled, before answering or part way through the answer
+        def completion():
+            if answered:
+                yield next(iter(response['completion']))
+            raise throttling_error('InvokeAgent')
+
+        return dict(response, completion=completion())
+
+    monkeypatch.setattr(runtime, 'invoke_agent', invoke)
+    clients.set_client('bedrock-agent-runtime', runtime)
+    seen = []
+    add = jobs.ProgressWriter.add
+    monkeypatch.setattr(jobs.ProgressWriter, 'add', lambda writer, text: (seen.append(text), add(writer, text)))
+
+    job = service.submit({'prompt': 'p'})
+    for event in service.queue.drain():
+        worker.handler(event, None)
+    final = service.poll(job['jobId'])
+    if answered:
+        # Part of the answer already reached the job, so it is not asked again
+        assert runtime.calls == 1
+        assert final['status'] == 'failed'
+        assert seen == ['Class 3 ']
+    else:
+        assert runtime.calls == 2
+        assert final['result']['response'] == 'Class 3 avionics'
+        assert ''.join(seen) == 'Class 3 avionics'
@@ -0,0 +1,193 @@
+import errno
+import io
+import json
+import os
+
+import numpy as np
+import pytest
+
+import bulk_inference
+import clients
+import kb_ingest
+import knowledge_base
+
+DOCUMENTS = 'knowledge-base/documents/'
+INDEX = 'knowledge-base/index'
+OPTIONS = {'batch_size': 8, 'checkpoint_every': 2, 'max_chars': 200}
+
+
+def procedure(topic, steps=4):
+    return '\n\n'.join(f"Step {step} for {topic}: inspect the {topic} and record the result at station {step}."
+                       for step in range(1, steps + 1))
+
+
+class FailingEmbedder(kb_ingest.FakeEmbedder):
+    def __init__(self, fail_after):
+        super().__init__(64)
+        self.fail_after = fail_after
+        self.batches = 0
+
+    def embed(self, texts):
+        if self.batches >= self.fail_after:
+            raise RuntimeError('interrupted')
+        self.batches += 1
+        return super().embed(texts)
+
+
+class FakeBedrockRuntime:
+    def __init__(self, embedder):
+        self.embedder = embedder
+
+    def invoke_model(self, modelId, body, **kwargs):
+        vector = self.embedder.embed([json.loads(body)['inputText']])[0]
+        return {'body': io.BytesIO(json.dumps({'embedding': vector.tolist()}).encode('utf-8'))}
+
+
+@pytest.fixture(params=['local', 'moto'])
+def store(request, tmp_path):
+    if request.param == 'local':
+        return bulk_inference.LocalStore(str(tmp_path / 'bucket'))
+    return bulk_inference.S3Store('kb-bucket', request.getfixturevalue('s3'))
+
+
+def put(store, key, text):
+    store.write(f"{DOCUMENTS}{key}", text.encode('utf-8'))
+
+
+def ingest(store, tmp_path, embedder, **options):
+    work_dir = tmp_path / f"work-{len(os.listdir(tmp_path))}"
+    work_dir.mkdir()
+    return kb_ingest.ingest(store, DOCUMENTS, INDEX, embedder, str(work_dir), **dict(OPTIONS, **options))
+
+
+def seed(store, count=4):
+    topics = ['solder joint', 'reflow profile', 'conformal coating', 'BGA voiding', 'ESD handling']
+    for number in range(count):
+        put(store, f"proc-{number}.md", procedure(topics[number]))
+    put(store, 'scan.pdf', '%PDF-1.7')
+
+
+def test_full_ingest_then_nothing_to_do(store, tmp_path):
+    seed(store)
+    embedder = kb_ingest.FakeEmbedder(64)
+    full = ingest(store, tmp_path, embedder)
+    assert full['mode'] == 'create'
+    assert full['generation'] == 1
+    assert full['documents'] == 4
+    assert full['skippedObjects'] == 1
+    assert full['embedded'] == embedder.texts > 0
+
+    again = ingest(store, tmp_path, embedder)
+    assert again['mode'] == 'unchanged'
+    assert again['generation'] == 1
+    assert again['unchanged'] == 4
+    assert again['embedded'] == 0
+    current = store.read_json(f"{INDEX}/current.json")
+    assert current['documents'] == 4
+    assert current['bytes'] > 0
+    assert current['count'] == full['embedded']
+
+
+def test_new_documents_are_appended(store, tmp_path):
+    seed(store)
+    embedder = kb_ingest.FakeEmbedder(64)
+    full = ingest(store, tmp_path, embedder)
+    put(store, 'proc-9.md', procedure('wave solder', steps=2))
+    added = ingest(store, tmp_path, embedder)
+    assert added['mode'] == 'append'
+    assert added['generation'] == 2
+    assert added['unchanged'] == 4
+    assert 0 < added['embedded'] < full['embedded']
+    assert store.read_json(f"{INDEX}/current.json")['count'] == full['embedded'] + added['embedded']
+
+
+def test_edits_reuse_unchanged_chunks_and_deletes_compact(store, tmp_path):
+    seed(store)
+    embedder = kb_ingest.FakeEmbedder(64)
+    full = ingest(store, tmp_path, embedder)
+
+    put(store, 'proc-0.md', procedure('solder joint').replace('Step 2 for', 'Step 2 (revised) for'))
+    # Re-uploading the same bytes may change the ETag (a new mtime locally) but not the content
+    put(store, 'proc-1.md', procedure('reflow profile'))
+    store.delete(f"{DOCUMENTS}proc-3.md")
+    edited = ingest(store, tmp_path, embedder)
+
+    assert edited['mode'] == 'compact'
+    assert edited['embedded'] == 1
+    assert edited['reusedChunks'] > 0
+    # proc-1 and proc-2 keep their vectors, by ETag or by content hash
+    assert edited['unchanged'] + edited['sameContent'] == 2
+    assert edited['removed'] == 1
+    current = store.read_json(f"{INDEX}/current.json")
+    assert current['documents'] == 3
+    assert current['count'] < full['embedded']
+
+
+def test_interrupted_run_resumes_from_its_checkpoint(store, tmp_path):
+    seed(store)
+    embedder = kb_ingest.FakeEmbedder(64)
+    ingest(store, tmp_path, embedder)
+    for number in range(10, 16):
+        put(store, f"proc-{number}.md", procedure(f"topic {number}"))
+
+    with pytest.raises(RuntimeError):
+        ingest(store, tmp_path, FailingEmbedder(fail_after=1), checkpoint_every=2)
+    resumed = ingest(store, tmp_path, embedder, checkpoint_every=2)
+    assert resumed['resumedParts'] == 1
+    assert resumed['mode'] == 'append'
+    assert store.read_json(f"{INDEX}/current.json")['documents'] == 10
+    # Staging is cleared once the generation is published
+    assert not list(store.list(f"{INDEX}/staging/"))
+
+
+def test_a_new_model_rebuilds_the_index(store, tmp_path):
+    seed(store)
+    ingest(store, tmp_path, kb_ingest.FakeEmbedder(64))
+    rebuilt = ingest(store, tmp_path, kb_ingest.FakeEmbedder(64, model='other-model'))
+    assert rebuilt['mode'] == 'create'
+    assert store.read_json(f"{INDEX}/current.json")['model'] == 'other-model'
+
+
+def test_published_index_answers_queries(s3, tmp_path, monkeypatch):
+    store = bulk_inference.S3Store('kb-bucket', s3)
+    seed(store)
+    ingest(store, tmp_path, kb_ingest.FakeEmbedder(64))
+    monkeypatch.setenv('KNOWLEDGE_BASE_INDEX_URI', f"s3://kb-bucket/{INDEX}")
+    monkeypatch.delenv('KNOWLEDGE_BASE_INDEX_DIR', raising=False)
+    monkeypatch.setattr(knowledge_base, 'DOWNLOAD_DIR', str(tmp_path / 'lambda-tmp'))
+    monkeypatch.setattr(knowledge_base, '_index', None)
+    clients.set_client('bedrock-runtime', FakeBedrockRuntime(kb_ingest.FakeEmbedder(64)))
+
+    response = knowledge_base.handle({'query': 'reflow profile station 2', 'top_k': 2})
+    results = json.loads(response['body'])['results']
+    assert response['statusCode'] == 200
+    assert len(results) == 2
+    assert results[0]['source'] == f"{DOCUMENTS}proc-1.md"
+
+
+def test_download_refuses_an_index_larger_than_tmp(s3, tmp_path, monkeypatch):
+    s3.put_object(Bucket='kb-bucket', Key='index/current.json', Body=json.dumps({
+        'generation': 3, 'path': 'index/g00003', 'bytes': 2 * 2 ** 30
+    }))
+    monkeypatch.setattr(knowledge_base.shutil, 'disk_usage', lambda path: type('Usage', (), {'free': 2 ** 29})())
+    with pytest.raises(OSError) as raised:
+        knowledge_base.download_index('s3://kb-bucket/index', str(tmp_path))
+    assert raised.value.errno == errno.ENOSPC
+    assert 'ephemeralStorageMb' in str(raised.value)
+
+
+def test_download_replaces_older_generations(s3, tmp_path):
+    source = tmp_path / 'source'
+    knowledge_base.write_index(str(source), np.eye(2, dtype=np.float32),
+                               [{'id': str(n), 'source': 'doc.md', 'text': 'chunk'} for n in range(2)])
+    for name in knowledge_base.INDEX_FILES:
+        s3.upload_file(str(source / name), 'kb-bucket', f"index/g00002/{name}")
+    s3.put_object(Bucket='kb-bucket', Key='index/current.json', Body=json.dumps({
+        'generation': 2, 'path': 'index/g00002'
+    }))
+    downloads = tmp_path / 'downloads'
+    (downloads / 'g00001').mkdir(parents=True)
+
+    target = knowledge_base.download_index('s3://kb-bucket/index', str(downloads))
+    assert sorted(p.name for p in downloads.iterdir()) == ['g00002']
+    assert knowledge_base.VectorIndex(target).count == 2
@@ -0,0 +1,31 @@
+import json
+
+import numpy as np
+import pytest
+
+import knowledge_base
+
+
+@pytest.mark.parametrize('top_k', [0, -1, 2.5, 'five', True, None, [3]])
+def test_invalid_top_k_is_a_400(top_k):
+    response = knowledge_base.handle({'query': 'reflow', 'top_k': top_k})
+    assert response['statusCode'] == 400
+    assert json.loads(response['body'])['error'] == 'top_k must be a positive integer'
+
+
+def test_top_k_is_capped(monkeypatch):
+    searched = []
+    monkeypatch.setenv('KNOWLEDGE_BASE_MAX_TOP_K', '10')
+    monkeypatch.setattr(knowledge_base, 'search', lambda query, top_k: searched.append(top_k) or [])
+    for top_k in (3, '4', 4.0, 500):
+        assert knowledge_base.handle({'query': 'reflow', 'top_k': top_k})['statusCode'] == 200
+    assert searched == [3, 4, 4, 10]
+
+
+def test_vector_search_ranks_by_similarity(tmp_path):
+    embeddings = np.eye(4, dtype=np.float32)
+    chunks = [{'id': str(n), 'source': 'doc.md', 'text': f"chunk {n}"} for n in range(4)]
+    knowledge_base.write_index(str(tmp_path), embeddings, chunks)
+    index = knowledge_base.VectorIndex(str(tmp_path))
+    assert [row for row, _ in index.search(np.array([0, 0.2, 1, 0], dtype=np.float32), 2)] == [2, 1]
+    assert index.search(np.ones(4, dtype=np.float32), 0) == []
@@ -0,0 +1,49 @@
+import cache
+import routing
+
+
+def pool():
+    return [
+        routing.AgentTarget('fast', 'AGENT', 'FAST', tier='fast'),
+        routing.AgentTarget('deep', 'AGENT', 'DEEP', tier='deep'),
+        routing.AgentTarget('deep-2', 'AGENT', 'DEEP2', tier='deep')
+    ]
+
+
+def test_requests_go_to_their_tier_first():
+    router = routing.Router(pool())
+    assert router.route({'prompt': 'hi', 'tier': 'fast'})[0].name == 'fast'
+    assert router.route({'prompt': 'hi', 'tier': 'deep'})[0].tier == 'deep'
+    assert len(router.route({'prompt': 'hi'})) == 3
+
+
+def test_sessions_stay_on_their_alias():
+    router = routing.Router(pool())
+    assert [t.name for t in router.route({'prompt': 'hi', 'sessionId': 's', 'route': 'deep-2'})] == ['deep-2']
+    assert [t.name for t in router.route({'prompt': 'hi', 'sessionId': 's'})] == ['fast']
+
+
+def test_failing_aliases_cool_down_behind_the_others():
+    now = [0.0]
+    router = routing.Router(pool(), failure_threshold=2, cooldown_seconds=30, clock=lambda: now[0])
+    deep = router.by_name['deep']
+    router.record_success(router.by_name['deep-2'], 500)
+    for _ in range(2):
+        router.record_failure(deep)
+    assert router.route({'prompt': 'hi', 'tier': 'deep'})[-1] is deep
+    assert router.replica(router.by_name['deep-2']) is router.by_name['deep-2']
+    now[0] = 31
+    assert router.route({'prompt': 'hi', 'tier': 'deep'})[0] is deep
+
+
+def test_cache_scope_separates_tiers_and_pinned_aliases():
+    router = routing.Router(pool())
+    fast = router.cache_scope({'prompt': 'hi', 'tier': 'fast'})
+    assert fast != router.cache_scope({'prompt': 'hi', 'tier': 'deep'})
+    assert router.cache_scope({'prompt': 'hi', 'route': 'deep-2'}) == 'AGENT/DEEP2'
+    assert cache.cache_key('AGENT', 'ALIAS', 'hi', fast) != cache.cache_key('AGENT', 'ALIAS', 'hi', 'deep')
+
+
+def test_single_tier_pools_share_one_scope():
+    router = routing.Router(pool()[1:])
+    assert router.cache_scope({'prompt': 'hi', 'tier': 'fast'}) == router.cache_scope({'prompt': 'why?'}) == 'deep'
@@ -0,0 +1,52 @@
+import pytest
+
+import sessions
+
+
+def uncompacted_ms(turn):
+    """Time to first chunk of 0-based turn in a session that keeps growing."""
+    return 100 + 50 * turn
+
+
+def test_compaction_saving_tracks_the_uncompacted_session():
+    manager = sessions.SessionManager(max_turns=4)
+    reported, actual = [], []
+    for turn in range(16):
+        started = manager.begin({'prompt': f"question {turn}", 'sessionId': 'line-7'})
+        # A compacted session costs as much as its own turns plus a little for the summary
+        ttfc = uncompacted_ms(started.state['turns']) + (20 if started.state['seed'] else 0)
+        info = manager.finish(started, f"answer {turn}", ttfc)
+        if info['latencySavingMs'] is not None:
+            reported.append(info['latencySavingMs'])
+            actual.append(uncompacted_ms(turn) - ttfc)
+
+    assert manager.stats()['compactions'] == 3
+    assert len(reported) == 12
+    assert reported == pytest.approx(actual)
+    assert min(reported) > 0
+
+
+def test_no_saving_before_the_first_compaction():
+    manager = sessions.SessionManager(max_turns=10)
+    started = manager.begin({'prompt': 'hello', 'sessionId': 's'})
+    info = manager.finish(started, 'hi', 120)
+    assert info['compacted'] is False
+    assert info['latencySavingMs'] is None
+
+
+def test_compacted_turn_is_seeded_with_a_summary():
+    manager = sessions.SessionManager(max_turns=2)
+    for turn in range(2):
+        manager.finish(manager.begin({'prompt': f"Check lot {turn}.", 'sessionId': 's'}), f"Lot {turn} passed.", 100)
+    started = manager.begin({'prompt': 'And the next lot?', 'sessionId': 's'})
+    assert started.compacted
+    assert started.body['sessionId'] == 's-c1'
+    assert 'Lot 1 passed.' in started.body['prompt']
+    assert started.body['prompt'].endswith('And the next lot?')
+
+
+def test_fit_line():
+    assert sessions.fit_line([100]) == (0.0, 100)
+    slope, last = sessions.fit_line([100, 150, 200, 250])
+    assert slope == pytest.approx(50)
+    assert last == pytest.approx(250)
@@ -0,0 +1,76 @@
+import hashlib
+import json
+
+import clients
+import index
+import spill
+from large_response import ReportAgent, expected
+
+MB = 1024 * 1024
+EVENT = {'body': json.dumps({'prompt': 'Write the full line report for every station.'})}
+
+
+def test_small_answers_stay_inline():
+    writer = spill.ResponseSpill('kb-bucket', threshold_bytes=100, client=object()).writer()
+    writer.add('short ')
+    writer.add('answer')
+    assert writer.finish() == ('short answer', None)
+
+
+def test_multipart_round_trip(s3):
+    responses = spill.ResponseSpill('kb-bucket', threshold_bytes=MB, preview_chars=50)
+    writer = responses.writer()
+    digest = hashlib.sha256()
+    line = 'Station 0042 — reflow peak 245 °C, result: pass.\n'
+    for _ in range(12 * MB // len(line.encode('utf-8'))):
+        writer.add(line)
+        digest.update(line.encode('utf-8'))
+    text, spilled = writer.finish()
+
+    assert text is None
+    # 5 MiB parts and the remainder
+    assert spilled['parts'] == 3
+    assert spilled['preview'] == (line * 2)[:50]
+    stored = s3.get_object(Bucket='kb-bucket', Key=spilled['key'])
+    body = stored['Body'].read()
+    assert len(body) == spilled['bytes']
+    assert hashlib.sha256(body).hexdigest() == digest.hexdigest()
+    assert stored['ContentType'] == spill.CONTENT_TYPE
+    assert spilled['key'] in spilled['url']
+    assert f"X-Amz-Expires={spilled['expiresInSeconds']}" in spilled['url']
+
+
+def test_abort_leaves_no_open_upload(s3):
+    writer = spill.ResponseSpill('kb-bucket', threshold_bytes=10).writer()
+    writer.add('x' * 100)
+    assert writer.upload_id is not None
+    writer.abort()
+    writer.abort()
+    assert s3.list_multipart_uploads(Bucket='kb-bucket').get('Uploads', []) == []
+
+
+def test_handler_spills_long_answers(s3, monkeypatch):
+    monkeypatch.setattr(index, 'response_spill', spill.ResponseSpill('kb-bucket', threshold_bytes=MB))
+    monkeypatch.setattr(index, 'response_cache', None)
+    size = 6 * MB
+
+    clients.set_client('bedrock-agent-runtime', ReportAgent(size))
+    response = index.handler(EVENT, None)
+    assert response['statusCode'] == 200
+    body = json.loads(response['body'])
+    stored = s3.get_object(Bucket='kb-bucket', Key=body['spilled']['key'])['Body'].read()
+    assert hashlib.sha256(stored).hexdigest() == expected(size, 4096)
+    assert len(body['response']) == 2000
+
+    # A stream that drops part-way aborts its upload
+    clients.set_client('bedrock-agent-runtime', ReportAgent(size, fail_after=size // 2))
+    assert index.handler(EVENT, None)['statusCode'] == 500
+    assert s3.list_multipart_uploads(Bucket='kb-bucket').get('Uploads', []) == []
+
+
+def test_worker_threshold_only_lowers():
+    responses = spill.ResponseSpill('kb-bucket', threshold_bytes=MB)
+    assert responses.with_threshold(256 * 1024).threshold_bytes == 256 * 1024
+    assert responses.with_threshold(4 * MB).threshold_bytes == MB
+    assert spill.ResponseSpill('kb-bucket', part_bytes=1).part_bytes == spill.MIN_PART_BYTES
+
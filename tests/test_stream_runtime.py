@@ -0,0 +1,113 @@
+import base64
+import json
+
+import stream_runtime
+
+
+class FakeConnection:
+    """Records what ResponseStream sends to the Runtime API."""
+
+    def __init__(self):
+        self.request = None
+        self.headers = {}
+        self.body = b''
+
+    def putrequest(self, method, path):
+        self.request = (method, path)
+
+    def putheader(self, name, value):
+        self.headers[name] = value
+
+    def endheaders(self):
+        pass
+
+    def send(self, data):
+        self.body += data
+
+    def getresponse(self):
+        return self
+
+    def read(self):
+        return b''
+
+
+def dechunk(body):
+    """The chunks of a chunked body and the trailer block after the last one."""
+    chunks = []
+    while True:
+        size, _, body = body.partition(b'\r\n')
+        size = int(size, 16)
+        if not size:
+            return chunks, body
+        chunks.append(body[:size])
+        body = body[size + 2:]
+
+
+def test_prelude_then_one_chunk_per_write():
+    connection = FakeConnection()
+    stream = stream_runtime.ResponseStream(connection, 'request-1')
+    stream.write(b'{"chunk": "Class"}\n')
+    stream.write(b'')
+    stream.write(b'{"done": true}\n')
+    stream.close()
+    stream.close()
+
+    assert connection.request == ('POST', '/2018-06-01/runtime/invocation/request-1/response')
+    assert connection.headers['Lambda-Runtime-Function-Response-Mode'] == 'streaming'
+    assert connection.headers['Transfer-Encoding'] == 'chunked'
+    assert connection.headers['Content-Type'] == stream_runtime.HTTP_INTEGRATION_CONTENT_TYPE
+    chunks, trailers = dechunk(connection.body)
+    prelude, delimiter, rest = chunks[0].partition(stream_runtime.PRELUDE_DELIMITER)
+    assert json.loads(prelude) == {'statusCode': 200, 'headers': {'Content-Type': 'application/x-ndjson'}}
+    assert rest == b''
+    assert chunks[1:] == [b'{"chunk": "Class"}\n', b'{"done": true}\n']
+    assert trailers == b'\r\n'
+
+
+def test_failure_is_reported_in_the_trailers():
+    connection = FakeConnection()
+    stream = stream_runtime.ResponseStream(connection, 'request-2')
+    stream.write(b'partial')
+    try:
+        raise RuntimeError('agent stream dropped')
+    except RuntimeError as e:
+        stream.fail(e)
+
+    _, trailers = dechunk(connection.body)
+    fields = dict(line.split(': ', 1) for line in trailers.decode('ascii').split('\r\n') if line)
+    assert fields['Lambda-Runtime-Function-Error-Type'] == 'RuntimeError'
+    error = json.loads(base64.b64decode(fields['Lambda-Runtime-Function-Error-Body']))
+    assert error['errorMessage'] == 'agent stream dropped'
+    assert error['stackTrace']
+
+
+def test_context_from_runtime_headers(monkeypatch):
+    monkeypatch.setattr(stream_runtime.time, 'time', lambda: 100.0)
+    context = stream_runtime.Context({
+        'Lambda-Runtime-Aws-Request-Id': 'request-3',
+        'Lambda-Runtime-Deadline-Ms': '130000'
+    })
+    assert context.aws_request_id == 'request-3'
+    assert context.get_remaining_time_in_millis() == 30000
+
+
+def test_status_can_change_until_the_first_write():
+    connection = FakeConnection()
+    stream = stream_runtime.ResponseStream(connection, 'request-4')
+    assert connection.body == b''
+    assert stream.set_status(429, {'Retry-After': '3'})
+    stream.write(b'{"error": "busy"}\n')
+    assert not stream.set_status(500)
+    stream.close()
+
+    chunks, _ = dechunk(connection.body)
+    prelude = json.loads(chunks[0].partition(stream_runtime.PRELUDE_DELIMITER)[0])
+    assert prelude == {'statusCode': 429, 'headers': {'Content-Type': 'application/x-ndjson', 'Retry-After': '3'}}
+
+
+def test_empty_response_still_sends_the_prelude():
+    connection = FakeConnection()
+    stream_runtime.ResponseStream(connection, 'request-5').close()
+    chunks, trailers = dechunk(connection.body)
+    assert json.loads(chunks[0].partition(stream_runtime.PRELUDE_DELIMITER)[0])['statusCode'] == 200
+    assert trailers == b'\r\n'
@@ -0,0 +1,28 @@
+"""
+The synthesized templates match benchmarks/snapshots. A failure here means
+the infrastructure changed: check the diff with
+`python benchmarks/template_snapshot.py` and accept it with --update.
+"""
+import os
+
+import pytest
+
+pytest.importorskip('aws_cdk')
+
+import template_snapshot  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def synthesized():
+    return template_snapshot.synthesized()
+
+
+def test_every_stack_has_a_snapshot(synthesized):
+    snapshots = sorted(name for name in os.listdir(template_snapshot.SNAPSHOTS) if name.endswith('.template.json'))
+    assert sorted(synthesized) == snapshots
+
+
+def test_templates_match_the_snapshots(synthesized):
+    for name, text in synthesized.items():
+        with open(os.path.join(template_snapshot.SNAPSHOTS, name)) as f:
+            assert text == f.read(), f"{name} differs from its snapshot"
@@ -0,0 +1,61 @@
+import json
+import sys
+
+import pytest
+
+import tools
+
+
+@pytest.fixture
+def echo_tool(tmp_path, monkeypatch):
+    """A registered tool module that echoes its event, imported only when first used."""
+    (tmp_path / 'echo_tool.py').write_text(
+        'import json\n'
+        'def handle(event):\n'
+        "    return {'statusCode': 200, 'body': json.dumps(event)}\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setitem(tools.TOOLS, 'echo', 'echo_tool')
+    yield 'echo'
+    tools._loaded.pop('echo', None)
+
+
+def test_tools_are_imported_on_first_use(echo_tool):
+    assert 'echo_tool' not in sys.modules
+    result = tools.handler({'tool_type': echo_tool, 'value': 1}, None)
+    assert json.loads(result['body']) == {'tool_type': 'echo', 'value': 1}
+    assert 'echo_tool' in sys.modules
+
+
+def test_unknown_tools_are_an_error():
+    result = tools.handler({'tool_type': 'shell'}, None)
+    assert result['statusCode'] == 500
+    assert 'Unsupported tool type: shell' in json.loads(result['body'])['error']
+
+
+def test_action_group_parameters_are_typed(echo_tool):
+    result = tools.handler({
+        'actionGroup': 'lookups',
+        'apiPath': '/echo',
+        'httpMethod': 'POST',
+        'parameters': [{'name': 'top_k', 'type': 'integer', 'value': '3'}],
+        'requestBody': {'content': {'application/json': {'properties': [
+            {'name': 'filters', 'type': 'object', 'value': '{"line": 7}'},
+            {'name': 'exact', 'type': 'boolean', 'value': 'true'}
+        ]}}}
+    }, None)
+    response = result['response']
+    assert response['httpStatusCode'] == 200
+    assert json.loads(response['responseBody']['application/json']['body']) == {
+        'top_k': 3, 'filters': {'line': 7}, 'exact': True, 'tool_type': 'echo'
+    }
+
+
+def test_unknown_action_group_function_fails_the_call():
+    result = tools.handler({'actionGroup': 'lookups', 'function': 'shell', 'parameters': []}, None)
+    assert result['response']['functionResponse']['responseState'] == 'FAILURE'
+
+
+def test_warmup_loads_the_requested_tools(echo_tool):
+    result = tools.handler({'warmup': True, 'tools': [echo_tool]}, None)
+    assert list(json.loads(result['body'])['warmed']) == ['echo']